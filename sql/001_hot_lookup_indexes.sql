@@ -0,0 +1,57 @@
+-- Indexes and uniqueness for the records / answers / questions hot lookups.
+--
+-- Fresh databases get these from Base.metadata.create_all at startup; this script brings an
+-- existing database in line. It is idempotent and aborts (changing nothing) if duplicates
+-- would violate the new unique constraints.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f sql/001_hot_lookup_indexes.sql
+
+BEGIN;
+
+DO $$
+DECLARE
+    duplicate_questions integer;
+    duplicate_records integer;
+BEGIN
+    SELECT count(*) INTO duplicate_questions FROM (
+        SELECT 1 FROM questions GROUP BY match_id, question_code HAVING count(*) > 1
+    ) d;
+    IF duplicate_questions > 0 THEN
+        RAISE EXCEPTION '% (match_id, question_code) pairs are duplicated in questions; merge them before migrating', duplicate_questions;
+    END IF;
+
+    SELECT count(*) INTO duplicate_records FROM (
+        SELECT 1 FROM records WHERE NOT is_deleted
+        GROUP BY match_id, question_id, player_id HAVING count(*) > 1
+    ) d;
+    IF duplicate_records > 0 THEN
+        RAISE EXCEPTION '% (match, question, player) triples have several live records; soft-delete the extras before migrating', duplicate_records;
+    END IF;
+END $$;
+
+-- questions: one code per match, also serves the (match_id, question_code) lookup
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_questions_match_id_question_code') THEN
+        ALTER TABLE questions
+            ADD CONSTRAINT uq_questions_match_id_question_code UNIQUE (match_id, question_code);
+    END IF;
+END $$;
+
+-- records: one live record per (player, match, question), plus per-match / per-player timelines
+CREATE UNIQUE INDEX IF NOT EXISTS uq_records_match_question_player
+    ON records (match_id, question_id, player_id) WHERE NOT is_deleted;
+CREATE INDEX IF NOT EXISTS ix_records_match_id_created_at ON records (match_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_records_player_id_created_at ON records (player_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_records_question_id ON records (question_id);
+
+-- answers: latest answer per (player, question) of a match
+CREATE INDEX IF NOT EXISTS ix_answers_match_player_question_updated_at
+    ON answers (match_id, player_id, question_id, updated_at);
+CREATE INDEX IF NOT EXISTS ix_answers_question_id ON answers (question_id);
+
+ANALYZE questions;
+ANALYZE records;
+ANALYZE answers;
+
+COMMIT;
@@ -0,0 +1,27 @@
+-- Indexes for the keyset-paginated listings, which page in (created_at, id) order.
+--
+-- Fresh databases get these from Base.metadata.create_all at startup; this script brings an
+-- existing database in line. It is idempotent. The records indexes from 001 are replaced by
+-- wider ones with the same leading columns, so their lookups keep working.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f sql/002_keyset_pagination_indexes.sql
+
+BEGIN;
+
+-- records: per-match / per-player pages
+CREATE INDEX IF NOT EXISTS ix_records_match_id_created_at_id ON records (match_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_records_player_id_created_at_id ON records (player_id, created_at, id);
+DROP INDEX IF EXISTS ix_records_match_id_created_at;
+DROP INDEX IF EXISTS ix_records_player_id_created_at;
+
+-- questions: per-match pages
+CREATE INDEX IF NOT EXISTS ix_questions_match_id_created_at_id ON questions (match_id, created_at, id);
+
+-- players: the players listing
+CREATE INDEX IF NOT EXISTS ix_players_created_at_id ON players (created_at, id);
+
+ANALYZE records;
+ANALYZE questions;
+ANALYZE players;
+
+COMMIT;
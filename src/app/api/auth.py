@@ -23,7 +23,7 @@ async def signup(user_data: UserCreate, session: AsyncSession = Depends(get_db))
         raise HTTPException(status_code=400, detail="Username already exists")
     new_user = User(
         username=user_data.username,
-        hashed_password=hash_password(user_data.password),
+        hashed_password=await hash_password(user_data.password),
         role=user_data.role
     )
     session.add(new_user)
@@ -38,7 +38,7 @@ async def signup(user_data: UserCreate, session: AsyncSession = Depends(get_db))
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
     result = await session.execute(select(User).where(User.username == form_data.username))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     token = create_access_token({"sub": user.username, "role": user.role})
     return TokenResponse(access_token=token, token_type="bearer")
\ No newline at end of file
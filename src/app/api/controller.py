@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 
 from app.core.controller import *
-from app.dependencies.db import get_valkey_pubsub
+from app.dependencies.db import get_valkey_pubsub, get_valkey_cache
 from app.dependencies.user import authorize_user
 
 
@@ -23,6 +23,20 @@ async def trigger_start_timer_api(request: StartQuestionRequest, pubsub: Valkey=
 
 
 
+@controller_router.post(
+    "/cancel_timer",
+    dependencies=[Depends(authorize_user)],
+    response_model=CancelTimerResponse,
+    responses={
+        200: {'description': 'Successfully cancel the running question timer'},
+        500: {'description': 'Internal Server Error'}
+    }
+)
+async def trigger_cancel_timer_api(request: CancelTimerRequest, pubsub: Valkey=Depends(get_valkey_pubsub)):
+    return await trigger_cancel_timer(request, pubsub)
+
+
+
 @controller_router.post(
     "/pick_question",
     dependencies=[Depends(authorize_user)],
@@ -37,10 +51,26 @@ async def trigger_pick_question_api(request: PickQuestionRequest, pubsub: Valkey
 
 
 
+@controller_router.get(
+    "/snapshot",
+    dependencies=[Depends(authorize_user)],
+    response_model=GetMatchSnapshotResponse,
+    responses={
+        200: {'description': 'Successfully get the live state of the match'},
+        500: {'description': 'Internal Server Error'}
+    }
+)
+async def get_match_snapshot_api(match_code: str, pubsub: Valkey=Depends(get_valkey_pubsub), cache: Valkey=Depends(get_valkey_cache)):
+    return await get_match_snapshot(match_code, pubsub, cache)
+
+
+
 @controller_router.websocket("/ws/match/{match_code}")
 async def match_websocket_endpoint(
     websocket: WebSocket,
     match_code: str,
+    last_event_id: str | None = None,
     valkey: Valkey = Depends(get_valkey_pubsub),
+    cache: Valkey = Depends(get_valkey_cache),
 ):
-    await handle_match_websocket(websocket, match_code, valkey)
\ No newline at end of file
+    await handle_match_websocket(websocket, match_code, valkey, cache, last_event_id)
\ No newline at end of file
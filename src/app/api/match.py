@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header
 
-from app.dependencies.db import get_db
+from app.dependencies.db import get_db, get_valkey_cache
 from app.dependencies.user import authorize_user
 from app.schema.match import *
 from app.core.match import *
@@ -16,12 +16,13 @@ match_router = APIRouter(prefix='/matches', tags=['Trận đấu'])
     response_model=GetMatchResponse,
     responses={
         200: {'model': GetMatchResponse, 'description': 'Successfully get all the matches'},
+        304: {'description': 'Not Modified: the If-None-Match ETag is current'},
         404: {'description': 'Not Found'},
         500: {'description': 'Internal Server Error'}
     }
 )
-async def get_all_matches(session: AsyncSession=Depends(get_db)):
-    return await get_all_matches_from_db(session)
+async def get_all_matches(session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache), if_none_match: str | None=Header(default=None)):
+    return await get_all_matches_from_cache(session, cache, if_none_match)
 
 
 
@@ -51,8 +52,8 @@ async def get_match_from_match_code(match_code: str, session: AsyncSession=Depen
         500: {'description': 'Internal Server Error'}
     }
 )
-async def post_match(request: PostMatchRequest, session: AsyncSession=Depends(get_db)):
-    return await post_match_to_db(request, session)
+async def post_match(request: PostMatchRequest, session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache)):
+    return await post_match_to_db(request, session, cache)
 
 
 
@@ -67,5 +68,5 @@ async def post_match(request: PostMatchRequest, session: AsyncSession=Depends(ge
         500: {'description': 'Internal Server Error'}
     }
 )
-async def delete_match_from_match_code(match_code: str, session: AsyncSession=Depends(get_db)):
-    return await delete_match_from_match_code_from_db(match_code, session)
\ No newline at end of file
+async def delete_match_from_match_code(match_code: str, session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache)):
+    return await delete_match_from_match_code_from_db(match_code, session, cache)
\ No newline at end of file
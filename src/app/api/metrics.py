@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+
+from app.dependencies.user import authorize_user
+from app.core.metrics import *
+
+
+metrics_router = APIRouter(prefix='/metrics', tags=['Giám sát'])
+
+
+
+@metrics_router.get(
+    "/",
+    dependencies=[Depends(authorize_user)],
+    response_model=GetMetricsResponse,
+    responses={
+        200: {'model': GetMetricsResponse, 'description': 'Successfully get the runtime metrics'},
+        500: {'description': 'Internal Server Error'}
+    }
+)
+async def get_metrics():
+    return await get_runtime_metrics()
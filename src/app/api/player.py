@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header
 
-from app.dependencies.db import get_db
+from app.dependencies.db import get_db, get_valkey_cache
 from app.dependencies.user import authorize_user
 from app.core.player import *
 from app.schema.player import *
@@ -15,13 +15,22 @@ player_router = APIRouter(prefix='/players', tags=['Thí sinh'])
     dependencies=[Depends(authorize_user)],
     response_model=GetPlayerResponse,
     responses={
-        200: {'model': GetPlayerResponse, 'description': 'Successfully get all the players'},
+        200: {'model': GetPlayerResponse, 'description': 'Successfully get a page of players'},
+        304: {'description': 'Not Modified: the If-None-Match ETag is current'},
+        400: {'description': 'Invalid cursor or unknown fields'},
         404: {'description': 'Not Found'},
         500: {'description': 'Internal Server Error'}
     }
 )
-async def get_all_players(session: AsyncSession=Depends(get_db)):
-    return await get_all_players_from_db(session)
+async def get_all_players(
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None,
+    session: AsyncSession=Depends(get_db),
+    cache: Valkey=Depends(get_valkey_cache),
+    if_none_match: str | None=Header(default=None)
+):
+    return await get_all_players_from_cache(session, cache, if_none_match, limit, cursor, fields)
 
 
 
@@ -51,8 +60,8 @@ async def get_player_from_player_code(player_code: str, session: AsyncSession=De
         500: {'description': 'Internal Server Error'}
     }
 )
-async def post_player(request: PostPlayerRequest, session: AsyncSession=Depends(get_db)):
-    return await post_player_to_db(request, session)
+async def post_player(request: PostPlayerRequest, session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache)):
+    return await post_player_to_db(request, session, cache)
 
 
 
@@ -66,8 +75,8 @@ async def post_player(request: PostPlayerRequest, session: AsyncSession=Depends(
         500: {'description': 'Internal Server Error'}
     }
 )
-async def put_player(request: PutPlayerRequest, session: AsyncSession=Depends(get_db)):
-    return await put_player_to_db(request, session)
+async def put_player(request: PutPlayerRequest, session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache)):
+    return await put_player_to_db(request, session, cache)
 
 
 
@@ -81,5 +90,5 @@ async def put_player(request: PutPlayerRequest, session: AsyncSession=Depends(ge
         500: {'description': 'Internal Server Error'}
     }
 )
-async def delete_player_from_player_code(player_code: str, session: AsyncSession=Depends(get_db)):
-    return await delete_player_from_player_code_from_db(player_code, session)
\ No newline at end of file
+async def delete_player_from_player_code(player_code: str, session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache)):
+    return await delete_player_from_player_code_from_db(player_code, session, cache)
\ No newline at end of file
@@ -17,12 +17,13 @@ question_router = APIRouter(prefix='/questions', tags=['Câu hỏi'])
     response_model=GetQuestionResponse,
     responses={
         200: {'model': GetQuestionResponse, 'description': 'Successfully post a question'},
+        400: {'description': 'Invalid cursor or unknown fields'},
         404: {'description': 'Not Found'},
         500: {'description': 'Internal Server Error'}
     }
 )
-async def get_all_questions_from_match_code(match_code: str, session: AsyncSession=Depends(get_db)):
-    return await get_all_questions_from_match_code_from_db(match_code, session)
+async def get_all_questions_from_match_code(match_code: str, limit: int | None = None, cursor: str | None = None, fields: str | None = None, session: AsyncSession=Depends(get_db)):
+    return await get_all_questions_from_match_code_from_db(match_code, session, limit, cursor, fields)
 
 
 
@@ -47,6 +48,7 @@ async def get_all_questions_from_match_code_to_excel_file(match_code: str, sessi
     responses={
         200: {'model': PostQuestionResponse, 'description': 'Successfully post all the questions from the question file'},
         404: {'description': 'Not Found'},
+        422: {'description': 'No valid question in the file'},
         500: {'description': 'Internal Server Error'}
     }
 )
@@ -15,13 +15,14 @@ record_router = APIRouter(prefix='/records', tags=['Diễn biến'])
     dependencies=[Depends(authorize_user)],
     response_model=GetRecordsResponse,
     responses={
-        200: {'model': GetRecordsResponse, 'description': 'Successfully get all records from a player code'},
+        200: {'model': GetRecordsResponse, 'description': 'Successfully get a page of records from a player code'},
+        400: {'description': 'Invalid cursor or unknown fields'},
         404: {'description': 'Not Found'},
         500: {'description': 'Internal Server Error'}
     }
 )
-async def get_all_records_from_player_code(player_code: str, session: AsyncSession=Depends(get_db)):
-    return await get_all_records_from_player_code_from_db(player_code, session)
+async def get_all_records_from_player_code(player_code: str, limit: int | None = None, cursor: str | None = None, fields: str | None = None, session: AsyncSession=Depends(get_db)):
+    return await get_all_records_from_player_code_from_db(player_code, session, limit, cursor, fields)
 
 
 
@@ -30,13 +31,14 @@ async def get_all_records_from_player_code(player_code: str, session: AsyncSessi
     dependencies=[Depends(authorize_user)],
     response_model=GetRecordsResponse,
     responses={
-        200: {'model': GetRecordsResponse, 'description': 'Successfully get all records from a match code'},
+        200: {'model': GetRecordsResponse, 'description': 'Successfully get a page of records from a match code'},
+        400: {'description': 'Invalid cursor or unknown fields'},
         404: {'description': 'Not Found'},
         500: {'description': 'Internal Server Error'}
     }
 )
-async def get_all_records_from_match_code(match_code: str, session: AsyncSession=Depends(get_db)):
-    return await get_all_records_from_match_code_from_db(match_code, session)
+async def get_all_records_from_match_code(match_code: str, limit: int | None = None, cursor: str | None = None, fields: str | None = None, session: AsyncSession=Depends(get_db)):
+    return await get_all_records_from_match_code_from_db(match_code, session, limit, cursor, fields)
 
 
 
@@ -13,13 +13,43 @@ scoreboard_router = APIRouter(prefix='/scoreboard', tags=['Bảng điểm'])
     "/recent",
     dependencies=[Depends(authorize_user)],
     responses={
-        200: {'model': GetScoreboardResponse, 'description': 'Successfully retrieved the scoreboard Ezcel file'},
+        200: {'model': GetScoreboardResponse, 'description': 'Successfully retrieved the ranked scoreboard'},
         404: {'description': 'Not Found'},
         500: {'description': 'Internal Server Error'}
     }
 )
-async def get_recent_cumulative_timeline_scoreboard(match_code: str, cache: Valkey=Depends(get_valkey_cache)):
-    return await get_recent_cumulative_timeline_scoreboard_from_cache(match_code, cache)
+async def get_recent_cumulative_timeline_scoreboard(match_code: str, top_k: int | None = None, cache: Valkey=Depends(get_valkey_cache)):
+    return await get_recent_cumulative_timeline_scoreboard_from_cache(match_code, cache, top_k)
+
+
+
+@scoreboard_router.get(
+    "/timeline",
+    dependencies=[Depends(authorize_user)],
+    response_model=GetScoreboardResponse,
+    responses={
+        200: {'model': GetScoreboardResponse, 'description': 'Successfully retrieved a page of the cumulative score timeline'},
+        400: {'description': 'Invalid cursor'},
+        404: {'description': 'Not Found'},
+        500: {'description': 'Internal Server Error'}
+    }
+)
+async def get_cumulative_timeline(match_code: str, limit: int | None = None, cursor: str | None = None, session: AsyncSession=Depends(get_db)):
+    return await get_cumulative_timeline_from_db(match_code, session, limit, cursor)
+
+
+
+@scoreboard_router.get(
+    "/timeline/stream",
+    dependencies=[Depends(authorize_user)],
+    responses={
+        200: {'description': 'Successfully streamed the cumulative score timeline as NDJSON'},
+        404: {'description': 'Not Found'},
+        500: {'description': 'Internal Server Error'}
+    }
+)
+async def stream_cumulative_timeline(match_code: str, session: AsyncSession=Depends(get_db)):
+    return await stream_cumulative_timeline_from_db(match_code, session)
 
 
 
@@ -33,4 +63,34 @@ async def get_recent_cumulative_timeline_scoreboard(match_code: str, cache: Valk
     }
 )
 async def get_cumulative_timeline_scoreboard_export_to_excel_file(match_code: str, session: AsyncSession=Depends(get_db)):
-    return await get_cumulative_timeline_scoreboard_export_to_excel_file_from_db(match_code, session)
\ No newline at end of file
+    return await get_cumulative_timeline_scoreboard_export_to_excel_file_from_db(match_code, session)
+
+
+
+@scoreboard_router.get(
+    "/reconcile",
+    dependencies=[Depends(authorize_user)],
+    response_model=GetScoreboardResponse,
+    responses={
+        200: {'model': GetScoreboardResponse, 'description': 'Successfully compared the cached scoreboard with the records'},
+        500: {'description': 'Internal Server Error'}
+    }
+)
+async def reconcile_scoreboard_cache(match_code: str, cache: Valkey=Depends(get_valkey_cache), session: AsyncSession=Depends(get_db)):
+    return await reconcile_scoreboard_cache_with_db(match_code, cache, session)
+
+
+
+@scoreboard_router.post(
+    "/rebuild",
+    dependencies=[Depends(authorize_user)],
+    response_model=GetScoreboardResponse,
+    responses={
+        200: {'model': GetScoreboardResponse, 'description': 'Successfully rebuilt the cached scoreboard from the records'},
+        404: {'description': 'Not Found'},
+        409: {'description': 'Unknown match or scores kept changing during the rebuild'},
+        500: {'description': 'Internal Server Error'}
+    }
+)
+async def rebuild_scoreboard_cache(match_code: str, cache: Valkey=Depends(get_valkey_cache)):
+    return await rebuild_scoreboard_cache_from_db(match_code, cache)
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header
 
-from app.dependencies.db import get_db
+from app.dependencies.db import get_db, get_valkey_cache
 from app.dependencies.user import authorize_user
 from app.core.team import *
 from app.schema.team import *
@@ -16,12 +16,13 @@ team_router = APIRouter(prefix='/teams', tags=['Đội chơi'])
     response_model=GetTeamResponse,
     responses={
         200: {'model': GetTeamResponse, 'description': 'Successfully get all the teams'},
+        304: {'description': 'Not Modified: the If-None-Match ETag is current'},
         404: {'description': 'Not Found'},
         500: {'description': 'Internal Server Error'}
     }
 )
-async def get_all_teams_with_players_info(session: AsyncSession=Depends(get_db)):
-    return await get_all_teams_with_players_info_from_db(session)
+async def get_all_teams_with_players_info(session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache), if_none_match: str | None=Header(default=None)):
+    return await get_all_teams_with_players_info_from_cache(session, cache, if_none_match)
 
 
 
@@ -51,8 +52,8 @@ async def get_team_with_players_info_from_team_code(team_code: str, session: Asy
         500: {'description': 'Internal Server Error'}
     }
 )
-async def post_team(request: PostTeamRequest, session: AsyncSession=Depends(get_db)):
-    return await post_team_to_db(request, session)
+async def post_team(request: PostTeamRequest, session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache)):
+    return await post_team_to_db(request, session, cache)
 
 
 
@@ -66,8 +67,8 @@ async def post_team(request: PostTeamRequest, session: AsyncSession=Depends(get_
         500: {'description': 'Internal Server Error'}
     }
 )
-async def put_team(request: PutTeamRequest, session: AsyncSession=Depends(get_db)):
-    return await put_team_to_db(request, session)
+async def put_team(request: PutTeamRequest, session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache)):
+    return await put_team_to_db(request, session, cache)
 
 
 
@@ -81,5 +82,5 @@ async def put_team(request: PutTeamRequest, session: AsyncSession=Depends(get_db
         500: {'description': 'Internal Server Error'}
     }
 )
-async def delete_team_from_team_code(team_code: str, session: AsyncSession=Depends(get_db)):
-    return await delete_team_from_team_code_from_db(team_code, session)
\ No newline at end of file
+async def delete_team_from_team_code(team_code: str, session: AsyncSession=Depends(get_db), cache: Valkey=Depends(get_valkey_cache)):
+    return await delete_team_from_team_code_from_db(team_code, session, cache)
\ No newline at end of file
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,6 +16,71 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Valkey connection pools (shared by the whole worker)
+    VALKEY_MAX_CONNECTIONS: int = 64
+    VALKEY_POOL_TIMEOUT: float = 5.0
+    VALKEY_SOCKET_TIMEOUT: float = 5.0
+    VALKEY_SOCKET_CONNECT_TIMEOUT: float = 2.0
+    VALKEY_HEALTH_CHECK_INTERVAL: int = 30
 
+    # Match websockets: per-connection outbound queue and what to do when a client falls behind
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_OVERFLOW_POLICY: Literal['drop_oldest', 'disconnect', 'coalesce'] = 'coalesce'
 
-settings = Settings()
\ No newline at end of file
+    # In-process code -> UUID lookup cache
+    CODE_ID_CACHE_MAX_SIZE: int = 4096
+    CODE_ID_CACHE_TTL_SECONDS: float = 300.0
+
+    # Cached team / player / match listings (Valkey); writes invalidate them, the TTL bounds staleness if that fails
+    LISTING_CACHE_TTL_SECONDS: int = 300
+
+    # Password hashing runs in its own thread pool so bcrypt never blocks the event loop
+    PASSWORD_HASH_WORKERS: int = 2
+    # Verified JWTs kept in memory so polling requests skip the decode
+    TOKEN_CACHE_MAX_SIZE: int = 1024
+    TOKEN_CACHE_TTL_SECONDS: float = 60.0
+
+    # Logging: handlers run on a background thread behind a bounded queue (records are dropped, not awaited, when it is full)
+    LOG_ASYNC: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    # Keep 1 in N INFO/DEBUG records of these "[TAG]" categories
+    LOG_SAMPLE_EVERY: dict[str, int] = {'WS_EVENT': 20, 'WS_CLIENT': 20, 'WS_PUBLISH': 20, 'WS_PROCESS': 20}
+
+    # Players listed in the "top" standings of the scoreboard (ties at the cut are included)
+    SCOREBOARD_TOP_K: int = 10
+    # Rebuilding a lost scoreboard from the records table
+    SCOREBOARD_REBUILD_LOCK_TTL_MS: int = 10000
+    SCOREBOARD_REBUILD_ATTEMPTS: int = 3
+    # A record change announced to the scoreboard whose delta never landed stops blocking rebuilds after this
+    SCOREBOARD_PENDING_CHANGE_TTL_MS: int = 10000
+    # Matches with a record this recent are warmed at startup and checked for drift
+    SCOREBOARD_ACTIVE_MATCH_HOURS: float = 12.0
+    # Seconds between cache vs records comparisons (0 disables the check)
+    SCOREBOARD_DRIFT_CHECK_INTERVAL: float = 60.0
+
+    # Per-match hash of the latest answers shown on the MC screen; expires after the last write
+    RECENT_ANSWERS_TTL_SECONDS: int = 6 * 60 * 60
+
+    # Write-behind of the WebSocket answers: staged in Valkey, inserted in batches on a time or size trigger
+    ANSWER_FLUSH_INTERVAL_SECONDS: float = 0.1
+    ANSWER_FLUSH_BATCH_SIZE: int = 200
+    ANSWER_FLUSH_LOCK_TTL_MS: int = 10000
+
+    # Every match event is also kept in a capped per-match stream, replayed to reconnecting sockets
+    MATCH_EVENT_STREAM_MAXLEN: int = 1000
+    MATCH_EVENT_STREAM_TTL_SECONDS: int = 6 * 60 * 60
+    # A bigger gap than this gets a snapshot instead of a replay
+    MATCH_EVENT_REPLAY_MAX: int = 200
+
+    # Keyset-paginated list endpoints
+    PAGE_SIZE_DEFAULT: int = 100
+    PAGE_SIZE_MAX: int = 1000
+
+    # Threads that build streamed XLSX exports
+    EXPORT_WORKERS: int = 2
+    # Processes that parse uploaded question workbooks
+    QUESTION_IMPORT_WORKERS: int = 1
+
+
+
+settings = Settings()
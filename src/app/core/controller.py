@@ -1,28 +1,100 @@
 import json
+import time
 import asyncio
 from valkey.asyncio import Valkey
+from valkey.asyncio.client import PubSub
+from valkey.exceptions import ConnectionError as ValkeyConnectionError, TimeoutError as ValkeyTimeoutError
 from fastapi import HTTPException
 from fastapi.websockets import WebSocket, WebSocketDisconnect
 
+from app.config import settings
 from app.dependencies.ws import *
 from app.schema.controller import *
 from app.utils.match_event import *
+from app.utils.match_stream import event_id_of, parse_event_id, updates_channel, read_events_after, get_latest_event_id
+from app.utils.match_state import read_match_snapshot
 from app.logger import global_logger
 
 
-
-async def listen_to_valkey_pubsub(manager: ConnectionManager, match_code: str, subscriber: Valkey):
-    try:
-        while True:
-            message = await subscriber.get_message(ignore_subscribe_messages=True) 
-            if message and message.get("type") == "message":
-                try:
-                    data = json.loads(message["data"])
-                    await manager.broadcast(match_code, data)
-                except Exception as e:
-                    global_logger.error(f"[WS] Invalid Valkey message in listener: {e}")
-    except Exception as e:
-        global_logger.error(f"[WS] PubSub listener failed: {e}")
+PUBSUB_READ_TIMEOUT = 1.0
+PUBSUB_RECONNECT_MIN_BACKOFF = 0.5
+PUBSUB_RECONNECT_MAX_BACKOFF = 10.0
+SUBSCRIBER_GAP_MESSAGE = {"type": "resync", "reason": "subscriber_gap"}
+
+
+
+def _advance(position: dict, payload: str) -> bool:
+    """
+    Move the subscriber's stream position to the frame's event_id. False when the frame was
+    already forwarded (the backfill after a reconnect and the live channel overlap).
+    """
+    event_id = event_id_of(payload)
+    parsed = parse_event_id(event_id)
+    if parsed is None:
+        return True
+    if position["last_event_id"] is not None and parsed <= parse_event_id(position["last_event_id"]):
+        return False
+    position["last_event_id"] = event_id
+    return True
+
+
+
+async def _consume_valkey_pubsub(manager: ConnectionManager, match_code: str, subscriber: PubSub, position: dict):
+    while True:
+        # Blocks on the socket for up to PUBSUB_READ_TIMEOUT seconds instead of busy-polling
+        message = await subscriber.get_message(ignore_subscribe_messages=True, timeout=PUBSUB_READ_TIMEOUT)
+        if message and message.get("type") == "message" and _advance(position, message["data"]):
+            try:
+                # Publishers already send JSON text, so forward it as-is instead of decode + re-encode per socket
+                await manager.broadcast_raw(match_code, message["data"])
+            except Exception as e:
+                global_logger.error("[WS] Failed to broadcast Valkey message in listener: %s", e)
+
+
+
+async def _backfill_from_stream(manager: ConnectionManager, match_code: str, valkey: Valkey, position: dict):
+    """After a resubscribe, forward what was published while the subscriber was down."""
+    if position["last_event_id"] is None:
+        return
+    frames = await read_events_after(valkey, match_code, position["last_event_id"], settings.MATCH_EVENT_REPLAY_MAX)
+    if frames is None:
+        global_logger.warning("[WS] Too many events missed by the subscriber of match=%s, asking clients to resync", match_code)
+        await manager.broadcast(match_code, SUBSCRIBER_GAP_MESSAGE)
+        position["last_event_id"] = await get_latest_event_id(valkey, match_code)
+        return
+    for _, frame in frames:
+        if _advance(position, frame):
+            await manager.broadcast_raw(match_code, frame)
+
+
+
+async def listen_to_valkey_pubsub(manager: ConnectionManager, match_code: str, valkey: Valkey):
+    """
+    Shared subscriber for one match in this process: reads match:{code}:updates once
+    and fans every message out to all local websockets through the ConnectionManager.
+    Reconnects with exponential backoff when the Valkey connection drops, then replays the
+    events it missed from the match's stream.
+    """
+    channel = updates_channel(match_code)
+    position = {"last_event_id": None}
+    backoff = PUBSUB_RECONNECT_MIN_BACKOFF
+    while True:
+        subscriber = valkey.pubsub()
+        try:
+            await subscriber.subscribe(channel)
+            backoff = PUBSUB_RECONNECT_MIN_BACKOFF
+            await _backfill_from_stream(manager, match_code, valkey, position)
+            await _consume_valkey_pubsub(manager, match_code, subscriber, position)
+        except asyncio.CancelledError:
+            raise
+        except (ValkeyConnectionError, ValkeyTimeoutError, OSError) as e:
+            global_logger.warning("[WS] PubSub connection lost for match=%s: %s. Reconnecting in %.1fs", match_code, e, backoff)
+        except Exception as e:
+            global_logger.error("[WS] PubSub listener failed for match=%s: %s. Restarting in %.1fs", match_code, e, backoff)
+        finally:
+            await subscriber.aclose()
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, PUBSUB_RECONNECT_MAX_BACKOFF)
 
 
 
@@ -30,38 +102,66 @@ async def listen_to_websocket_client(websocket: WebSocket, match_code: str, valk
     try:
         while True:
             client_msg = await websocket.receive_json() 
-            global_logger.debug(f"[WS] From client: {client_msg}")
-            event_type = client_msg.get("type")
-            if event_type in ["buzz", "answer"]:
-                locked = await valkey.get(f"match:{match_code}:locked")
-                if locked == b"1" or locked == "1":
-                    await websocket.send_json({"type": "answer_rejected", "reason": "time_up"})
-                    continue
-            await process_client_event(valkey, match_code, client_msg)
+            received_ms = int(time.time() * 1000)
+            global_logger.debug("[WS_CLIENT] From client: %s", client_msg)
+            rejection = await process_client_event(valkey, match_code, client_msg, received_ms)
+            if rejection:
+                await websocket.send_json(rejection)
     except WebSocketDisconnect:
         raise 
     except Exception as e:
-        global_logger.error(f"[WS] Client listener failed: {e}")
+        global_logger.error("[WS] Client listener failed: %s", e)
+
 
 
+async def _send_first_frames(client: ClientConnection, match_code: str, valkey: Valkey, cache: Valkey, last_event_id: str | None):
+    """
+    A reconnecting client gets the events it missed; a new client, or one too far behind,
+    gets a snapshot of the live match first. Live frames the first frames already cover are dropped.
+    """
+    if last_event_id is not None:
+        frames = await read_events_after(valkey, match_code, last_event_id, settings.MATCH_EVENT_REPLAY_MAX)
+        if frames is not None:
+            client.resume([frame for _, frame in frames], frames[-1][0] if frames else last_event_id)
+            global_logger.info("[WS] Replayed %d events to a client of match=%s", len(frames), match_code)
+            return
+    snapshot = await read_match_snapshot(valkey, cache, match_code)
+    client.resume([json.dumps(snapshot)], snapshot["event_id"])
+    global_logger.info("[WS] Sent a snapshot to a client of match=%s (last_event_id=%s)", match_code, last_event_id)
 
-async def handle_match_websocket(websocket: WebSocket, match_code: str, valkey: Valkey):
-    await manager.connect(match_code, websocket)
-    subscriber = valkey.pubsub()
-    await subscriber.subscribe(f"match:{match_code}:updates")
-    global_logger.info(f"[WS] Client connected to match={match_code}")
+
+
+async def handle_match_websocket(websocket: WebSocket, match_code: str, valkey: Valkey, cache: Valkey, last_event_id: str | None = None):
+    client = await manager.connect(
+        match_code,
+        websocket,
+        subscriber_factory=lambda: listen_to_valkey_pubsub(manager, match_code, valkey),
+        paused=True
+    )
+    global_logger.info("[WS] Client connected to match=%s", match_code)
 
     try:
-        await asyncio.gather(
-            listen_to_valkey_pubsub(manager, match_code, subscriber),
-            listen_to_websocket_client(websocket, match_code, valkey)
-        )
+        try:
+            await _send_first_frames(client, match_code, valkey, cache, last_event_id)
+        except Exception as e:
+            global_logger.error("[WS] Could not send the first frames for match=%s: %s", match_code, e)
+            client.resume([RESYNC_MESSAGE], None)
+        await listen_to_websocket_client(websocket, match_code, valkey)
     except WebSocketDisconnect:
         pass
     finally:
         manager.disconnect(match_code, websocket)
-        await subscriber.unsubscribe(f"match:{match_code}:updates")
-        global_logger.info(f"[WS] Disconnected from match={match_code}")
+        global_logger.info("[WS] Disconnected from match=%s", match_code)
+
+
+
+async def get_match_snapshot(match_code: str, pubsub: Valkey, cache: Valkey) -> GetMatchSnapshotResponse:
+    try:
+        snapshot = await read_match_snapshot(pubsub, cache, match_code)
+        return GetMatchSnapshotResponse(response={'data': snapshot})
+    except Exception as e:
+        global_logger.error("[API_SNAPSHOT] There's an error when reading the live state of match %s: %s", match_code, e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
 
 
@@ -75,7 +175,17 @@ async def trigger_start_timer(request: StartQuestionRequest, pubsub: Valkey) ->
         )
         return StartQuestionResponse(response={'message': result['message']})
     except Exception as e:
-        global_logger.error(f"[API_START] There's an error when triggering the question {request.question_code} for match {request.match_code}: {e}")
+        global_logger.error("[API_START] There's an error when triggering the question %s for match %s: %s", request.question_code, request.match_code, e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+
+async def trigger_cancel_timer(request: CancelTimerRequest, pubsub: Valkey) -> CancelTimerResponse:
+    try:
+        result = await stop_question_timer(pubsub=pubsub, match_code=request.match_code)
+        return CancelTimerResponse(response={'message': result['message'], 'cancelled': result['cancelled']})
+    except Exception as e:
+        global_logger.error("[API_CANCEL] There's an error when cancelling the timer for match %s: %s", request.match_code, e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
 
@@ -90,5 +200,5 @@ async def trigger_pick_question(request: PickQuestionRequest, pubsub: Valkey) ->
         )
         return PickQuestionResponse(response={'message': result['message']})
     except Exception as e:
-        global_logger.error(f"[API_START] There's an error when picking the question {request.question_code} by player {request.player_code} for match {request.match_code}: {e}")
+        global_logger.error("[API_START] There's an error when picking the question %s by player %s for match %s: %s", request.question_code, request.player_code, request.match_code, e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
\ No newline at end of file
@@ -2,15 +2,19 @@ from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
+from valkey.asyncio import Valkey
 
 from app.model.match import Match
+from app.model.question import Question
 from app.schema.match import *
 from app.logger import global_logger
+from app.utils.helpers import id_cache
+from app.utils.listing_cache import listing_cache
 
 
 
-async def post_match_to_db(request: PostMatchRequest, session: AsyncSession) -> PostMatchResponse:
+async def post_match_to_db(request: PostMatchRequest, session: AsyncSession, cache: Valkey) -> PostMatchResponse:
     global_logger.info(f"POST request received to create match with code: {request.match_code}.")
     new_match = Match(
         match_code = request.match_code,
@@ -23,6 +27,7 @@ async def post_match_to_db(request: PostMatchRequest, session: AsyncSession) ->
         await session.commit()
         await session.refresh(new_match)
         global_logger.info(f"Match created successfully. match_code={request.match_code}, match_id={new_match.id}")
+        await listing_cache.bump(cache, 'matches')
         return PostMatchResponse(
             response={'messsage': f'Add a match with match_code = {request.match_code} successfully!'}
         )
@@ -72,6 +77,12 @@ async def get_all_matches_from_db(session: AsyncSession) -> GetMatchResponse:
 
 
 
+async def get_all_matches_from_cache(session: AsyncSession, cache: Valkey, if_none_match: str | None = None) -> Response:
+    """All matches, served from the versioned listing cache (304 when the client's ETag is current)."""
+    return await listing_cache.respond(cache, 'matches', if_none_match, lambda: get_all_matches_from_db(session))
+
+
+
 async def get_match_from_match_code_from_db(match_code: str, session: AsyncSession) -> GetMatchResponse:
     global_logger.info(f"GET request received for match: {match_code} with players info.")
     try:
@@ -107,7 +118,7 @@ async def get_match_from_match_code_from_db(match_code: str, session: AsyncSessi
 
 
 
-async def delete_match_from_match_code_from_db(match_code: str, session: AsyncSession) -> DeleteMatchResponse:
+async def delete_match_from_match_code_from_db(match_code: str, session: AsyncSession, cache: Valkey) -> DeleteMatchResponse:
     """
     Soft-deletes a match identified by its unique match_code by setting is_deleted = True.
     Raises 404 if the match is not found.
@@ -134,6 +145,10 @@ async def delete_match_from_match_code_from_db(match_code: str, session: AsyncSe
                 detail=f'Match with match_code={match_code} not found.'
             )
 
+        # Question entries are keyed by match_id, which we don't have here; drop them all
+        id_cache.invalidate(Match.__tablename__, 'match_code', match_code)
+        id_cache.invalidate_table(Question.__tablename__)
+        await listing_cache.bump(cache, 'matches')
         global_logger.info(f"Match soft-deleted successfully. match_code: {match_code}.")
         return DeleteMatchResponse(
             response={'message': f'Match with match_code={match_code} soft-deleted successfully!'}
@@ -0,0 +1,39 @@
+from fastapi import HTTPException
+
+from app.dependencies.db import get_valkey_pool_stats
+from app.dependencies.ws import manager
+from app.utils.match_timer import timer_scheduler
+from app.utils.helpers import id_cache
+from app.utils.scoreboard_cache import scoreboard_keeper
+from app.utils.answer_writer import answer_writer
+from app.utils.listing_cache import listing_cache
+from app.dependencies.user import token_cache
+from app.schema.metrics import *
+from app.logger import global_logger, get_logging_stats
+
+
+
+async def get_runtime_metrics() -> GetMetricsResponse:
+    global_logger.debug("GET request received for runtime metrics.")
+    try:
+        return GetMetricsResponse(
+            response={
+                'data': {
+                    'valkey_pools': get_valkey_pool_stats(),
+                    'websockets': manager.get_stats(),
+                    'question_timers': timer_scheduler.get_stats(),
+                    'code_id_cache': id_cache.get_stats(),
+                    'token_cache': token_cache.get_stats(),
+                    'logging': get_logging_stats(),
+                    'scoreboard_cache': scoreboard_keeper.get_stats(),
+                    'answer_writer': answer_writer.get_stats(),
+                    'listing_cache': listing_cache.get_stats(),
+                }
+            }
+        )
+    except Exception:
+        global_logger.exception('Unexpected error occurred while collecting runtime metrics.')
+        raise HTTPException(
+            status_code=500,
+            detail='An unexpected error occurred while collecting runtime metrics.'
+        )
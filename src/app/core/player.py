@@ -1,19 +1,33 @@
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
+from valkey.asyncio import Valkey
 
 from app.model.player import Player
 from app.model.team import Team
 from app.schema.player import *
 from app.logger import global_logger
-from app.utils.helpers import _get_id_by_code
+from app.utils.helpers import _get_id_by_code, id_cache
+from app.utils.listing_cache import listing_cache
+from app.utils.fast_json import FastJSONResponse
+from app.utils.pagination import clamp_page_size, parse_fields, keyset_page_query, keyset_page, project_row
 
 
+# Columns the players listing can return (fields=...), in output order
+PLAYER_FIELDS = {
+    'player_code': Player.player_code,
+    'player_name': Player.player_name,
+    'team_code': Team.team_code,
+    'team_name': func.coalesce(Team.team_name, 'N/A'),
+}
+PLAYER_DEFAULT_FIELDS = ('player_name', 'team_name')
 
-async def post_player_to_db(request: PostPlayerRequest, session: AsyncSession) -> PostPlayerResponse:
+
+
+async def post_player_to_db(request: PostPlayerRequest, session: AsyncSession, cache: Valkey) -> PostPlayerResponse:
     global_logger.info(f"POST request received to create player with code: {request.player_code} for team: {request.team_code}.")
     
     # 1. Find the required Team ID
@@ -40,6 +54,7 @@ async def post_player_to_db(request: PostPlayerRequest, session: AsyncSession) -
         await session.commit()
         await session.refresh(new_player)
         global_logger.info(f"Player created successfully. player_id={new_player.id}, team_id={team_id}")
+        await listing_cache.bump(cache, 'players', 'teams')
         return PostPlayerResponse(
             response={'message': f'Player {request.player_code} created successfully for team {request.team_code}.'}
         )
@@ -61,7 +76,7 @@ async def post_player_to_db(request: PostPlayerRequest, session: AsyncSession) -
 
 
 
-async def put_player_to_db(request: PutPlayerRequest, session: AsyncSession) -> PutPlayerResponse:
+async def put_player_to_db(request: PutPlayerRequest, session: AsyncSession, cache: Valkey) -> PutPlayerResponse:
     global_logger.info(f"PUT request received for updating a player with player_code={request.player_code}.")
     try:
         player_query = select(Player).where(Player.player_code == request.player_code)
@@ -74,6 +89,7 @@ async def put_player_to_db(request: PutPlayerRequest, session: AsyncSession) ->
         await session.commit()
         await session.refresh(player_found)
         global_logger.info(f"Player updated successfully for player_code={request.player_code}")
+        await listing_cache.bump(cache, 'players', 'teams')
         return PutPlayerResponse(response={"message": "Player updated successfully!"})
     except HTTPException:
         raise
@@ -87,35 +103,37 @@ async def put_player_to_db(request: PutPlayerRequest, session: AsyncSession) ->
 
 
 
-async def get_all_players_from_db(session: AsyncSession) -> GetPlayerResponse:
-    global_logger.info("GET request received for all players.")
+async def get_all_players_from_db(session: AsyncSession, limit: int | None = None, cursor: str | None = None, fields: str | None = None) -> FastJSONResponse:
+    """
+    One page of players in (created_at, id) order with only the requested fields selected;
+    pass the returned next_cursor to get the following page.
+    """
+    global_logger.info("GET request received for all players (cursor=%s).", cursor)
     try:
-        players_query = (
-            select(Player)
-            .options(joinedload(Player.team))
-        )
-        execution = await session.execute(players_query)
-        result = execution.unique().scalars().all()
+        limit = clamp_page_size(limit)
+        selected = parse_fields(fields, PLAYER_FIELDS, PLAYER_DEFAULT_FIELDS)
+        players_query = select(*[PLAYER_FIELDS[name].label(name) for name in selected]).select_from(Player)
+        if any(name.startswith('team_') for name in selected):
+            players_query = players_query.outerjoin(Team, Player.team_id == Team.id)
+        players_query = keyset_page_query(players_query, Player.created_at, Player.id, limit, cursor)
+        rows = (await session.execute(players_query)).all()
         
-        if not result:
+        if not rows and cursor is None:
             global_logger.warning("No players found in the database. Returning 404.")
             raise HTTPException(
                 status_code=404,
                 detail='No players found!'
             )
+        page, next_cursor = keyset_page(rows, limit)
             
-        global_logger.info(f"Successfully retrieved {len(result)} players.")
+        global_logger.info(f"Successfully retrieved {len(page)} players.")
             
-        return GetPlayerResponse(
+        return FastJSONResponse(GetPlayerResponse.model_construct(
             response={
-                'data': [
-                {
-                    'player_name': res.player_name,
-                    'team_name': res.team.team_name if res.team else 'N/A'
-                }
-                for res in result]
+                'data': [project_row(row, selected) for row in page],
+                'next_cursor': next_cursor,
             }
-        )
+        ))
     except HTTPException:
         raise
     except Exception:
@@ -126,6 +144,25 @@ async def get_all_players_from_db(session: AsyncSession) -> GetPlayerResponse:
         )
 
 
+
+async def get_all_players_from_cache(
+    session: AsyncSession,
+    cache: Valkey,
+    if_none_match: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None
+) -> Response:
+    """
+    The first page with the default fields is what screens poll: it is served from the versioned
+    listing cache (304 when the client's ETag is current). Other pages / projections go to the DB.
+    """
+    if limit is not None or cursor is not None or fields is not None:
+        return await get_all_players_from_db(session, limit, cursor, fields)
+    return await listing_cache.respond(cache, 'players', if_none_match, lambda: get_all_players_from_db(session))
+
+
+
 async def get_player_from_player_code_from_db(
     player_code: str, 
     session: AsyncSession
@@ -166,7 +203,7 @@ async def get_player_from_player_code_from_db(
 
 
 
-async def delete_player_from_player_code_from_db(player_code: str, session: AsyncSession) -> DeletePlayerResponse:
+async def delete_player_from_player_code_from_db(player_code: str, session: AsyncSession, cache: Valkey) -> DeletePlayerResponse:
     global_logger.info(f"DELETE request received for player with player_code={player_code} (soft-delete).")
     try:
         # 1. Use an efficient bulk update statement
@@ -192,6 +229,8 @@ async def delete_player_from_player_code_from_db(player_code: str, session: Asyn
                 detail=f'No player with player_code={player_code} existed'
             )
 
+        id_cache.invalidate(Player.__tablename__, 'player_code', player_code)
+        await listing_cache.bump(cache, 'players', 'teams')
         global_logger.info(f"Player soft-deleted successfully for player_code={player_code}")
         return DeletePlayerResponse(response={"message": "Player deleted successfully!"})
 
@@ -1,29 +1,75 @@
-from sqlalchemy import select, update
+from sqlalchemy import select, update, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
-import io
 import re
-import pandas as pd
+import uuid
+import asyncio
+import multiprocessing
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from fastapi import HTTPException, UploadFile
 from fastapi.responses import StreamingResponse
 
+from app.config import settings
 from app.model.match import Match
-from app.model.question import Question
+from app.model.question import Question, utcnow
 from app.schema.question import *
 from app.logger import global_logger
-from app.utils.helpers import _get_id_by_code
+from app.utils.helpers import _get_id_by_code, id_cache
+from app.utils.excel_export import ExcelSheet, stream_query_batches, stream_xlsx, XLSX_MEDIA_TYPE
+from app.utils.question_workbook import SHEET_NAMES, convert_sheet_name_to_round_code, parse_question_workbook
+from app.utils.fast_json import FastJSONResponse
+from app.utils.pagination import clamp_page_size, parse_fields, keyset_page_query, keyset_page
 
 
-SHEET_NAMES = ['LAM_NONG', 'VUOT_DEO', 'BUT_PHA', 'NUOC_RUT']
-XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+QUESTION_UPSERT_BATCH_SIZE = 1000   # rows per INSERT ... ON CONFLICT statement
 
+# Columns the questions listing can return (fields=...), in output order; all of them by default
+QUESTION_FIELDS = {
+    'question_code': Question.question_code,
+    'content': Question.content,
+    'correct_answers': Question.correct_answers,
+    'extra_info': Question.extra_info,
+}
 
+# Workbooks are parsed in a separate process: openpyxl is pure Python and holds the GIL,
+# so even a worker thread would stall the event loop on a large question bank.
+_import_pool: ProcessPoolExecutor | None = None
 
-def convert_sheet_name_to_round_code(sheet_name: str) -> str:
-    parts = sheet_name.split("_")
-    return "".join([part[0] for part in parts])
+
+
+def _get_import_pool() -> ProcessPoolExecutor:
+    global _import_pool
+    if _import_pool is None:
+        _import_pool = ProcessPoolExecutor(
+            max_workers=settings.QUESTION_IMPORT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _import_pool
+
+
+
+def shutdown_import_pool():
+    global _import_pool
+    if _import_pool is not None:
+        _import_pool.shutdown(wait=False, cancel_futures=True)
+        _import_pool = None
+
+
+
+async def _parse_question_workbook_off_loop(content: bytes) -> tuple[list[dict], list[dict]]:
+    global _import_pool
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_import_pool(), parse_question_workbook, content)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed on a huge file): start a fresh pool for the next upload
+        _import_pool = None
+        raise
 
 
 
@@ -54,7 +100,7 @@ async def post_question_to_db(request: PostQuestionRequest, session: AsyncSessio
 
 async def post_questions_file_to_db(file: UploadFile, session: AsyncSession) -> PostQuestionResponse:
     filename = file.filename
-    global_logger.info(f"Uploading file: {filename}")
+    global_logger.info("Uploading file: %s", filename)
     try:
         pattern = r'^OGD3_M[\w-]+\.xls(x)?$'
         if not re.match(pattern, filename):
@@ -62,35 +108,61 @@ async def post_questions_file_to_db(file: UploadFile, session: AsyncSession) ->
         match_code = filename.split(".")[0].split("_")[1]
         match_id = await _get_id_by_code(session, Match, 'match_code', match_code, 'Match')
         content = await file.read()
-        io_buf = io.BytesIO(content)
-        questions = []
-        for sheet in SHEET_NAMES:
-            io_buf.seek(0)
-            df = pd.read_excel(io_buf, sheet)
-            for row in df.to_dict('records'):
-                extra_info = {}
-                for k, col_name in {
-                    "media_sources": "Media",
-                    "explaination": "Giải thích",
-                    "citation": "Nguồn tham khảo",
-                    "note": "Ghi chú"
-                }.items():
-                    val = row.get(col_name)
-                    if pd.notna(val): extra_info[k] = val
-                questions.append(Question(
-                    match_id=match_id,
-                    question_code=str(row['Code']),
-                    content=str(row['Câu hỏi']),
-                    correct_answers=str(row['Đáp án']),
-                    extra_info=extra_info
-                ))
-
-        session.add_all(questions)
+        questions, diagnostics = await _parse_question_workbook_off_loop(content)
+        if not questions:
+            raise HTTPException(422, {'message': f'No valid questions found in {filename}', 'diagnostics': diagnostics})
+
+        inserted = updated = 0
+        now = utcnow()
+        for start in range(0, len(questions), QUESTION_UPSERT_BATCH_SIZE):
+            # The listing pages on (created_at, id): one microsecond apart keeps the new rows in sheet order
+            statement = insert(Question).values([
+                {
+                    **question,
+                    'id': uuid.uuid4(),
+                    'match_id': match_id,
+                    'created_at': now + timedelta(microseconds=index),
+                    'updated_at': now,
+                    'is_used': False,
+                    'is_deleted': False,
+                }
+                for index, question in enumerate(questions[start:start + QUESTION_UPSERT_BATCH_SIZE], start)
+            ])
+            statement = statement.on_conflict_do_update(
+                constraint='uq_questions_match_id_question_code',
+                set_={
+                    'content': statement.excluded.content,
+                    'correct_answers': statement.excluded.correct_answers,
+                    'extra_info': statement.excluded.extra_info,
+                    'is_deleted': False,
+                    'updated_at': now,
+                }
+            ).returning(literal_column('(xmax = 0)').label('inserted'))
+            # xmax is 0 only on freshly inserted row versions
+            for (was_inserted,) in (await session.execute(statement)).all():
+                if was_inserted:
+                    inserted += 1
+                else:
+                    updated += 1
         await session.commit()
-        return PostQuestionResponse(response={'message': f'Uploaded {len(questions)} questions for match_code={match_code} successfully'})
-    except IntegrityError:
+        id_cache.invalidate_table(Question.__tablename__)
+        global_logger.info(
+            "Imported %s: %d inserted, %d updated, %d diagnostics",
+            filename, inserted, updated, len(diagnostics)
+        )
+        return PostQuestionResponse(response={
+            'message': f'Uploaded {inserted + updated} questions for match_code={match_code} successfully',
+            'data': {
+                'match_code': match_code,
+                'inserted': inserted,
+                'updated': updated,
+                'skipped': sum(1 for d in diagnostics if d['row'] is not None),
+                'diagnostics': diagnostics,
+            }
+        })
+    except HTTPException:
         await session.rollback()
-        raise HTTPException(409, 'Duplicate question codes found in file')
+        raise
     except Exception as e:
         await session.rollback()
         global_logger.exception("Error uploading questions file")
@@ -98,27 +170,33 @@ async def post_questions_file_to_db(file: UploadFile, session: AsyncSession) ->
 
 
 
-async def get_all_questions_from_match_code_from_db(match_code: str, session: AsyncSession) -> GetQuestionResponse:
+async def get_all_questions_from_match_code_from_db(
+    match_code: str,
+    session: AsyncSession,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None
+) -> FastJSONResponse:
+    """
+    One page of the match's questions in (created_at, id) order. `fields` limits the columns
+    read, e.g. fields=question_code skips the content and extra_info payloads entirely.
+    """
     try:
+        limit = clamp_page_size(limit)
+        selected = parse_fields(fields, QUESTION_FIELDS, tuple(QUESTION_FIELDS))
         match_id = await _get_id_by_code(session, Match, 'match_code', match_code, 'Match')
-        result = await session.execute(select(Question).where(Question.match_id == match_id))
-        questions = result.scalars().all()
-        if not questions:
+        questions_query = select(*[QUESTION_FIELDS[name].label(name) for name in selected]).where(Question.match_id == match_id)
+        rows = (await session.execute(keyset_page_query(questions_query, Question.created_at, Question.id, limit, cursor))).all()
+        if not rows and cursor is None:
             raise HTTPException(404, f'No questions found for match {match_code}')
-        return GetQuestionResponse(response={
+        page, next_cursor = keyset_page(rows, limit)
+        return FastJSONResponse(GetQuestionResponse.model_construct(response={
             'data': {
                 'match_code': match_code,
-                'questions': [
-                    {
-                        'question_code': q.question_code,
-                        'content': q.content,
-                        'correct_answers': q.correct_answers,
-                        **(q.extra_info or {})
-                    }
-                    for q in questions
-                ]
+                'questions': [_question_entry(row, selected) for row in page],
+                'next_cursor': next_cursor,
             }
-        })
+        }))
     except HTTPException:
         raise
     except Exception as e:
@@ -127,45 +205,55 @@ async def get_all_questions_from_match_code_from_db(match_code: str, session: As
 
 
 
+def _question_entry(row, selected: list[str]) -> dict:
+    # extra_info keys are spread into the question, as before
+    entry = {name: row._mapping[name] for name in selected if name != 'extra_info'}
+    if 'extra_info' in selected:
+        entry.update(row.extra_info or {})
+    return entry
+
+
+
 async def get_all_questions_from_match_code_to_excel_file_from_db(match_code: str, session: AsyncSession) -> StreamingResponse:
     try:
         match_id = await _get_id_by_code(session, Match, 'match_code', match_code, 'Match')
-        buffer = io.BytesIO()
         response_name = f'OGD3_{match_code}_exported.xlsx'
-        total = 0
-
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            for sheet in SHEET_NAMES:
-                code_prefix = convert_sheet_name_to_round_code(sheet)
-                result = await session.execute(
-                    select(Question).where(
-                        Question.match_id == match_id,
-                        Question.question_code.like(f'{code_prefix}%')
-                    )
-                )
-                questions = result.scalars().all()
-                total += len(questions)
-
-                data = []
-                for q in questions:
-                    info = q.extra_info or {}
-                    data.append({
-                        'Code': q.question_code,
-                        'Câu hỏi': q.content,
-                        'Đáp án': q.correct_answers,
-                        'Media': info.get('media_sources') if info.get('media_sources') else '',
-                        'Giải thích': info.get('explaination') if info.get('explaination') else '',
-                        'Nguồn tham khảo': info.get('citation') if info.get('citation') else '',
-                        'Ghi chú': info.get('note') if info.get('note') else ''
-                    })
-                pd.DataFrame(data).to_excel(writer, sheet_name=sheet, index=False)
-
-        buffer.seek(0)
+
+        def question_to_row(q):
+            info = q.extra_info or {}
+            return (
+                q.question_code,
+                q.content,
+                q.correct_answers,
+                info.get('media_sources') or '',
+                info.get('explaination') or '',
+                info.get('citation') or '',
+                info.get('note') or '',
+            )
+
+        sheets = []
+        for sheet in SHEET_NAMES:
+            code_prefix = convert_sheet_name_to_round_code(sheet)
+            questions_query = select(
+                Question.question_code, Question.content, Question.correct_answers, Question.extra_info
+            ).where(
+                Question.match_id == match_id,
+                Question.question_code.like(f'{code_prefix}%')
+            )
+            sheets.append(ExcelSheet(
+                name=sheet,
+                header=['Code', 'Câu hỏi', 'Đáp án', 'Media', 'Giải thích', 'Nguồn tham khảo', 'Ghi chú'],
+                batches=lambda query=questions_query: stream_query_batches(query),
+                to_row=question_to_row,
+            ))
+
         return StreamingResponse(
-            buffer,
-            media_type=XLSX_MIME_TYPE,
+            stream_xlsx(sheets, response_name),
+            media_type=XLSX_MEDIA_TYPE,
             headers={"Content-Disposition": f"attachment; filename={response_name}"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         global_logger.exception("Error exporting questions")
         raise HTTPException(500, f'Unexpected error: {e}')
@@ -181,6 +269,7 @@ async def delete_all_questions_from_match_code_in_db(match_code: str, session: A
         q = update(Question).where(Question.match_id == match_id_sub).values(is_deleted=True)
         res = await session.execute(q)
         await session.commit()
+        id_cache.invalidate_table(Question.__tablename__)
         return DeleteQuestionResponse(response={'message': f'Soft-deleted {res.rowcount} questions'})
     except Exception as e:
         await session.rollback()
@@ -1,13 +1,11 @@
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 
 from valkey.asyncio import Valkey
 
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
-import io
-import pandas as pd
 
 from app.model.player import Player
 from app.model.match import Match
@@ -15,42 +13,37 @@ from app.model.record import Record
 from app.model.question import Question
 from app.schema.record import *
 from app.logger import global_logger
-<<<<<<< HEAD
-from app.utils.get_id_by_code import _get_id_by_code
-from app.utils.ws_event import publish_ws_event
+from app.utils.helpers import _get_ids_by_codes, _get_question_id_by_code
+from app.utils.scoreboard_cache import apply_score_delta, begin_score_change, cancel_score_change, discard_scoreboard, scoreboard_keeper
+from app.utils.excel_export import ExcelSheet, stream_query_batches, stream_xlsx, XLSX_MEDIA_TYPE
+from app.utils.fast_json import FastJSONResponse
+from app.utils.pagination import clamp_page_size, parse_fields, keyset_page_query, keyset_page, project_row
 
 
-MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-=======
-from app.utils.helpers import _get_id_by_code
-from app.utils.match_event import publish_ws_event
->>>>>>> feature/app
-
-
-MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Columns the records listings can return (fields=...), in output order
+RECORD_FIELDS = {
+    'player_code': func.coalesce(Player.player_code, 'N/A'),
+    'match_code': func.coalesce(Match.match_code, 'N/A'),
+    'question_code': func.coalesce(Question.question_code, 'N/A'),
+    'd_score_earned': Record.d_score_earned,
+    'created_at': Record.created_at,
+    'updated_at': Record.updated_at,
+}
+PLAYER_RECORD_DEFAULT_FIELDS = ('match_code', 'question_code', 'd_score_earned', 'updated_at')
+MATCH_RECORD_DEFAULT_FIELDS = ('player_code', 'question_code', 'd_score_earned', 'updated_at')
 
 
 
 async def post_record_to_db(request: PostRecordRequest, cache: Valkey, session: AsyncSession) -> PostRecordResponse:
-    global_logger.info(f"POST request received to create record for player: {request.player_code} in match: {request.match_code}.")
+    global_logger.info("POST request received to create record for player: %s in match: %s.", request.player_code, request.match_code)
     try:
-        # 1. Validate Player and Match existence
-        player_id = await _get_id_by_code(session, Player, 'player_code', request.player_code, 'Player')
-        match_id = await _get_id_by_code(session, Match, 'match_code', request.match_code, 'Match')
-        stmt = select(Question).where(
-            Question.match_id == match_id,
-            Question.question_code == request.question_code
-        )
-        result = await session.execute(stmt)
-        existing_question = result.scalars().first()
-        if existing_question:
-            question_id = existing_question.id
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f'An unexpected error occurred during question finding.'
-            )
-        global_logger.debug(f"Player ID: {player_id}, Match ID: {match_id}, Question ID: {question_id}")
+        # 1. Validate Player, Match and Question existence (cached, misses resolved in one query)
+        player_id, match_id = await _get_ids_by_codes(session, [
+            (Player, 'player_code', request.player_code, 'Player'),
+            (Match, 'match_code', request.match_code, 'Match'),
+        ])
+        question_id = await _get_question_id_by_code(session, match_id, request.question_code)
+        global_logger.debug("Player ID: %s, Match ID: %s, Question ID: %s", player_id, match_id, question_id)
 
         # 2. Create the new Record object
         new_record = Record(
@@ -60,30 +53,29 @@ async def post_record_to_db(request: PostRecordRequest, cache: Valkey, session:
             question_id = question_id
         )
         session.add(new_record)
-        global_logger.debug(f"Record object created and added to session.")
+        global_logger.debug("Record object created and added to session.")
 
-        # 3. Commit
-        await session.commit()
+        # 3. Commit, announced to the scoreboard so a rebuild can't count it and then get the delta too
+        change_token = await begin_score_change(cache, request.match_code)
+        try:
+            await session.commit()
+        except Exception:
+            await cancel_score_change(cache, request.match_code, change_token)
+            raise
         await session.refresh(new_record)
-        global_logger.info(f"Record created successfully. record_id={new_record.id}")
+        global_logger.info("Record created successfully. record_id=%s", new_record.id)
 
-        # 4. Update cummulative D score in cache
-        valkey_key = f"scoreboard:{request.match_code}"
+        # 4. Update cummulative D score in cache and notify clients (single round trip)
         try:
-            await cache.hincrby(valkey_key, request.player_code, request.d_score_earned)
-            new_total_raw = await cache.hget(valkey_key, request.player_code)
-            new_total_score = int(new_total_raw or 0)
-            event = {
-                "type": "player_score_updated",
-                "match_code": request.match_code,
-                "player_code": request.player_code,
-                "d_score_earned": request.d_score_earned,
-                "new_total_score": new_total_score
-            }
-            await publish_ws_event(cache, request.match_code, event)
-            global_logger.info(f"Cache updated {request.player_code} {request.d_score_earned:+d} = {new_total_score} (match={request.match_code})")
+            score_event = await apply_score_delta(
+                cache, request.match_code, request.player_code, request.d_score_earned, request.d_score_earned, change_token
+            )
+            global_logger.info(
+                "Cache updated %s %+d = %s, rank %s (match=%s)",
+                request.player_code, request.d_score_earned, score_event['new_total_score'], score_event['rank'], request.match_code
+            )
         except Exception as valkey_err:
-            global_logger.warning(f"Failed to update scoreboard for match={request.match_code}, player={request.player_code}: {valkey_err}")
+            global_logger.warning("Failed to update scoreboard for match=%s, player=%s: %s", request.match_code, request.player_code, valkey_err)
         return PostRecordResponse(
             response={
                 "message": f"Record created successfully for player={request.player_code}, match={request.match_code}, question={request.question_code}."
@@ -91,9 +83,16 @@ async def post_record_to_db(request: PostRecordRequest, cache: Valkey, session:
         )
     except HTTPException:
         raise
+    except IntegrityError:
+        await session.rollback()
+        global_logger.warning("Duplicate record for player_code=%s, match_code=%s, question_code=%s.", request.player_code, request.match_code, request.question_code)
+        raise HTTPException(
+            status_code=409,
+            detail=f'A record already exists for player={request.player_code}, match={request.match_code}, question={request.question_code}. Use PUT to change it.'
+        )
     except Exception:
         await session.rollback()
-        global_logger.exception(f'Unexpected error during record creation/commit for player_code={request.player_code}, match_code={request.match_code}, question_code={request.question_code}.')
+        global_logger.exception('Unexpected error during record creation/commit for player_code=%s, match_code=%s, question_code=%s.', request.player_code, request.match_code, request.question_code)
         raise HTTPException(
             status_code=500,
             detail=f'An unexpected error occurred during record creation.'
@@ -102,18 +101,22 @@ async def post_record_to_db(request: PostRecordRequest, cache: Valkey, session:
 
 
 async def put_record_to_db(request: PutRecordRequest, cache: Valkey, session: AsyncSession) -> PutRecordResponse:
-    global_logger.info(f"PUT request received to update record for player: {request.player_code} in match: {request.match_code}.")
+    global_logger.info("PUT request received to update record for player: %s in match: %s.", request.player_code, request.match_code)
     try:
-        player_id = await _get_id_by_code(session, Player, 'player_code', request.player_code, 'Player')
-        match_id = await _get_id_by_code(session, Match, 'match_code', request.match_code, 'Match')
-        question_id = await _get_id_by_code(session, Question, 'question_code', request.question_code)
-        global_logger.debug(f"Player ID: {player_id}, Match ID: {match_id}, Question ID: {question_id}")
+        player_id, match_id = await _get_ids_by_codes(session, [
+            (Player, 'player_code', request.player_code, 'Player'),
+            (Match, 'match_code', request.match_code, 'Match'),
+        ])
+        question_id = await _get_question_id_by_code(session, match_id, request.question_code)
+        global_logger.debug("Player ID: %s, Match ID: %s, Question ID: %s", player_id, match_id, question_id)
         record_query = (
             select(Record)
             .where(
                 Record.player_id == player_id, 
                 Record.match_id == match_id, 
-                Record.question_id == question_id
+                Record.question_id == question_id,
+                # Soft-deleted rows may share the key with the live one (the unique index is partial)
+                Record.is_deleted.is_(False)
             )
         )
         execution = await session.execute(record_query)
@@ -123,33 +126,32 @@ async def put_record_to_db(request: PutRecordRequest, cache: Valkey, session: As
         old_score = int(record_found.d_score_earned or 0)
         new_score = int(request.d_score_earned)
         delta = new_score - old_score
-        global_logger.debug(f"Score change computed: old={old_score}, new={new_score}, delta={delta}")
+        global_logger.debug("Score change computed: old=%s, new=%s, delta=%s", old_score, new_score, delta)
         record_found.d_score_earned = new_score
-        await session.commit()
+        change_token = await begin_score_change(cache, request.match_code)
+        try:
+            await session.commit()
+        except Exception:
+            await cancel_score_change(cache, request.match_code, change_token)
+            raise
         await session.refresh(record_found)
-        global_logger.info(f"Record updated successfully for player_code={request.player_code}, match_code={request.match_code}, question_code={request.question_code}")
+        global_logger.info("Record updated successfully for player_code=%s, match_code=%s, question_code=%s", request.player_code, request.match_code, request.question_code)
         try:
-            valkey_key = f"scoreboard:{request.match_code}"
-            await cache.hincrby(valkey_key, request.player_code, delta)
-            new_total_raw = await cache.hget(valkey_key, request.player_code)
-            new_total_score = int(new_total_raw or 0)
-            event = {
-                "type": "player_score_updated",
-                "match_code": request.match_code,
-                "player_code": request.player_code,
-                "d_score_earned": request.d_score_earned,
-                "new_total_score": new_total_score
-            }
-            await publish_ws_event(cache, request.match_code, event)
-            global_logger.info(f"Cache updated: {request.player_code} {old_score} -> {new_score} = {new_total_score} (match={request.match_code})")
+            score_event = await apply_score_delta(
+                cache, request.match_code, request.player_code, delta, request.d_score_earned, change_token
+            )
+            global_logger.info(
+                "Cache updated: %s %s -> %s = %s, rank %s (match=%s)",
+                request.player_code, old_score, new_score, score_event['new_total_score'], score_event['rank'], request.match_code
+            )
         except Exception as valkey_err:
-            global_logger.warning(f"Failed to update scoreboard for match={request.match_code}, player={request.player_code}: {valkey_err}")
+            global_logger.warning("Failed to update scoreboard for match=%s, player=%s: %s", request.match_code, request.player_code, valkey_err)
         return PutRecordResponse(response={"message": "Record updated successfully!"})
     except HTTPException:
         raise
     except Exception:
         await session.rollback()
-        global_logger.exception(f'Unexpected error during record update for player_code={request.player_code}, match_code={request.match_code}.')
+        global_logger.exception('Unexpected error during record update for player_code=%s, match_code=%s.', request.player_code, request.match_code)
         raise HTTPException(
             status_code=500,
             detail=f'An unexpected error occurred during record update.'
@@ -157,54 +159,61 @@ async def put_record_to_db(request: PutRecordRequest, cache: Valkey, session: As
 
 
 
-async def get_all_records_from_player_code_from_db(player_code: str, session: AsyncSession) -> GetRecordsResponse:
-    global_logger.info(f"GET request received for all records of player: {player_code}.")
+def _records_page_query(owner_filter, selected: list[str], limit: int, cursor: str | None):
+    """The page's records with only the selected columns; matches / questions / players joined only when asked for."""
+    records_query = select(*[RECORD_FIELDS[name].label(name) for name in selected]).select_from(Record).where(owner_filter)
+    if 'match_code' in selected:
+        records_query = records_query.outerjoin(Match, Record.match_id == Match.id)
+    if 'question_code' in selected:
+        records_query = records_query.outerjoin(Question, Record.question_id == Question.id)
+    if 'player_code' in selected:
+        records_query = records_query.outerjoin(Player, Record.player_id == Player.id)
+    return keyset_page_query(records_query, Record.created_at, Record.id, limit, cursor)
+
+
+
+async def get_all_records_from_player_code_from_db(
+    player_code: str,
+    session: AsyncSession,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None
+) -> FastJSONResponse:
+    global_logger.info("GET request received for records of player: %s (cursor=%s).", player_code, cursor)
     try:
+        limit = clamp_page_size(limit)
+        selected = parse_fields(fields, RECORD_FIELDS, PLAYER_RECORD_DEFAULT_FIELDS)
         # 1. Find Player ID and Info
-        player_query = select(Player).where(Player.player_code == player_code)
+        player_query = select(Player.id, Player.player_code, Player.player_name).where(Player.player_code == player_code)
         execution = await session.execute(player_query)
-        player_found = execution.unique().scalar_one_or_none()
+        player_found = execution.one_or_none()
         if player_found is None:
-            global_logger.warning(f"Player not found: player_code={player_code}. Returning 404.")
+            global_logger.warning("Player not found: player_code=%s. Returning 404.", player_code)
             raise HTTPException(
                 status_code=404,
                 detail=f'Player with player_code={player_code} not found!'
             )
 
-        # 2. Query Records
-        records_query = (
-            select(Record)
-            .where(Record.player_id == player_found.id)
-            .options(joinedload(Record.match))
-            .options(joinedload(Record.question))
-            .order_by(Record.created_at)
-        )
-        execution = await session.execute(records_query)
-        records_list = execution.scalars().all()
+        # 2. Query one page of records
+        rows = (await session.execute(_records_page_query(Record.player_id == player_found.id, selected, limit, cursor))).all()
+        page, next_cursor = keyset_page(rows, limit)
         
-        global_logger.info(f"Successfully retrieved {len(records_list)} records for player: {player_code}.")
+        global_logger.info("Successfully retrieved %s records for player: %s.", len(page), player_code)
         
-        return GetRecordsResponse(
+        return FastJSONResponse(GetRecordsResponse.model_construct(
             response={
                 'data': {
                     'player_code': player_found.player_code,
                     'player_name': player_found.player_name,
-                    'records': [
-                        {
-                            'match_code': record.match.match_code if record.match else 'N/A', # Access match_code via relationship
-                            'question_code': record.question.question_code if record.question else 'N/A',
-                            'd_score_earned': record.d_score_earned,
-                            'updated_at': record.updated_at.isoformat()
-                        } 
-                        for record in records_list
-                    ]
+                    'records': [project_row(row, selected) for row in page],
+                    'next_cursor': next_cursor,
                 }
             }
-        )
+        ))
     except HTTPException:
         raise
     except Exception:
-        global_logger.exception(f'Unexpected error occurred while fetching records for player_code={player_code}.')
+        global_logger.exception('Unexpected error occurred while fetching records for player_code=%s.', player_code)
         raise HTTPException(
             status_code=500,
             detail=f'An unexpected error occurred while fetching records.'
@@ -212,53 +221,48 @@ async def get_all_records_from_player_code_from_db(player_code: str, session: As
 
 
 
-async def get_all_records_from_match_code_from_db(match_code: str, session: AsyncSession) -> GetRecordsResponse:
-    global_logger.info(f"GET request received for all records of match: {match_code}.")
+async def get_all_records_from_match_code_from_db(
+    match_code: str,
+    session: AsyncSession,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None
+) -> FastJSONResponse:
+    global_logger.info("GET request received for records of match: %s (cursor=%s).", match_code, cursor)
     try:
+        limit = clamp_page_size(limit)
+        selected = parse_fields(fields, RECORD_FIELDS, MATCH_RECORD_DEFAULT_FIELDS)
         # 1. Find Match ID and Info
-        match_query = select(Match).where(Match.match_code == match_code)
+        match_query = select(Match.id, Match.match_code, Match.match_name).where(Match.match_code == match_code)
         execution = await session.execute(match_query)
-        match_found = execution.unique().scalar_one_or_none()
+        match_found = execution.one_or_none()
         if match_found is None:
-            global_logger.warning(f"Match not found: match_code={match_code}. Returning 404.")
+            global_logger.warning("Match not found: match_code=%s. Returning 404.", match_code)
             raise HTTPException(
                 status_code=404,
                 detail=f'Match with match_code={match_code} not found!' # Fixed detail message
             )
 
-        # 2. Query Records
-        records_query = (
-            select(Record)
-            .where(Record.match_id == match_found.id) # Use match_found.id
-            .options(joinedload(Record.player)) # Assuming relation is to 'player'
-            .options(joinedload(Record.question))
-            .order_by(Record.created_at)
-        )
-        execution = await session.execute(records_query)
-        records_list = execution.scalars().all() # Changed result to records_list
+        # 2. Query one page of records
+        rows = (await session.execute(_records_page_query(Record.match_id == match_found.id, selected, limit, cursor))).all()
+        page, next_cursor = keyset_page(rows, limit)
         
-        global_logger.info(f"Successfully retrieved {len(records_list)} records for match: {match_code}.")
+        global_logger.info("Successfully retrieved %s records for match: %s.", len(page), match_code)
         
-        return GetRecordsResponse(
+        return FastJSONResponse(GetRecordsResponse.model_construct(
             response={
                 'data': {
                     'match_code': match_found.match_code,
                     'match_name': match_found.match_name,
-                    'records': [
-                        {
-                            'player_code': record.player.player_code if record.player else 'N/A',
-                            'question_code': record.question.question_code if record.question else 'N/A',
-                            'd_score_earned': record.d_score_earned,
-                            'updated_at': record.updated_at.isoformat()
-                        }
-                    for record in records_list]
+                    'records': [project_row(row, selected) for row in page],
+                    'next_cursor': next_cursor,
                 }
             }
-        )
+        ))
     except HTTPException:
         raise
     except Exception:
-        global_logger.exception(f'Unexpected error occurred while fetching records for match_code={match_code}.')
+        global_logger.exception('Unexpected error occurred while fetching records for match_code=%s.', match_code)
         raise HTTPException(
             status_code=500,
             detail=f'An unexpected error occurred while fetching records.'
@@ -267,62 +271,44 @@ async def get_all_records_from_match_code_from_db(match_code: str, session: Asyn
 
 
 async def get_all_records_from_match_code_from_db_exported_to_excel_file(match_code: str, session: AsyncSession) -> StreamingResponse:
-    global_logger.info(f"GET request received for all records of match: {match_code}, exporting to Excel.")
+    global_logger.info("GET request received for all records of match: %s, exporting to Excel.", match_code)
     try:
-        buffer = io.BytesIO()
         response_name = f'OGD3_{match_code}_records_exported.xlsx'
-        
-        # 1. Find Match ID and Info
-        match_query = select(Match).where(Match.match_code == match_code)
+
+        # 1. Find Match ID (404 before the response starts streaming)
+        match_query = select(Match.id).where(Match.match_code == match_code)
         execution = await session.execute(match_query)
-        match_found = execution.unique().scalar_one_or_none()
-        if match_found is None:
-            global_logger.warning(f"Match not found: match_code={match_code}. Returning 404.")
+        match_id = execution.scalar_one_or_none()
+        if match_id is None:
+            global_logger.warning("Match not found: match_code=%s. Returning 404.", match_code)
             raise HTTPException(
                 status_code=404,
                 detail=f'Match with match_code={match_code} not found!'
             )
 
-        # 2. Query Records
+        # 2. Stream the records straight from a server-side cursor into the workbook
         records_query = (
-            select(Record)
-            .where(Record.match_id == match_found.id)
-            .options(joinedload(Record.player))
-            .options(joinedload(Record.question))
+            select(Record.updated_at, Question.question_code, Player.player_code, Record.d_score_earned)
+            .join(Question, Question.id == Record.question_id)
+            .join(Player, Player.id == Record.player_id)
+            .where(Record.match_id == match_id)
             .order_by(Record.created_at)
         )
-        execution = await session.execute(records_query)
-        records_list = execution.scalars().all()
-        
-        global_logger.info(f"Successfully retrieved {len(records_list)} records for match: {match_code}.")
-        
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            data = []
-            for record in records_list:
-                data.append({
-                    'Mốc thời gian cập nhật': record.updated_at.isoformat(),
-                    'Mã câu hỏi': record.question.question_code if record.question else 'N/A',
-                    'Mã thí sinh': record.player.player_code if record.player else 'N/A',
-                    'Điểm D nhận được': record.d_score_earned,
-                })
-
-            if data:
-                df = pd.DataFrame(data)
-                df.to_excel(writer, index=False, sheet_name=match_found.match_code)
-
-
-        buffer.seek(0)
-        return StreamingResponse( 
-            content=buffer,
-            media_type=MEDIA_TYPE,
+        sheet = ExcelSheet(
+            name=match_code,
+            header=['Mốc thời gian cập nhật', 'Mã câu hỏi', 'Mã thí sinh', 'Điểm D nhận được'],
+            batches=lambda: stream_query_batches(records_query),
+            to_row=lambda r: (r.updated_at.isoformat(), r.question_code, r.player_code, r.d_score_earned),
+        )
+        return StreamingResponse(
+            content=stream_xlsx([sheet], response_name),
+            media_type=XLSX_MEDIA_TYPE,
             headers={'Content-Disposition': f'attachment; filename="{response_name}"'}
         )
-
-
     except HTTPException:
         raise
     except Exception:
-        global_logger.exception(f'Unexpected error occurred while fetching records for match_code={match_code}.')
+        global_logger.exception('Unexpected error occurred while exporting records for match_code=%s.', match_code)
         raise HTTPException(
             status_code=500,
             detail=f'An unexpected error occurred while fetching records.'
@@ -330,13 +316,13 @@ async def get_all_records_from_match_code_from_db_exported_to_excel_file(match_c
 
 
 
-async def delete_all_records_from_match_code_in_db(match_code: str, session: AsyncSession) -> DeleteRecordsResponse:
-    global_logger.info(f"DELETE request received for player with match_code={match_code} (soft-delete).")
+async def delete_all_records_from_match_code_in_db(match_code: str, session: AsyncSession, cache: Valkey) -> DeleteRecordsResponse:
+    global_logger.info("DELETE request received for player with match_code=%s (soft-delete).", match_code)
     match_id_subquery = select(Match.id).where(Match.match_code == match_code).scalar_subquery()
     existence_query = select(Question.id).where(Question.match_id == match_id_subquery).limit(1)
     exists_result = await session.execute(existence_query)
     if not exists_result.scalar_one_or_none():
-        global_logger.warning(f"No records found for match with match_code={match_code} in the database. Returning 404.")
+        global_logger.warning("No records found for match with match_code=%s in the database. Returning 404.", match_code)
         raise HTTPException(
             status_code=404,
             detail=f'No records found for match with match_code={match_code} in the database'
@@ -350,8 +336,19 @@ async def delete_all_records_from_match_code_in_db(match_code: str, session: Asy
         )
         execution_result = await session.execute(update_query)
         deleted_count = execution_result.rowcount
-        await session.commit() 
-        global_logger.info(f"Successfully soft-deleted {deleted_count} records for match_code={match_code}.")
+        # Announced like a single record change, so a rebuild can't go live with the pre-delete totals
+        change_token = await begin_score_change(cache, match_code)
+        try:
+            await session.commit()
+        except Exception:
+            await cancel_score_change(cache, match_code, change_token)
+            raise
+        global_logger.info("Successfully soft-deleted %s records for match_code=%s.", deleted_count, match_code)
+        await discard_scoreboard(cache, match_code, change_token)
+        try:
+            await scoreboard_keeper.rebuild(cache, match_code)
+        except Exception as valkey_err:
+            global_logger.warning("Failed to rebuild scoreboard for match=%s, it is rebuilt on next use: %s", match_code, valkey_err)
         return DeleteRecordsResponse(
             response={
                 'message': f'Successfully soft-deleted {deleted_count} records for match_code={match_code}.'
@@ -361,7 +358,7 @@ async def delete_all_records_from_match_code_in_db(match_code: str, session: Asy
         raise
     except Exception:
         await session.rollback()
-        global_logger.exception(f'Unexpected error occurred during soft-deletion of records for match_code={match_code}.')
+        global_logger.exception('Unexpected error occurred during soft-deletion of records for match_code=%s.', match_code)
         raise HTTPException(
             status_code=500,
             detail=f'An unexpected error occurred during record deletion.'
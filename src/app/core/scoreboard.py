@@ -1,13 +1,11 @@
-from sqlalchemy import select
+from sqlalchemy import select, func, tuple_, case, cast, literal, String
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
 from valkey.asyncio import Valkey
-import io
-import json
-import pandas as pd
 
+from app.config import settings
 from app.model.player import Player
 from app.model.match import Match
 from app.model.record import Record
@@ -15,112 +13,182 @@ from app.model.question import Question
 from app.schema.record import *
 from app.schema.scoreboard import GetScoreboardResponse
 from app.logger import global_logger
+from app.utils.scoreboard_cache import scoreboard_key, diff_scoreboards, get_ranked_scoreboard, get_scoreboard_totals_from_db, scoreboard_keeper
+from app.utils.fast_json import FastJSONResponse, render_json
+from app.utils.pagination import encode_cursor, decode_cursor, clamp_page_size
+from app.utils.excel_export import ExcelSheet, stream_query_batches, stream_xlsx, XLSX_MEDIA_TYPE
 
 
-MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
-
-
-async def get_recent_cumulative_timeline_scoreboard_from_cache(match_code: str, cache: Valkey) -> GetScoreboardResponse:
-    cache_key = f"scoreboard:{match_code}"
-    global_logger.info(f"Attempting to retrieve scoreboard for match={match_code} from Valkey key: {cache_key}")
+async def get_recent_cumulative_timeline_scoreboard_from_cache(match_code: str, cache: Valkey, top_k: int | None = None) -> GetScoreboardResponse:
+    """
+    Ranked live standings of a match, read from the cached sorted set in one round trip.
+    Players come sorted by total (ties by player_code) with their rank, rank change and tie flag.
+    """
+    top_k = top_k if top_k and top_k > 0 else settings.SCOREBOARD_TOP_K
+    global_logger.info("Attempting to retrieve ranked scoreboard for match=%s from Valkey.", match_code)
     try:
-        scoreboard_hash = await cache.hgetall(cache_key)
-        if scoreboard_hash is None:
-            global_logger.info(f"Scoreboard not found in cache for match={match_code}")
+        standings = await get_ranked_scoreboard(cache, match_code, top_k)
+        if standings is None:
+            global_logger.info("Scoreboard not found in cache for match=%s", match_code)
             raise HTTPException(status_code=404, detail=f"Scoreboard not found in cache for match={match_code}")
-        # Assuming the scoreboard is stored as a JSON string
-        scoreboard_list = []
-        for player_code_bytes, score_bytes in scoreboard_hash.items():
-            try:
-                # Decode bytes to string and convert score to integer
-                player_code = player_code_bytes.decode() if isinstance(player_code_bytes, bytes) else player_code_bytes
-                total_d_score = int(score_bytes.decode() if isinstance(score_bytes, bytes) else score_bytes)
-                
-                scoreboard_list.append({
-                    "player_code": player_code,
-                    "total_d_score": total_d_score,
-                })
-            except ValueError:
-                global_logger.error(f"Invalid score value in cache for player {player_code} in match {match_code}.")
-                continue
-        global_logger.info(f"✅ Successfully retrieved and parsed scoreboard from cache for match={match_code}")
         return GetScoreboardResponse(
             response={
                 'data': {
                     'match_code': match_code,
-                    'scoreboard': scoreboard_list
+                    'top_k': top_k,
+                    **standings
                 }
             }
         )
-    except json.JSONDecodeError:
-        global_logger.error(f"Failed to decode JSON from cache for match={match_code}. Key: {cache_key}")
-        raise HTTPException(status_code=500, detail=f"Failed to decode JSON from cache for match={match_code}. Key: {cache_key}")
+    except HTTPException:
+        raise
     except Exception as e:
-        global_logger.exception(f"Error accessing Valkey for match={match_code}: {e}")
+        global_logger.exception("Error accessing Valkey for match=%s", match_code)
         raise HTTPException(status_code=500, detail=f"Error accessing Valkey for match={match_code}: {e}")
 
 
 
+def _cumulative_timeline_subquery(match_code: str):
+    """
+    Every live record of the match with the player's running total, overall and within the
+    round, computed by the database with SUM() OVER (PARTITION BY player ORDER BY play order).
+    Ties on created_at are broken by id so the running totals and the pages are deterministic.
+    """
+    match_id_subquery = select(Match.id).where(Match.match_code == match_code).scalar_subquery()
+    d_score = func.coalesce(Record.d_score_earned, 0)
+    round_code = func.upper(func.substr(Question.question_code, 1, 2))
+    play_order = (Record.created_at, Record.id)
+    return (
+        select(
+            Record.id.label('record_id'),
+            Record.created_at,
+            Question.question_code,
+            round_code.label('round_code'),
+            Player.player_code,
+            Player.player_name,
+            d_score.label('d_score_earned'),
+            func.sum(d_score).over(partition_by=Record.player_id, order_by=play_order, rows=(None, 0)).label('cumulative_d_score'),
+            func.sum(d_score).over(partition_by=(Record.player_id, round_code), order_by=play_order, rows=(None, 0)).label('round_cumulative_d_score'),
+        )
+        .join(Player, Player.id == Record.player_id)
+        .join(Question, Question.id == Record.question_id)
+        .where(Record.match_id == match_id_subquery, Record.is_deleted.is_(False))
+        .subquery('timeline')
+    )
+
+
+
+def _timeline_entry(row) -> dict:
+    return {
+        'created_at': row.created_at,
+        'question_code': row.question_code,
+        'round_code': row.round_code,
+        'player_code': row.player_code,
+        'player_name': row.player_name,
+        'd_score_earned': row.d_score_earned,
+        'cumulative_d_score': row.cumulative_d_score,
+        'round_cumulative_d_score': row.round_cumulative_d_score,
+    }
+
+
+
+async def get_cumulative_timeline_from_db(match_code: str, session: AsyncSession, limit: int | None = None, cursor: str | None = None) -> FastJSONResponse:
+    """
+    One page of the cumulative timeline in play order. Pass the returned next_cursor to get
+    the following page; it is None on the last one.
+    """
+    global_logger.info("GET cumulative timeline for match=%s (cursor=%s).", match_code, cursor)
+    try:
+        limit = clamp_page_size(limit)
+        timeline = _cumulative_timeline_subquery(match_code)
+        page_query = select(timeline).order_by(timeline.c.created_at, timeline.c.record_id).limit(limit + 1)
+        if cursor is not None:
+            created_at, record_id = decode_cursor(cursor)
+            page_query = page_query.where(tuple_(timeline.c.created_at, timeline.c.record_id) > tuple_(created_at, record_id))
+        rows = (await session.execute(page_query)).all()
+        if not rows and cursor is None:
+            raise HTTPException(status_code=404, detail=f"No records found for match_code={match_code}")
+        page = rows[:limit]
+        return FastJSONResponse(GetScoreboardResponse.model_construct(
+            response={
+                'data': {
+                    'match_code': match_code,
+                    'timeline': [_timeline_entry(row) for row in page],
+                    'next_cursor': encode_cursor(page[-1].created_at, page[-1].record_id) if len(rows) > limit else None,
+                }
+            }
+        ))
+    except HTTPException:
+        raise
+    except Exception:
+        global_logger.exception("Error fetching cumulative timeline for match=%s", match_code)
+        raise HTTPException(status_code=500, detail="Failed to fetch cumulative score timeline.")
+
+
+
+async def stream_cumulative_timeline_from_db(match_code: str, session: AsyncSession) -> StreamingResponse:
+    """The whole cumulative timeline as NDJSON (one entry per line), streamed from a server-side cursor."""
+    global_logger.info("Streaming cumulative timeline for match=%s.", match_code)
+    try:
+        match_id_subquery = select(Match.id).where(Match.match_code == match_code).scalar_subquery()
+        exists_query = select(Record.id).where(Record.match_id == match_id_subquery).limit(1)
+        if (await session.execute(exists_query)).scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail=f"No records found for match_code={match_code}")
+
+        timeline = _cumulative_timeline_subquery(match_code)
+        timeline_query = select(timeline).order_by(timeline.c.created_at, timeline.c.record_id)
+
+        async def ndjson_lines():
+            async for batch in stream_query_batches(timeline_query):
+                yield b"".join(render_json(_timeline_entry(row)) + b"\n" for row in batch)
+
+        return StreamingResponse(content=ndjson_lines(), media_type="application/x-ndjson")
+    except HTTPException:
+        raise
+    except Exception:
+        global_logger.exception("Error streaming cumulative timeline for match=%s", match_code)
+        raise HTTPException(status_code=500, detail="Failed to stream cumulative score timeline.")
+
+
+
 async def get_cumulative_timeline_scoreboard_export_to_excel_file_from_db(match_code: str, session: AsyncSession) -> StreamingResponse:
     """
     Export cumulative D score per question for each player in a given match to Excel,
     in a single sheet, sorted by created_at (actual play order).
+    The running totals and the round come from the same window query as the JSON timeline;
+    rows are streamed from the database into the workbook as they are.
     """
-    global_logger.info(f"Exporting cumulative score timeline (single sheet) for match={match_code}.")
+    global_logger.info("Exporting cumulative score timeline (single sheet) for match=%s.", match_code)
     try:
-        buffer = io.BytesIO()
         response_name = f'OGD3_{match_code}_full_timeline_score.xlsx'
 
+        match_id_subquery = select(Match.id).where(Match.match_code == match_code).scalar_subquery()
+        exists_query = select(Record.id).where(Record.match_id == match_id_subquery).limit(1)
+        if (await session.execute(exists_query)).scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail=f"No records found for match_code={match_code}")
+
+        timeline = _cumulative_timeline_subquery(match_code)
+        d_score_text = cast(timeline.c.d_score_earned, String)
         records_query = (
             select(
-                Player.player_code,
-                Player.player_name,
-                Question.question_code,
-                Record.d_score_earned,
-                Record.created_at
+                timeline.c.question_code,
+                timeline.c.player_code,
+                timeline.c.player_name,
+                case((timeline.c.d_score_earned >= 0, literal('+') + d_score_text), else_=d_score_text),
+                timeline.c.cumulative_d_score,
+                timeline.c.round_code,
             )
-            .join(Player, Player.id == Record.player_id)
-            .join(Match, Match.id == Record.match_id)
-            .join(Question, Question.id == Record.question_id)
-            .where(Match.match_code == match_code)
-            .order_by(Record.created_at.asc())
+            .order_by(timeline.c.created_at, timeline.c.record_id)
+        )
+        sheet = ExcelSheet(
+            name="SCOREBOARD",
+            header=["Mã câu hỏi", "Mã thí sinh", "Tên thí sinh", "Điểm thay đổi", "Điểm cộng dồn", "Vòng thi"],
+            batches=lambda: stream_query_batches(records_query),
         )
-        execution = await session.execute(records_query)
-        records = execution.all()
-
-        if not records:
-            raise HTTPException(status_code=404, detail=f"No records found for match_code={match_code}")
-
-        cumulative = {}
-        timeline_data = []
-
-        for r in records:
-            player_code = r.player_code
-            player_name = r.player_name
-            delta = int(r.d_score_earned or 0)
-            prev_total = cumulative.get(player_code, 0)
-            cumulative[player_code] = prev_total + delta
-            diff_from_prev = delta 
-            timeline_data.append({
-                "Mã câu hỏi": r.question_code,
-                "Mã thí sinh": player_code,
-                "Tên thí sinh": player_name,
-                "Điểm thay đổi": f"{diff_from_prev:+d}",
-                "Điểm cộng dồn": cumulative[player_code]
-            })
-
-        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-            df = pd.DataFrame(timeline_data)
-            df['Vòng thi'] = df['Mã câu hỏi'].apply(lambda x: x[:2].upper())
-            df.to_excel(writer, index=False, sheet_name="SCOREBOARD")
-
-        buffer.seek(0)
-        global_logger.info(f"✅ Exported full cumulative score timeline for match={match_code}")
-
         return StreamingResponse(
-            content=buffer,
-            media_type=MEDIA_TYPE,
+            content=stream_xlsx([sheet], response_name),
+            media_type=XLSX_MEDIA_TYPE,
             headers={"Content-Disposition": f'attachment; filename="{response_name}"'}
         )
 
@@ -128,4 +196,48 @@ async def get_cumulative_timeline_scoreboard_export_to_excel_file_from_db(match_
         raise
     except Exception as e:
         global_logger.exception(f"Error exporting full cumulative score timeline for match={match_code}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to export full cumulative score timeline.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to export full cumulative score timeline.")
+
+
+
+async def reconcile_scoreboard_cache_with_db(match_code: str, cache: Valkey, session: AsyncSession) -> GetScoreboardResponse:
+    """
+    Compare the cached running totals with the totals computed from the records table.
+    """
+    global_logger.info(f"Reconciling cached scoreboard with records for match={match_code}.")
+    try:
+        db_totals = await get_scoreboard_totals_from_db(match_code, session)
+        cached_totals = {
+            player_code: int(score)
+            for player_code, score in (await cache.hgetall(scoreboard_key(match_code))).items()
+        }
+        mismatches = diff_scoreboards(cached_totals, db_totals)
+        if mismatches:
+            global_logger.warning(f"Scoreboard cache drift for match={match_code}: {len(mismatches)} player(s) differ.")
+        return GetScoreboardResponse(
+            response={
+                'data': {
+                    'match_code': match_code,
+                    'consistent': not mismatches,
+                    'mismatches': mismatches
+                }
+            }
+        )
+    except Exception as e:
+        global_logger.exception(f"Error reconciling scoreboard for match={match_code}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to reconcile scoreboard for match={match_code}.")
+
+
+
+async def rebuild_scoreboard_cache_from_db(match_code: str, cache: Valkey) -> GetScoreboardResponse:
+    """Recompute the cached scoreboard of a match from the records table."""
+    global_logger.info("Rebuilding cached scoreboard from records for match=%s.", match_code)
+    try:
+        if not await scoreboard_keeper.rebuild(cache, match_code):
+            raise HTTPException(status_code=409, detail=f"Scoreboard for match={match_code} could not be rebuilt (unknown match or scores still changing).")
+        return await get_recent_cumulative_timeline_scoreboard_from_cache(match_code, cache)
+    except HTTPException:
+        raise
+    except Exception:
+        global_logger.exception("Error rebuilding scoreboard for match=%s", match_code)
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild scoreboard for match={match_code}.")
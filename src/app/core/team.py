@@ -3,15 +3,18 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
+from valkey.asyncio import Valkey
 
 from app.model.team import Team
 from app.schema.team import *
 from app.logger import global_logger
+from app.utils.helpers import id_cache
+from app.utils.listing_cache import listing_cache
 
 
 
-async def post_team_to_db(request: PostTeamRequest, session: AsyncSession) -> PostTeamResponse:
+async def post_team_to_db(request: PostTeamRequest, session: AsyncSession, cache: Valkey) -> PostTeamResponse:
     global_logger.info(f"POST request received to create team with code: {request.team_code}.")
     new_team = Team(
         team_code = request.team_code,
@@ -23,6 +26,7 @@ async def post_team_to_db(request: PostTeamRequest, session: AsyncSession) -> Po
         await session.commit()
         await session.refresh(new_team)
         global_logger.info(f"Team created successfully. team_code={request.team_code}, team_id={new_team.id}")
+        await listing_cache.bump(cache, 'teams', 'players')
         
         return PostTeamResponse(
             response={'message': f'Team with team_code={request.team_code} created successfully.'}
@@ -44,7 +48,7 @@ async def post_team_to_db(request: PostTeamRequest, session: AsyncSession) -> Po
 
 
 
-async def put_team_to_db(request: PutTeamRequest, session: AsyncSession) -> PutTeamResponse:
+async def put_team_to_db(request: PutTeamRequest, session: AsyncSession, cache: Valkey) -> PutTeamResponse:
     global_logger.info(f"PUT request received to update team with code: {request.team_code}.")
     try:
         team_query = select(Team).where(Team.team_code == request.team_code)
@@ -56,6 +60,7 @@ async def put_team_to_db(request: PutTeamRequest, session: AsyncSession) -> PutT
         await session.commit()
         await session.refresh(team_found)
         global_logger.info(f"Team updated successfully for team_code={request.team_code}")
+        await listing_cache.bump(cache, 'teams', 'players')
         return PutTeamResponse(response={"message": "Team updated successfully!"})
     except HTTPException:
         raise
@@ -117,6 +122,12 @@ async def get_all_teams_with_players_info_from_db(session: AsyncSession) -> GetT
 
 
 
+async def get_all_teams_with_players_info_from_cache(session: AsyncSession, cache: Valkey, if_none_match: str | None = None) -> Response:
+    """All teams with their players, served from the versioned listing cache (304 when the client's ETag is current)."""
+    return await listing_cache.respond(cache, 'teams', if_none_match, lambda: get_all_teams_with_players_info_from_db(session))
+
+
+
 async def get_team_with_players_info_from_team_code_from_db(team_code: str, session: AsyncSession) -> GetTeamResponse:
     global_logger.info(f"GET request received for team: {team_code} with players info.")
     try:
@@ -163,7 +174,7 @@ async def get_team_with_players_info_from_team_code_from_db(team_code: str, sess
 
 
 
-async def delete_team_from_team_code_from_db(team_code: str, session: AsyncSession) -> DeleteTeamResponse:
+async def delete_team_from_team_code_from_db(team_code: str, session: AsyncSession, cache: Valkey) -> DeleteTeamResponse:
     # We don't actually delete the team, just set the is_deleted=True
     global_logger.info(f"DELETE request received for team with team_code={team_code} (soft-delete).")
     try:
@@ -189,6 +200,8 @@ async def delete_team_from_team_code_from_db(team_code: str, session: AsyncSessi
                 detail=f'No team with team_code={team_code} existed'
             )
 
+        id_cache.invalidate(Team.__tablename__, 'team_code', team_code)
+        await listing_cache.bump(cache, 'teams', 'players')
         global_logger.info(f"Team soft-deleted successfully for team_code={team_code}")
         return DeleteTeamResponse(response={"message": "Team deleted successfully!"})
 
@@ -3,8 +3,10 @@ from collections.abc import AsyncGenerator
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from functools import lru_cache
+from weakref import WeakKeyDictionary
 
-from valkey.asyncio import Valkey
+from valkey.asyncio import Valkey, BlockingConnectionPool
+from valkey.commands.core import AsyncScript
 from app.config import settings
 
 
@@ -22,16 +24,83 @@ AsyncSessionLocal = sessionmaker(
 Base = declarative_base()
 
 
+# App-wide Valkey clients, created in the lifespan hook and shared by every request / websocket
+valkey_clients: dict[str, Valkey] = {}
+
+# Lua scripts per client, created once: a Script hashes its source when it is built, not per call
+_client_scripts: WeakKeyDictionary = WeakKeyDictionary()
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
 
 
 
+def _create_valkey_client(url: str) -> Valkey:
+    pool = BlockingConnectionPool.from_url(
+        url,
+        decode_responses=True,
+        max_connections=settings.VALKEY_MAX_CONNECTIONS,
+        timeout=settings.VALKEY_POOL_TIMEOUT,
+        socket_timeout=settings.VALKEY_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.VALKEY_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=settings.VALKEY_HEALTH_CHECK_INTERVAL,
+    )
+    return Valkey.from_pool(pool)
+
+
+
+async def init_valkey_clients():
+    if not valkey_clients:
+        valkey_clients['cache'] = _create_valkey_client(settings.VALKEY_CACHE_URL)
+        valkey_clients['pubsub'] = _create_valkey_client(settings.VALKEY_PUBSUB_URL)
+
+
+
+async def close_valkey_clients():
+    for client in valkey_clients.values():
+        await client.aclose()
+    valkey_clients.clear()
+
+
+
+def get_valkey_pool_stats() -> dict[str, dict[str, int]]:
+    stats = {}
+    for name, client in valkey_clients.items():
+        pool = client.connection_pool
+        in_use = len(pool._in_use_connections)
+        available = len(pool._available_connections)
+        stats[name] = {
+            'max_connections': pool.max_connections,
+            'in_use_connections': in_use,
+            'available_connections': available,
+            'created_connections': in_use + available,
+        }
+    return stats
+
+
+
+def get_script(client: Valkey, source: str) -> AsyncScript:
+    """The client's Script object for this Lua source, registered on first use."""
+    scripts = _client_scripts.get(client)
+    if scripts is None:
+        scripts = _client_scripts[client] = {}
+    script = scripts.get(source)
+    if script is None:
+        script = scripts[source] = client.register_script(source)
+    return script
+
+
+
 async def get_valkey_cache() -> Valkey:
-    return Valkey.from_url(settings.VALKEY_CACHE_URL, decode_responses=True)
+    if 'cache' not in valkey_clients:
+        await init_valkey_clients()
+    return valkey_clients['cache']
 
 
 
 async def get_valkey_pubsub() -> Valkey:
-    return Valkey.from_url(settings.VALKEY_PUBSUB_URL, decode_responses=True)
\ No newline at end of file
+    if 'pubsub' not in valkey_clients:
+        await init_valkey_clients()
+    return valkey_clients['pubsub']
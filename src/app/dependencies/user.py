@@ -1,3 +1,6 @@
+import time
+from collections import OrderedDict
+
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 import jwt
@@ -17,19 +20,72 @@ ROLE_PERMISSIONS = {
 }
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+class VerifiedTokenCache:
+    """
+    Small LRU of tokens that already passed verification, so clients polling with the same
+    bearer token skip the JWT decode. An entry never outlives the token's own exp claim.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> dict | None:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def set(self, token: str, user: dict, token_exp: float | None):
+        expires_at = time.time() + self.ttl_seconds
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        self._entries[token] = (user, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_MAX_SIZE, settings.TOKEN_CACHE_TTL_SECONDS)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    # async so FastAPI runs it on the loop: a cache hit is a dict lookup, not a threadpool hop
+    user = token_cache.get(token)
+    if user is not None:
+        return user
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
         role: str = payload.get("role")
         if username is None or role is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        return {"username": username, "role": role}
+        user = {"username": username, "role": role}
+        token_cache.set(token, user, payload.get("exp"))
+        return user
     except PyJWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
 
-def authorize_user(request: Request, user: dict = Depends(get_current_user)):
+async def authorize_user(request: Request, user: dict = Depends(get_current_user)):
     method = request.method.upper()
     user_role = user["role"]
     allowed_methods = ROLE_PERMISSIONS.get(user_role, set())
@@ -1,41 +1,224 @@
 import asyncio
+import json
+from collections import deque
+from collections.abc import Callable, Coroutine
 from typing import Any
+from fastapi import status
 from fastapi.websockets import WebSocket
 
+from app.config import settings
 from app.logger import global_logger
+from app.utils.match_stream import event_id_of, parse_event_id
+
+
+RESYNC_MESSAGE = json.dumps({"type": "resync", "reason": "slow_consumer"})
+COALESCED_EVENT_TYPES = {"player_score_updated"}
+
+
+
+class ClientConnection:
+    """
+    One websocket with its own bounded outbound queue and writer task,
+    so a slow client never holds up the fan-out to the others.
+    """
+    def __init__(self, match_code: str, websocket: WebSocket, max_queue_size: int, overflow_policy: str):
+        self.match_code = match_code
+        self.websocket = websocket
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.queue: deque[str] = deque()
+        self.dropped_messages = 0
+        self.resync_pending = False
+        # While paused (replaying a reconnect) live frames are queued but not sent
+        self.paused = False
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self.writer_task: asyncio.Task | None = None
+        # Held so the close can't be garbage-collected before it runs
+        self.close_task: asyncio.Task | None = None
+
+    def start(self, on_error: Callable[["ClientConnection"], None]):
+        self.writer_task = asyncio.create_task(self._write_loop(on_error))
+
+    def enqueue(self, payload: str) -> bool:
+        """Queue a payload for this socket. Returns False when the client must be evicted."""
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue_size:
+            if self.overflow_policy == "disconnect":
+                return False
+            if self.overflow_policy == "coalesce" and self._coalesce(payload):
+                pass
+            else:
+                self.queue.popleft()
+                self.dropped_messages += 1
+                self.resync_pending = True
+        self.queue.append(payload)
+        self._wakeup.set()
+        return True
+
+    def resume(self, frames: list[str], replayed_up_to: str | None):
+        """
+        Send the replay / snapshot frames first, then the live frames queued meanwhile, minus
+        those with an event_id the replay already covered.
+        """
+        last = parse_event_id(replayed_up_to)
+        if last is not None:
+            kept = deque()
+            for queued in self.queue:
+                event_id = parse_event_id(event_id_of(queued))
+                if event_id is None or event_id > last:
+                    kept.append(queued)
+            self.queue = kept
+        self.queue.extendleft(reversed(frames))
+        self.paused = False
+        self._wakeup.set()
+
+    def _coalesce(self, payload: str) -> bool:
+        """Drop queued score updates superseded by the incoming one (only decodes on overflow)."""
+        try:
+            incoming = json.loads(payload)
+        except ValueError:
+            return False
+        if incoming.get("type") not in COALESCED_EVENT_TYPES:
+            return False
+        kept = deque()
+        for queued in self.queue:
+            try:
+                message = json.loads(queued)
+            except ValueError:
+                message = {}
+            if message.get("type") == incoming["type"] and message.get("player_code") == incoming.get("player_code"):
+                continue
+            kept.append(queued)
+        removed = len(self.queue) - len(kept)
+        self.queue = kept
+        return removed > 0
+
+    async def _write_loop(self, on_error: Callable[["ClientConnection"], None]):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self.queue and not self.paused:
+                    if self.resync_pending:
+                        self.resync_pending = False
+                        await self.websocket.send_text(RESYNC_MESSAGE)
+                    await self.websocket.send_text(self.queue.popleft())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            global_logger.error("Error sending message to websocket for match_code=%s: %s", self.match_code, e)
+            on_error(self)
+
+    def close(self, code: int | None = None):
+        self.closed = True
+        self.queue.clear()
+        if self.writer_task is not None and self.writer_task is not asyncio.current_task():
+            self.writer_task.cancel()
+        if code is not None and self.close_task is None:
+            self.close_task = asyncio.create_task(self._close_websocket(code))
+
+    async def _close_websocket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
 
 
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: dict[str, list[WebSocket]] = {}
+        self.active_connections: dict[str, list[ClientConnection]] = {}
+        # One Valkey subscriber task per match in this process, alive while the match has connections
+        self.subscriber_tasks: dict[str, asyncio.Task] = {}
+        self.evicted_connections = 0
+        self.dropped_messages = 0
 
-    async def connect(self, match_code: str, websocket: WebSocket):
+    async def connect(
+        self,
+        match_code: str,
+        websocket: WebSocket,
+        subscriber_factory: Callable[[], Coroutine[Any, Any, None]] | None = None,
+        paused: bool = False
+    ) -> ClientConnection:
         if not websocket.application_state.value == 1:  # 0=CONNECTING, 1=CONNECTED
             await websocket.accept()
-        self.active_connections.setdefault(match_code, []).append(websocket)
-        global_logger.info(f"Connected websocket for match_code={match_code}. Total connections: {len(self.active_connections[match_code])}")
+        client = ClientConnection(match_code, websocket, settings.WS_SEND_QUEUE_SIZE, settings.WS_OVERFLOW_POLICY)
+        client.paused = paused
+        # A socket that can't be written to is closed, so the client knows to reconnect
+        client.start(on_error=lambda c: self.disconnect(c.match_code, c.websocket, close_code=status.WS_1011_INTERNAL_ERROR))
+        self.active_connections.setdefault(match_code, []).append(client)
+        global_logger.info("Connected websocket for match_code=%s. Total connections: %s", match_code, len(self.active_connections[match_code]))
+        if subscriber_factory is not None and match_code not in self.subscriber_tasks:
+            self.subscriber_tasks[match_code] = asyncio.create_task(subscriber_factory())
+            global_logger.info("Started Valkey subscriber for match_code=%s", match_code)
+        return client
 
-    def disconnect(self, match_code: str, websocket: WebSocket):
+    def disconnect(self, match_code: str, websocket: WebSocket, close_code: int | None = None):
         if match_code in self.active_connections:
-            self.active_connections[match_code] = [
-                conn for conn in self.active_connections[match_code] if conn is not websocket
-            ]
-            global_logger.info(f"Disconnected websocket for match_code={match_code}. Remaining connections: {len(self.active_connections[match_code])}")
+            remaining = []
+            for client in self.active_connections[match_code]:
+                if client.websocket is websocket:
+                    self.dropped_messages += client.dropped_messages
+                    client.close(close_code)
+                else:
+                    remaining.append(client)
+            self.active_connections[match_code] = remaining
+            global_logger.info("Disconnected websocket for match_code=%s. Remaining connections: %s", match_code, len(self.active_connections[match_code]))
             if not self.active_connections[match_code]:
                 del self.active_connections[match_code]
+                self._stop_subscriber(match_code)
+
+    def _stop_subscriber(self, match_code: str):
+        task = self.subscriber_tasks.pop(match_code, None)
+        if task is not None:
+            task.cancel()
+            global_logger.info("Stopped Valkey subscriber for match_code=%s", match_code)
+
+    async def shutdown(self):
+        tasks = list(self.subscriber_tasks.values())
+        for match_code in list(self.subscriber_tasks):
+            self._stop_subscriber(match_code)
+        for clients in self.active_connections.values():
+            for client in clients:
+                client.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     async def broadcast(self, match_code: str, message: dict[str, Any]):
+        """Encode the message once and queue the same text frame for every socket of the match."""
         if match_code in self.active_connections:
-            connections_to_send = list(self.active_connections[match_code])
-            results = await asyncio.gather(
-                *[connection.send_json(message) for connection in connections_to_send], 
-                return_exceptions=True
-            )
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    global_logger.error(f"Error sending message to websocket for match_code={match_code}: {result}")
-                    self.disconnect(match_code, connections_to_send[i])
-
-
-manager = ConnectionManager()
\ No newline at end of file
+            await self.broadcast_raw(match_code, json.dumps(message))
+
+    async def broadcast_raw(self, match_code: str, payload: str | bytes):
+        """
+        Forward an already-encoded JSON payload (e.g. straight from Valkey pub/sub) without decoding it.
+        Only enqueues; each connection's writer task does the actual send.
+        """
+        if match_code in self.active_connections:
+            if isinstance(payload, bytes):
+                payload = payload.decode()
+            for client in list(self.active_connections[match_code]):
+                if not client.enqueue(payload):
+                    global_logger.warning("Evicting slow websocket for match_code=%s: send queue full (%s).", match_code, client.max_queue_size)
+                    self.evicted_connections += 1
+                    self.disconnect(match_code, client.websocket, close_code=status.WS_1013_TRY_AGAIN_LATER)
+
+    def get_stats(self) -> dict[str, Any]:
+        live_dropped = sum(c.dropped_messages for clients in self.active_connections.values() for c in clients)
+        return {
+            'matches': {
+                match_code: {
+                    'connections': len(clients),
+                    'queued_messages': sum(len(c.queue) for c in clients),
+                    'dropped_messages': sum(c.dropped_messages for c in clients),
+                }
+                for match_code, clients in self.active_connections.items()
+            },
+            'subscribers': len(self.subscriber_tasks),
+            'evicted_connections': self.evicted_connections,
+            'dropped_messages': self.dropped_messages + live_dropped,
+        }
+
+
+manager = ConnectionManager()
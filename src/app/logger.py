@@ -1,21 +1,109 @@
 import logging
 import sys
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import atexit
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 import os
 
+from app.config import settings
+
 
 LOG_FILE_NAME = "app.log"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s (%(filename)s:%(lineno)d)"
+LOG_FLUSH_TIMEOUT = 5.0
+
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller: when the queue is full (slow stdout, full disk)
+    the record is dropped and counted instead of stalling the event loop.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the message and render the traceback here; the full line (asctime, etc.)
+        # is formatted by the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+
+class FlushingQueueListener(QueueListener):
+    """QueueListener whose stop() waits a bounded time, so a stuck handler can't hang shutdown."""
+    def stop(self, timeout: float = LOG_FLUSH_TIMEOUT):
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+
+
+class CategorySamplingFilter(logging.Filter):
+    """
+    Keeps 1 in N INFO/DEBUG records of a category, the category being the leading "[TAG]" of
+    the message (e.g. "[WS]"). Warnings and errors are never sampled.
+    Runs before any formatting, so sampled-out records cost almost nothing.
+    """
+    def __init__(self, sample_every: dict[str, int]):
+        super().__init__()
+        self.sample_every = {category: every for category, every in sample_every.items() if every > 1}
+        self._seen: dict[str, int] = {}
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.sample_every:
+            return True
+        msg = record.msg
+        if not isinstance(msg, str) or not msg.startswith("["):
+            return True
+        category = msg[1:msg.find("]")]
+        every = self.sample_every.get(category)
+        if every is None:
+            return True
+        seen = self._seen.get(category, 0)
+        self._seen[category] = seen + 1
+        if seen % every == 0:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+
+_log_queue: queue.Queue | None = None
+_queue_handler: DroppingQueueHandler | None = None
+_listener: FlushingQueueListener | None = None
+_sampling_filter: CategorySamplingFilter | None = None
+
 
 
 def setup_logger(name: str = "app_logger", level: int = logging.INFO):
     """
     Sets up a robust logger with a file handler and a console handler.
+    With LOG_ASYNC the handlers run on a background listener thread fed by a bounded queue.
     :param name: The name of the logger to be used by all modules.
     :param level: The minimum logging level to process.
     :return: The configured logger instance.
     """
-    
+    global _log_queue, _queue_handler, _listener, _sampling_filter
+
     # 1. Create the logger
     logger = logging.getLogger(name)
     logger.setLevel(level)
@@ -30,13 +118,12 @@ def setup_logger(name: str = "app_logger", level: int = logging.INFO):
         # Console Handler (for real-time viewing/debugging)
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
 
         # File Handler (for persistence and log rotation)
         log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'logs')
         os.makedirs(log_dir, exist_ok=True)
         log_path = os.path.join(log_dir, LOG_FILE_NAME)
-        
+
         # TimedRotatingFileHandler rotates the log file daily
         file_handler = TimedRotatingFileHandler(
             log_path,
@@ -46,10 +133,45 @@ def setup_logger(name: str = "app_logger", level: int = logging.INFO):
             encoding='utf-8'
         )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+
+        # 4. Attach them, directly or behind the queue
+        if settings.LOG_ASYNC:
+            _log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+            _queue_handler = DroppingQueueHandler(_log_queue)
+            logger.addHandler(_queue_handler)
+            _listener = FlushingQueueListener(_log_queue, console_handler, file_handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop_log_listener)
+        else:
+            logger.addHandler(console_handler)
+            logger.addHandler(file_handler)
+
+        # 5. Sample the high-volume categories
+        _sampling_filter = CategorySamplingFilter(settings.LOG_SAMPLE_EVERY)
+        logger.addFilter(_sampling_filter)
 
     return logger
 
 
+
+def stop_log_listener():
+    """Flush what is still queued and stop the listener thread (idempotent)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+
+def get_logging_stats() -> dict:
+    return {
+        'mode': 'async' if _queue_handler is not None else 'sync',
+        'queued': _log_queue.qsize() if _log_queue is not None else 0,
+        'queue_max_size': _log_queue.maxsize if _log_queue is not None else 0,
+        'dropped': _queue_handler.dropped if _queue_handler is not None else 0,
+        'sampled_out': _sampling_filter.sampled_out if _sampling_filter is not None else 0,
+    }
+
+
 # Create the global logger instance
-global_logger = setup_logger()
\ No newline at end of file
+global_logger = setup_logger()
@@ -3,7 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app import model
-from app.dependencies.db import Base, engine
+from app.dependencies.db import Base, engine, init_valkey_clients, close_valkey_clients, get_valkey_cache, get_valkey_pubsub
 from app.api import (
     player,
     team,
@@ -13,8 +13,14 @@ from app.api import (
     question,
     auth,
     scoreboard,
-    controller
+    controller,
+    metrics
 )
+from app.dependencies.ws import manager
+from app.utils.match_timer import timer_scheduler
+from app.core.question import shutdown_import_pool
+from app.utils.scoreboard_cache import scoreboard_keeper
+from app.utils.answer_writer import answer_writer
 from app.logger import global_logger
 
 
@@ -24,7 +30,20 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
         global_logger.info("Database tables ensured.")
+    await init_valkey_clients()
+    global_logger.info("Valkey connection pools initialized.")
+    timer_scheduler.start(await get_valkey_pubsub())
+    await scoreboard_keeper.warm_up(await get_valkey_cache())
+    scoreboard_keeper.start(await get_valkey_cache())
+    answer_writer.start(await get_valkey_pubsub(), await get_valkey_cache())
     yield
+    await scoreboard_keeper.stop()
+    await timer_scheduler.stop(await get_valkey_pubsub())
+    await manager.shutdown()
+    await answer_writer.stop(await get_valkey_pubsub(), await get_valkey_cache())
+    shutdown_import_pool()
+    global_logger.info("Application Shutdown: Closing Valkey connection pools.")
+    await close_valkey_clients()
     global_logger.info("Application Shutdown: Disposing of database engine.")
     if engine: 
         await engine.dispose()
@@ -49,6 +68,7 @@ app.include_router(answer.answer_router)
 app.include_router(record.record_router)
 app.include_router(scoreboard.scoreboard_router)
 app.include_router(controller.controller_router)
+app.include_router(metrics.metrics_router)
 
 
 
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import String, Boolean, DateTime, ForeignKey, Numeric, UUID, Text
+from sqlalchemy import String, Boolean, DateTime, ForeignKey, Numeric, Index, UUID, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.dependencies.db import Base
@@ -15,6 +15,12 @@ def utcnow():
 
 class Answer(Base):
     __tablename__ = "answers"
+    # Constraints
+    __table_args__ = (
+        # Latest answer per (player, question) of a match is read straight from this index
+        Index('ix_answers_match_player_question_updated_at', 'match_id', 'player_id', 'question_id', 'updated_at'),
+        Index('ix_answers_question_id', 'question_id'),
+    )
     # Columns
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import String, DateTime, Boolean, ForeignKey, CheckConstraint, UUID
+from sqlalchemy import String, DateTime, Boolean, ForeignKey, CheckConstraint, UUID, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.dependencies.db import Base
@@ -23,6 +23,7 @@ class Player(Base):
     # Constraints
     __table_args__ = (
         CheckConstraint("player_code LIKE 'P%'", name='check_player_code_starts_with_P'),
+        Index('ix_players_created_at_id', 'created_at', 'id'),
     )
     # Columns
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
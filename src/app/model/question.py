@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, UUID, ForeignKey, Boolean, Text
+from sqlalchemy import String, DateTime, UUID, ForeignKey, Boolean, Text, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -13,6 +13,11 @@ def utcnow():
 
 class Question(Base):
     __tablename__ = "questions"
+    # Constraints
+    __table_args__ = (
+        UniqueConstraint('match_id', 'question_code', name='uq_questions_match_id_question_code'),
+        Index('ix_questions_match_id_created_at_id', 'match_id', 'created_at', 'id'),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import Integer, String, DateTime, Boolean, ForeignKey, CheckConstraint, UUID
+from sqlalchemy import Integer, String, DateTime, Boolean, ForeignKey, CheckConstraint, Index, UUID, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.dependencies.db import Base
@@ -22,6 +22,15 @@ class Record(Base):
     # Constraints
     __table_args__ = (
         CheckConstraint('d_score_earned % 5 = 0', name='check_d_score_earned_multiple_of_5'),
+        # One live record per (player, match, question); soft-deleted rows don't count
+        Index(
+            'uq_records_match_question_player', 'match_id', 'question_id', 'player_id',
+            unique=True, postgresql_where=text('NOT is_deleted')
+        ),
+        # Per-match / per-player timelines, in the (created_at, id) keyset order of the paginated listings
+        Index('ix_records_match_id_created_at_id', 'match_id', 'created_at', 'id'),
+        Index('ix_records_player_id_created_at_id', 'player_id', 'created_at', 'id'),
+        Index('ix_records_question_id', 'question_id'),
     )
     # Columns
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
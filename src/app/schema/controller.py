@@ -22,4 +22,19 @@ class PickQuestionRequest(BaseRequest):
 
 
 class PickQuestionResponse(BaseResponse):
+    pass
+
+
+
+class CancelTimerRequest(BaseRequest):
+    match_code: str
+
+
+
+class CancelTimerResponse(BaseResponse):
+    pass
+
+
+
+class GetMatchSnapshotResponse(BaseResponse):
     pass
\ No newline at end of file
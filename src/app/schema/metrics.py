@@ -0,0 +1,6 @@
+from app.schema.base import BaseResponse
+
+
+
+class GetMetricsResponse(BaseResponse):
+    pass
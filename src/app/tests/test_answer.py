@@ -0,0 +1,27 @@
+import uuid
+
+import fakeredis
+import pytest
+from pytest_mock import MockerFixture
+
+from app.core.answer import post_answer_to_db
+from app.schema.answer import PostAnswerRequest
+from app.utils.answer_cache import get_recent_answers
+
+
+@pytest.mark.asyncio
+async def test_recent_answer_has_the_persisted_timestamp(mocker: MockerFixture):
+    mocker.patch("app.core.answer._get_ids_by_codes", new=mocker.AsyncMock(return_value=(uuid.uuid4(), uuid.uuid4())))
+    mocker.patch("app.core.answer._get_question_id_by_code", new=mocker.AsyncMock(return_value=uuid.uuid4()))
+    session = mocker.AsyncMock()
+    session.add = mocker.Mock()
+    cache = fakeredis.FakeAsyncRedis(decode_responses=True)
+    request = PostAnswerRequest(player_code="P01", match_code="M01", question_code="Q01", timestamp=12.34567, content="Hà Nội")
+
+    await post_answer_to_db(request, session, cache)
+
+    persisted = session.add.call_args.args[0]
+    [answer] = await get_recent_answers(cache, "M01")
+    assert persisted.timestamp == 12.346
+    assert answer["timestamp"] == persisted.timestamp
+    await cache.aclose()
@@ -0,0 +1,170 @@
+import json
+import time
+import uuid
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from pytest_mock import MockerFixture
+from sqlalchemy.dialects import postgresql
+
+from app.config import settings
+from app.utils.answer_writer import (
+    AnswerWriteBehind,
+    CLAIM_BATCH_SCRIPT,
+    DEAD_ANSWERS_KEY,
+    FLUSH_LOCK_KEY,
+    FLUSHING_ANSWERS_KEY,
+    PENDING_ANSWERS_KEY,
+    stage_answer_payload,
+)
+
+
+class FakeSession:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest_asyncio.fixture
+async def valkey(mocker: MockerFixture):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    mocker.patch.object(settings, "ANSWER_FLUSH_BATCH_SIZE", 3)
+    mocker.patch("app.utils.answer_writer.cache_recent_answers", new=mocker.AsyncMock())
+    yield client
+    await client.aclose()
+
+
+def staged(player_code: str, question_code: str = "Q01", **extra) -> str:
+    answer = json.loads(stage_answer_payload("M01", player_code, question_code, "Hà Nội", int(time.time() * 1000)))
+    return json.dumps({**answer, **extra})
+
+
+async def stage(valkey, count: int) -> list[str]:
+    answers = [staged(f"P{i:02d}") for i in range(count)]
+    await valkey.rpush(PENDING_ANSWERS_KEY, *answers)
+    return answers
+
+
+def persist_all(mocker: MockerFixture, writer: AnswerWriteBehind):
+    """Write every answer of the batch (the database side is covered by the _persist tests)."""
+    async def persist(answers):
+        return answers, []
+    return mocker.patch.object(writer, "_persist", side_effect=persist)
+
+
+@pytest.mark.asyncio
+async def test_claim_moves_one_batch_to_flushing(valkey):
+    answers = await stage(valkey, 5)
+
+    batch = await valkey.register_script(CLAIM_BATCH_SCRIPT)(keys=[PENDING_ANSWERS_KEY, FLUSHING_ANSWERS_KEY], args=[3])
+
+    assert batch == answers[:3]
+    assert await valkey.lrange(FLUSHING_ANSWERS_KEY, 0, -1) == answers[:3]
+    assert await valkey.lrange(PENDING_ANSWERS_KEY, 0, -1) == answers[3:]
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_a_batch_and_clears_flushing(valkey, mocker: MockerFixture):
+    writer = AnswerWriteBehind()
+    persist = persist_all(mocker, writer)
+    await stage(valkey, 5)
+
+    assert await writer.flush_once(valkey, valkey) == 3
+    assert await writer.flush_once(valkey, valkey) == 2
+    assert await writer.flush_once(valkey, valkey) == 0
+
+    assert [len(call.args[0]) for call in persist.call_args_list] == [3, 2]
+    assert await valkey.exists(PENDING_ANSWERS_KEY, FLUSHING_ANSWERS_KEY, FLUSH_LOCK_KEY) == 0
+    assert writer.get_stats()["flushed_answers"] == 5
+
+
+@pytest.mark.asyncio
+async def test_batch_left_by_a_failed_flush_is_replayed_first(valkey, mocker: MockerFixture):
+    writer = AnswerWriteBehind()
+    answers = await stage(valkey, 5)
+    mocker.patch.object(writer, "_persist", side_effect=ConnectionError("database is down"))
+
+    with pytest.raises(ConnectionError):
+        await writer.flush_once(valkey, valkey)
+    # The batch stays claimed and the lock is released for the next try
+    assert await valkey.lrange(FLUSHING_ANSWERS_KEY, 0, -1) == answers[:3]
+    assert not await valkey.exists(FLUSH_LOCK_KEY)
+
+    persist = persist_all(mocker, writer)
+    assert await writer.flush_once(valkey, valkey) == 3
+    assert [answer["id"] for answer in persist.call_args.args[0]] == [json.loads(raw)["id"] for raw in answers[:3]]
+    assert await valkey.lrange(PENDING_ANSWERS_KEY, 0, -1) == answers[3:]
+
+
+@pytest.mark.asyncio
+async def test_flush_skipped_while_another_worker_holds_the_lock(valkey, mocker: MockerFixture):
+    writer = AnswerWriteBehind()
+    persist = persist_all(mocker, writer)
+    await stage(valkey, 2)
+    await valkey.set(FLUSH_LOCK_KEY, "other-worker", px=10000)
+
+    assert await writer.flush_once(valkey, valkey) == 0
+
+    persist.assert_not_called()
+    assert await valkey.llen(PENDING_ANSWERS_KEY) == 2
+    assert await valkey.get(FLUSH_LOCK_KEY) == "other-worker"
+
+
+@pytest.mark.asyncio
+async def test_unwritable_answers_go_to_the_dead_list(valkey, mocker: MockerFixture):
+    writer = AnswerWriteBehind()
+    await stage(valkey, 2)
+
+    async def persist(answers):
+        return answers[:1], [{**answers[1], "error": "Player not found"}]
+
+    mocker.patch.object(writer, "_persist", side_effect=persist)
+
+    assert await writer.flush_once(valkey, valkey) == 2
+
+    dead = [json.loads(raw) for raw in await valkey.lrange(DEAD_ANSWERS_KEY, 0, -1)]
+    assert [answer["player_code"] for answer in dead] == ["P01"]
+    assert not await valkey.exists(FLUSHING_ANSWERS_KEY)
+    assert writer.get_stats()["dead_lettered"] == 1
+
+
+@pytest.mark.asyncio
+async def test_persist_sets_aside_unknown_codes_and_out_of_range_timestamps(mocker: MockerFixture):
+    session = FakeSession()
+    mocker.patch("app.utils.answer_writer.AsyncSessionLocal", new=lambda: session)
+
+    async def get_ids(session, lookups):
+        if lookups[0][2] == "PX":
+            raise HTTPException(404, "Player not found")
+        return uuid.uuid4(), uuid.uuid4()
+
+    mocker.patch("app.utils.answer_writer._get_ids_by_codes", side_effect=get_ids)
+    mocker.patch("app.utils.answer_writer._get_question_id_by_code", new=mocker.AsyncMock(return_value=uuid.uuid4()))
+    answers = [
+        json.loads(staged("P01", timestamp=12.3456)),
+        json.loads(staged("P02", timestamp=99.9996)),
+        json.loads(staged("PX", timestamp=1.0)),
+    ]
+
+    written, dead = await AnswerWriteBehind()._persist(answers)
+
+    assert [answer["player_code"] for answer in written] == ["P01", "P02"]
+    assert [(answer["player_code"], answer["error"]) for answer in dead] == [("PX", "Player not found")]
+    assert [answer["timestamp"] for answer in written] == [12.346, None]
+    params = session.statements[0].compile(dialect=postgresql.dialect()).params
+    assert sorted((key, value) for key, value in params.items() if key.startswith("timestamp")) == [("timestamp_m0", 12.346), ("timestamp_m1", None)]
+    assert session.commits == 1
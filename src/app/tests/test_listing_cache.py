@@ -0,0 +1,116 @@
+import json
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from fastapi import Response
+
+from app.utils.listing_cache import ListingCache, listing_key
+
+
+@pytest_asyncio.fixture
+async def valkey():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+def listing_loader(rows: list[dict], side_effect=None):
+    """The DB side of a listing: returns `rows` (after running side_effect, if given) and counts its calls."""
+    calls = []
+
+    async def load():
+        calls.append(1)
+        if side_effect is not None:
+            await side_effect()
+        return Response(content=json.dumps({"response": {"data": rows}}), media_type="application/json")
+
+    return load, calls
+
+
+@pytest.mark.asyncio
+async def test_second_read_is_served_from_cache(valkey):
+    cache = ListingCache()
+    load, calls = listing_loader([{"player_code": "P01"}])
+
+    first = await cache.respond(valkey, "players", None, load)
+    second = await cache.respond(valkey, "players", None, load)
+
+    assert len(calls) == 1
+    assert second.status_code == 200
+    assert second.body == first.body
+    assert second.headers["etag"] == first.headers["etag"]
+    assert json.loads(second.body)["response"]["data"] == [{"player_code": "P01"}]
+    assert cache.get_stats() == {"hits": 1, "not_modified": 0, "misses": 1, "bypassed": 0}
+
+
+@pytest.mark.asyncio
+async def test_current_etag_gets_304(valkey):
+    cache = ListingCache()
+    load, _ = listing_loader([{"player_code": "P01"}])
+    etag = (await cache.respond(valkey, "players", None, load)).headers["etag"]
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = await cache.respond(valkey, "players", header, load)
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == etag
+
+    assert (await cache.respond(valkey, "players", '"other"', load)).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_bump_makes_the_next_read_reload(valkey):
+    cache = ListingCache()
+    rows = [{"player_code": "P01"}]
+    load, calls = listing_loader(rows)
+    etag = (await cache.respond(valkey, "players", None, load)).headers["etag"]
+
+    rows.append({"player_code": "P02"})
+    await cache.bump(valkey, "players", "teams")
+    response = await cache.respond(valkey, "players", etag, load)
+
+    assert len(calls) == 2
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(json.loads(response.body)["response"]["data"]) == 2
+    assert await valkey.hget(listing_key("teams"), "version") == "1"
+
+
+@pytest.mark.asyncio
+async def test_body_built_before_a_write_is_not_stored(valkey):
+    cache = ListingCache()
+
+    async def concurrent_write():
+        await cache.bump(valkey, "players")
+
+    # The write lands while the body is being built: it is served once but not cached
+    stale_load, _ = listing_loader([{"player_code": "P01"}], side_effect=concurrent_write)
+    assert (await cache.respond(valkey, "players", None, stale_load)).status_code == 200
+    assert not await valkey.hexists(listing_key("players"), "body")
+
+    load, calls = listing_loader([{"player_code": "P01"}, {"player_code": "P02"}])
+    await cache.respond(valkey, "players", None, load)
+    response = await cache.respond(valkey, "players", None, load)
+
+    assert len(calls) == 1
+    assert len(json.loads(response.body)["response"]["data"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_valkey_failure_serves_from_db_uncached():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    broken = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    cache = ListingCache()
+    load, calls = listing_loader([{"player_code": "P01"}])
+
+    response = await cache.respond(broken, "players", None, load)
+    await cache.bump(broken, "players")
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert json.loads(response.body)["response"]["data"] == [{"player_code": "P01"}]
+    assert len(calls) == 1
+    assert cache.get_stats()["bypassed"] == 1
+    await broken.aclose()
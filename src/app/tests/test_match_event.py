@@ -0,0 +1,171 @@
+import asyncio
+import json
+import time
+
+import fakeredis
+import pytest
+import pytest_asyncio
+
+from app.utils.match_event import arbitrate_buzz, submit_answer, trigger_start_time, buzz_order_key
+from app.utils.match_state import match_state_key, read_match_snapshot
+from app.utils.match_timer import TIMER_DEADLINES_KEY
+from app.utils.match_stream import match_events_key
+from app.utils.answer_writer import PENDING_ANSWERS_KEY
+
+
+MATCH_CODE = "M01"
+
+
+@pytest_asyncio.fixture
+async def valkey():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+async def published(valkey, event_type: str) -> list[dict]:
+    entries = await valkey.xrange(match_events_key(MATCH_CODE))
+    events = [json.loads(fields["event"]) for _, fields in entries]
+    return [event for event in events if event["type"] == event_type]
+
+
+def answer_event(player_code: str, question_code: str | None) -> dict:
+    return {"type": "player_answered", "player_code": player_code, "question_code": question_code, "answer": "Hà Nội"}
+
+
+@pytest.mark.asyncio
+async def test_start_sets_state_timer_and_event_together(valkey):
+    result = await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+
+    snapshot = await read_match_snapshot(valkey, valkey, MATCH_CODE)
+    [event] = await published(valkey, "start_the_timer")
+    deadline_ms = int(result["end_time"] * 1000)
+    assert snapshot["current_question_code"] == "Q01"
+    assert not snapshot["locked"]
+    assert snapshot["timer"]["question_code"] == "Q01"
+    assert snapshot["timer"]["deadline_ms"] == deadline_ms
+    assert snapshot["event_id"] == (await valkey.xrevrange(match_events_key(MATCH_CODE), count=1))[0][0]
+    assert event["question_code"] == "Q01"
+    assert await valkey.zscore(TIMER_DEADLINES_KEY, MATCH_CODE) == deadline_ms
+
+
+@pytest.mark.asyncio
+async def test_buzz_single_winner_gap_free_order(valkey):
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+
+    results = await asyncio.gather(*(
+        arbitrate_buzz(valkey, MATCH_CODE, f"P{i:02d}", "Q01", now_ms()) for i in range(20)
+    ))
+
+    assert all(result["accepted"] for result in results)
+    assert sorted(result["position"] for result in results) == list(range(1, 21))
+    events = await published(valkey, "player_buzzed")
+    assert len(events) == 20
+    assert [event["is_first"] for event in events].count(True) == 1
+    assert await valkey.llen(buzz_order_key(MATCH_CODE, "Q01")) == 20
+
+
+@pytest.mark.asyncio
+async def test_buzz_twice_is_rejected(valkey):
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+
+    assert (await arbitrate_buzz(valkey, MATCH_CODE, "P01", "Q01", now_ms()))["accepted"]
+    result = await arbitrate_buzz(valkey, MATCH_CODE, "P01", "Q01", now_ms())
+
+    assert result == {"accepted": False, "reason": "already_buzzed"}
+    assert len(await published(valkey, "player_buzzed")) == 1
+
+
+@pytest.mark.asyncio
+async def test_buzz_after_lock_is_rejected(valkey):
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+    await valkey.hset(match_state_key(MATCH_CODE), "locked", 1)
+
+    result = await arbitrate_buzz(valkey, MATCH_CODE, "P01", "Q01", now_ms())
+
+    assert result == {"accepted": False, "reason": "time_up"}
+    assert await published(valkey, "player_buzzed") == []
+
+
+@pytest.mark.asyncio
+async def test_buzz_after_deadline_is_rejected(valkey):
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+
+    result = await arbitrate_buzz(valkey, MATCH_CODE, "P01", "Q01", now_ms() + 31_000)
+
+    assert result == {"accepted": False, "reason": "time_up"}
+
+
+@pytest.mark.asyncio
+async def test_buzz_without_question_code_goes_to_current_question(valkey):
+    assert await arbitrate_buzz(valkey, MATCH_CODE, "P01", None, now_ms()) == {"accepted": False, "reason": "no_question"}
+
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+    assert (await arbitrate_buzz(valkey, MATCH_CODE, "P01", None, now_ms()))["accepted"]
+    await trigger_start_time(valkey, MATCH_CODE, "Q02", 30)
+    assert (await arbitrate_buzz(valkey, MATCH_CODE, "P01", None, now_ms()))["accepted"]
+
+    events = await published(valkey, "player_buzzed")
+    assert [event["question_code"] for event in events] == ["Q01", "Q02"]
+
+
+@pytest.mark.asyncio
+async def test_question_asked_again_starts_a_new_buzz_order(valkey):
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+    assert (await arbitrate_buzz(valkey, MATCH_CODE, "P01", "Q01", now_ms()))["accepted"]
+
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+    result = await arbitrate_buzz(valkey, MATCH_CODE, "P02", "Q01", now_ms())
+
+    assert result == {"accepted": True, "position": 1}
+
+
+@pytest.mark.asyncio
+async def test_answer_is_published_and_staged(valkey):
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+
+    assert await submit_answer(valkey, MATCH_CODE, answer_event("P01", "Q01"), now_ms())
+
+    assert len(await published(valkey, "player_answered")) == 1
+    staged = json.loads(await valkey.lindex(PENDING_ANSWERS_KEY, 0))
+    assert staged["player_code"] == "P01"
+    assert staged["question_code"] == "Q01"
+    assert 0 <= staged["timestamp"] < 30
+
+
+@pytest.mark.asyncio
+async def test_answer_after_lock_or_deadline_is_rejected(valkey):
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+
+    assert not await submit_answer(valkey, MATCH_CODE, answer_event("P01", "Q01"), now_ms() + 31_000)
+    await valkey.hset(match_state_key(MATCH_CODE), "locked", 1)
+    assert not await submit_answer(valkey, MATCH_CODE, answer_event("P01", "Q01"), now_ms())
+
+    assert await published(valkey, "player_answered") == []
+    assert await valkey.llen(PENDING_ANSWERS_KEY) == 0
+
+
+@pytest.mark.asyncio
+async def test_answer_without_question_code_is_staged_for_current_question(valkey):
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+
+    assert await submit_answer(valkey, MATCH_CODE, answer_event("P01", None), now_ms())
+
+    staged = json.loads(await valkey.lindex(PENDING_ANSWERS_KEY, 0))
+    assert staged["question_code"] == "Q01"
+
+
+@pytest.mark.asyncio
+async def test_answer_without_question_code_is_buzzed_on_current_question(valkey):
+    await trigger_start_time(valkey, MATCH_CODE, "Q01", 30)
+    assert (await arbitrate_buzz(valkey, MATCH_CODE, "P01", "Q01", now_ms()))["accepted"]
+
+    assert await submit_answer(valkey, MATCH_CODE, answer_event("P01", None), now_ms())
+    assert await submit_answer(valkey, MATCH_CODE, answer_event("P02", None), now_ms())
+
+    staged = [json.loads(raw) for raw in await valkey.lrange(PENDING_ANSWERS_KEY, 0, -1)]
+    assert [(answer["player_code"], answer["is_buzzed"]) for answer in staged] == [("P01", True), ("P02", False)]
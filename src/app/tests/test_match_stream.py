@@ -0,0 +1,126 @@
+import json
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+
+from app.config import settings
+from app.core.controller import _send_first_frames
+from app.dependencies.ws import ClientConnection
+from app.utils.match_stream import (
+    event_id_of,
+    match_events_key,
+    publish_match_event,
+    read_events_after,
+    updates_channel,
+    with_event_id,
+)
+
+
+MATCH_CODE = "M01"
+
+
+@pytest_asyncio.fixture
+async def valkey():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+def paused_client() -> ClientConnection:
+    """A client as handle_match_websocket leaves it before the first frames: paused, writer not started."""
+    client = ClientConnection(MATCH_CODE, websocket=None, max_queue_size=100, overflow_policy="drop_oldest")
+    client.paused = True
+    return client
+
+
+async def publish_many(valkey, count: int) -> list[str]:
+    return [await publish_match_event(valkey, MATCH_CODE, {"type": "tick", "n": i}) for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_publish_appends_to_stream_and_puts_event_id_first(valkey):
+    subscriber = valkey.pubsub()
+    await subscriber.subscribe(updates_channel(MATCH_CODE))
+    await subscriber.get_message(timeout=1)
+
+    event_id = await publish_match_event(valkey, MATCH_CODE, {"type": "player_buzzed", "player_code": "P01"})
+    message = await subscriber.get_message(ignore_subscribe_messages=True, timeout=1)
+    await subscriber.aclose()
+
+    [(stored_id, fields)] = await valkey.xrange(match_events_key(MATCH_CODE))
+    assert stored_id == event_id
+    assert json.loads(fields["event"]) == {"type": "player_buzzed", "player_code": "P01"}
+    assert message["data"] == with_event_id(event_id, fields["event"])
+    assert event_id_of(message["data"]) == event_id
+    assert json.loads(message["data"]) == {"event_id": event_id, "type": "player_buzzed", "player_code": "P01"}
+
+
+@pytest.mark.asyncio
+async def test_read_events_after_replays_in_order(valkey):
+    event_ids = await publish_many(valkey, 5)
+
+    frames = await read_events_after(valkey, MATCH_CODE, event_ids[1], limit=10)
+
+    assert [event_id for event_id, _ in frames] == event_ids[2:]
+    assert [json.loads(frame)["n"] for _, frame in frames] == [2, 3, 4]
+    assert await read_events_after(valkey, MATCH_CODE, event_ids[-1], limit=10) == []
+
+
+@pytest.mark.asyncio
+async def test_read_events_after_refuses_what_it_cannot_replay(valkey):
+    event_ids = await publish_many(valkey, 5)
+
+    assert await read_events_after(valkey, MATCH_CODE, "not-an-id", limit=10) is None
+    assert await read_events_after(valkey, MATCH_CODE, event_ids[0], limit=3) is None
+    # The client's last event, and the ones after it, were trimmed from the stream
+    await valkey.xtrim(match_events_key(MATCH_CODE), maxlen=2, approximate=False)
+    assert await read_events_after(valkey, MATCH_CODE, event_ids[1], limit=10) is None
+
+
+@pytest.mark.asyncio
+async def test_reconnecting_client_gets_the_missed_events(valkey):
+    event_ids = await publish_many(valkey, 3)
+    client = paused_client()
+
+    await _send_first_frames(client, MATCH_CODE, valkey, valkey, event_ids[0])
+
+    assert not client.paused
+    assert [event_id_of(frame) for frame in client.queue] == event_ids[1:]
+
+
+@pytest.mark.asyncio
+async def test_client_too_far_behind_gets_a_snapshot(valkey, mocker: MockerFixture):
+    mocker.patch.object(settings, "MATCH_EVENT_REPLAY_MAX", 2)
+    event_ids = await publish_many(valkey, 5)
+    client = paused_client()
+
+    await _send_first_frames(client, MATCH_CODE, valkey, valkey, event_ids[0])
+
+    [frame] = client.queue
+    snapshot = json.loads(frame)
+    assert snapshot["type"] == "snapshot"
+    assert snapshot["event_id"] == event_ids[-1]
+    assert not client.paused
+
+
+def test_resume_drops_live_frames_the_replay_covered():
+    client = paused_client()
+    for event_id in ("1-0", "2-0", "3-0"):
+        client.enqueue(with_event_id(event_id, '{"type":"tick"}'))
+    client.enqueue('{"type":"resync"}')
+
+    client.resume([with_event_id("1-0", '{"type":"tick"}'), with_event_id("2-0", '{"type":"tick"}')], "2-0")
+
+    assert [event_id_of(frame) for frame in client.queue] == ["1-0", "2-0", "3-0", None]
+    assert not client.paused
+
+
+def test_resume_without_position_keeps_every_live_frame():
+    client = paused_client()
+    client.enqueue(with_event_id("1-0", '{"type":"tick"}'))
+
+    client.resume(['{"type":"resync"}'], None)
+
+    assert list(client.queue) == ['{"type":"resync"}', with_event_id("1-0", '{"type":"tick"}')]
@@ -23,7 +23,7 @@ async def test_post_match_success(mocker: MockerFixture):
 @pytest.mark.asyncio
 async def test_get_all_matches(mocker: MockerFixture):
     mocker.patch(
-        "app.api.match.get_all_matches_from_db",
+        "app.api.match.get_all_matches_from_cache",
         new=mocker.AsyncMock(return_value={"response": {"data": [{"match_name": "Round 1", "match_code": "M01", "players": [{"player_name": "Alice", "player_code": "P01"}]}]}})
     )
 
@@ -25,7 +25,7 @@ async def test_post_player_success(mocker: MockerFixture):
 @pytest.mark.asyncio
 async def test_get_all_players(mocker: MockerFixture):
     mocker.patch(
-        "app.api.player.get_all_players_from_db",
+        "app.api.player.get_all_players_from_cache",
         new=mocker.AsyncMock(return_value={"response": {"data": [{"player_name": "Alice", "team_name": "Team A"}]}})
     )
 
@@ -0,0 +1,103 @@
+import uuid
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy.exc import MultipleResultsFound
+from sqlalchemy.sql.elements import False_, True_
+
+from app.core.record import delete_all_records_from_match_code_in_db, post_record_to_db, put_record_to_db
+from app.model.record import Record
+from app.schema.record import PostRecordRequest, PutRecordRequest
+
+
+PLAYER_ID, MATCH_ID, QUESTION_ID = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+
+class RecordsResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalar_one_or_none(self):
+        if len(self.rows) > 1:
+            raise MultipleResultsFound("Multiple rows were found when one or none was required")
+        return self.rows[0] if self.rows else None
+
+
+class RecordsSession:
+    """The records table in memory: selects filter on the column == value / IS criteria of their WHERE."""
+    def __init__(self, rows: list[Record]):
+        self.rows = rows
+
+    def add(self, record: Record):
+        self.rows.append(record)
+
+    async def execute(self, statement):
+        return RecordsResult([row for row in self.rows if all(_matches(row, criterion) for criterion in _criteria(statement.whereclause))])
+
+    async def commit(self):
+        for row in self.rows:
+            row.id = row.id or uuid.uuid4()
+            row.is_deleted = bool(row.is_deleted)
+
+    async def refresh(self, record: Record):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+def _criteria(clause) -> list:
+    return list(getattr(clause, "clauses", [clause]))
+
+
+def _matches(row: Record, criterion) -> bool:
+    """column == value, or column IS true / false."""
+    right = criterion.right
+    if isinstance(right, (True_, False_)):
+        return getattr(row, criterion.left.key) is isinstance(right, True_)
+    return getattr(row, criterion.left.key) == right.value
+
+
+@pytest.fixture
+def score_delta(mocker: MockerFixture):
+    mocker.patch("app.core.record._get_ids_by_codes", new=mocker.AsyncMock(return_value=(PLAYER_ID, MATCH_ID)))
+    mocker.patch("app.core.record._get_question_id_by_code", new=mocker.AsyncMock(return_value=QUESTION_ID))
+    mocker.patch("app.core.record.begin_score_change", new=mocker.AsyncMock(return_value="token"))
+    return mocker.patch("app.core.record.apply_score_delta", new=mocker.AsyncMock(return_value={"new_total_score": 0, "rank": 1}))
+
+
+@pytest.mark.asyncio
+async def test_put_after_delete_all_and_repost_edits_the_live_record(score_delta):
+    # What delete_all_records_from_match_code_in_db leaves behind: the old record, soft-deleted
+    deleted = Record(id=uuid.uuid4(), player_id=PLAYER_ID, match_id=MATCH_ID, question_id=QUESTION_ID, d_score_earned=5, is_deleted=True)
+    session = RecordsSession([deleted])
+    key = {"player_code": "P01", "match_code": "M01", "question_code": "Q01"}
+
+    await post_record_to_db(PostRecordRequest(**key, d_score_earned=10), None, session)
+    await put_record_to_db(PutRecordRequest(**key, d_score_earned=15), None, session)
+
+    live = session.rows[1]
+    assert (live.d_score_earned, live.is_deleted) == (15, False)
+    assert deleted.d_score_earned == 5
+    assert [call.args[3] for call in score_delta.call_args_list] == [10, 5]
+
+
+@pytest.mark.asyncio
+async def test_delete_all_takes_the_scoreboard_offline(mocker: MockerFixture):
+    begin = mocker.patch("app.core.record.begin_score_change", new=mocker.AsyncMock(return_value="token"))
+    discard = mocker.patch("app.core.record.discard_scoreboard", new=mocker.AsyncMock())
+    keeper = mocker.patch("app.core.record.scoreboard_keeper")
+    keeper.rebuild = mocker.AsyncMock(return_value=True)
+    session = mocker.AsyncMock()
+    session.execute.return_value = mocker.Mock(scalar_one_or_none=mocker.Mock(return_value=QUESTION_ID), rowcount=2)
+
+    async def commit():
+        # Announced before the commit, discarded only after it
+        assert begin.await_count == 1 and discard.await_count == 0
+
+    session.commit.side_effect = commit
+
+    await delete_all_records_from_match_code_in_db("M01", session, "cache")
+
+    discard.assert_awaited_once_with("cache", "M01", "token")
+    keeper.rebuild.assert_awaited_once_with("cache", "M01")
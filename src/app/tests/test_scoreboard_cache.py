@@ -0,0 +1,236 @@
+import json
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+
+from app.utils.scoreboard_cache import (
+    ScoreboardCacheKeeper,
+    apply_score_delta,
+    begin_score_change,
+    discard_scoreboard,
+    get_ranked_scoreboard,
+    scoreboard_keys,
+)
+from app.utils.match_stream import match_events_key
+
+
+MATCH_CODE = "M01"
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def rollback(self):
+        pass
+
+
+@pytest_asyncio.fixture
+async def valkey(mocker: MockerFixture):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    # Scores are published on the pub/sub client; one fake server plays both here
+    mocker.patch("app.utils.scoreboard_cache.get_valkey_pubsub", new=mocker.AsyncMock(return_value=client))
+    mocker.patch("app.utils.scoreboard_cache.AsyncSessionLocal", new=FakeSession)
+    mocker.patch("app.utils.scoreboard_cache._match_exists", new=mocker.AsyncMock(return_value=True))
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+def keeper(mocker: MockerFixture):
+    keeper = ScoreboardCacheKeeper()
+    mocker.patch("app.utils.scoreboard_cache.scoreboard_keeper", new=keeper)
+    return keeper
+
+
+def records_totals(mocker: MockerFixture, totals: dict[str, int], side_effect=None):
+    """The records table as seen by the rebuild: returns `totals` (after running side_effect once, if given)."""
+    calls = []
+
+    async def get_totals(match_code, session):
+        calls.append(match_code)
+        if side_effect is not None and len(calls) == 1:
+            await side_effect()
+        return dict(totals)
+
+    mocker.patch("app.utils.scoreboard_cache.get_scoreboard_totals_from_db", new=get_totals)
+    return calls
+
+
+async def cached_totals(valkey) -> dict[str, int]:
+    return {player_code: int(total) for player_code, total in (await valkey.hgetall(scoreboard_keys(MATCH_CODE)[0])).items()}
+
+
+@pytest.mark.asyncio
+async def test_apply_score_ranks_and_publishes(valkey, keeper, mocker: MockerFixture):
+    records_totals(mocker, {})
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+
+    await apply_score_delta(valkey, MATCH_CODE, "P01", 10, 10)
+    await apply_score_delta(valkey, MATCH_CODE, "P02", 20, 20)
+    event = await apply_score_delta(valkey, MATCH_CODE, "P01", 15, 15)
+
+    assert event["type"] == "player_score_updated"
+    assert event["new_total_score"] == 25
+    assert event["rank"] == 1
+    assert event["previous_rank"] == 2
+    assert event["rank_change"] == 1
+    assert [entry["player_code"] for entry in event["top"]] == ["P01", "P02"]
+    assert await cached_totals(valkey) == {"P01": 25, "P02": 20}
+    assert len(await valkey.xrange(match_events_key(MATCH_CODE))) == 3
+    assert keeper.get_stats()["score_updates"] == 3
+
+
+@pytest.mark.asyncio
+async def test_overtaken_players_get_their_rank_change(valkey, keeper, mocker: MockerFixture):
+    records_totals(mocker, {"P01": 10, "P02": 20, "P03": 15, "P04": 5})
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+
+    # P01 passes P03 and P02
+    await apply_score_delta(valkey, MATCH_CODE, "P01", 15, 15)
+    standings = await get_ranked_scoreboard(valkey, MATCH_CODE, top_k=3)
+    assert [(entry["player_code"], entry["rank"], entry["rank_change"]) for entry in standings["scoreboard"]] == [
+        ("P01", 1, 2), ("P02", 2, -1), ("P03", 3, -1), ("P04", 4, 0)
+    ]
+
+    # Then falls back behind P02, into a tie with P03 (who moves back up)
+    await apply_score_delta(valkey, MATCH_CODE, "P01", -10, -10)
+    standings = await get_ranked_scoreboard(valkey, MATCH_CODE, top_k=3)
+    assert [(entry["player_code"], entry["rank"], entry["rank_change"]) for entry in standings["scoreboard"]] == [
+        ("P02", 1, 1), ("P01", 2, -1), ("P03", 2, 1), ("P04", 4, 0)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ties_share_a_rank(valkey, keeper, mocker: MockerFixture):
+    records_totals(mocker, {"P01": 10, "P02": 10, "P03": 5})
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+
+    standings = await get_ranked_scoreboard(valkey, MATCH_CODE, top_k=1)
+
+    assert [(entry["player_code"], entry["rank"]) for entry in standings["scoreboard"]] == [("P01", 1), ("P02", 1), ("P03", 3)]
+    assert [entry["player_code"] for entry in standings["top"]] == ["P01", "P02"]
+
+
+@pytest.mark.asyncio
+async def test_apply_without_scoreboard_rebuilds_from_records(valkey, keeper, mocker: MockerFixture):
+    # The record is committed before the cache is touched: the rebuild already counts it
+    records_totals(mocker, {"P01": 10})
+
+    event = await apply_score_delta(valkey, MATCH_CODE, "P01", 10, 10)
+
+    assert event["new_total_score"] == 10
+    assert await cached_totals(valkey) == {"P01": 10}
+    assert keeper.rebuilds == 1
+
+
+@pytest.mark.asyncio
+async def test_replace_scoreboard_refuses_totals_raced_by_an_update(valkey, keeper, mocker: MockerFixture):
+    records_totals(mocker, {"P01": 10})
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+
+    async def concurrent_update():
+        await apply_score_delta(valkey, MATCH_CODE, "P01", 5, 5)
+
+    # The first attempt reads the records while an update lands; the second sees it committed
+    calls = records_totals(mocker, {"P01": 15}, side_effect=concurrent_update)
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+
+    assert len(calls) == 2
+    assert keeper.rebuild_conflicts == 1
+    assert await cached_totals(valkey) == {"P01": 15}
+
+
+@pytest.mark.asyncio
+async def test_rebuild_between_commit_and_apply_does_not_count_twice(valkey, keeper, mocker: MockerFixture):
+    records_totals(mocker, {"P01": 10})
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+
+    # A +5 record is committed (so the records total is 15) but its delta hasn't been applied yet
+    token = await begin_score_change(valkey, MATCH_CODE)
+    records_totals(mocker, {"P01": 15})
+    await valkey.delete(scoreboard_keys(MATCH_CODE)[4])
+    assert not await keeper.rebuild(valkey, MATCH_CODE)
+
+    event = await apply_score_delta(valkey, MATCH_CODE, "P01", 5, 5, token)
+
+    assert event["new_total_score"] == 15
+    assert await cached_totals(valkey) == {"P01": 15}
+
+
+@pytest.mark.asyncio
+async def test_rebuild_refused_while_a_change_is_pending(valkey, keeper, mocker: MockerFixture):
+    records_totals(mocker, {"P01": 15})
+    token = await begin_score_change(valkey, MATCH_CODE)
+
+    assert not await keeper.rebuild(valkey, MATCH_CODE)
+    assert keeper.rebuild_failures == 1
+
+    await apply_score_delta(valkey, MATCH_CODE, "P01", 5, 5, token)
+    assert await cached_totals(valkey) == {"P01": 15}
+
+
+@pytest.mark.asyncio
+async def test_stale_pending_change_stops_blocking_rebuilds(valkey, keeper, mocker: MockerFixture):
+    records_totals(mocker, {"P01": 15})
+    # Announced long ago, its apply never came (the worker died after the commit)
+    await valkey.zadd(scoreboard_keys(MATCH_CODE)[5], {"lost": 0})
+
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+    assert await valkey.zcard(scoreboard_keys(MATCH_CODE)[5]) == 0
+
+
+@pytest.mark.asyncio
+async def test_published_event_carries_its_stream_id(valkey, keeper, mocker: MockerFixture):
+    records_totals(mocker, {})
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+    subscriber = valkey.pubsub()
+    await subscriber.subscribe(f"match:{MATCH_CODE}:updates")
+    await subscriber.get_message(timeout=1)
+
+    await apply_score_delta(valkey, MATCH_CODE, "P01", 10, 10)
+    message = await subscriber.get_message(ignore_subscribe_messages=True, timeout=1)
+    await subscriber.aclose()
+
+    frame = json.loads(message["data"])
+    event_id = (await valkey.xrevrange(match_events_key(MATCH_CODE), count=1))[0][0]
+    assert frame["event_id"] == event_id
+    assert frame["type"] == "player_score_updated"
+
+
+@pytest.mark.asyncio
+async def test_discarded_scoreboard_is_rebuilt_from_the_records(valkey, keeper, mocker: MockerFixture):
+    records_totals(mocker, {"P01": 10})
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+
+    # Every record of the match is deleted
+    token = await begin_score_change(valkey, MATCH_CODE)
+    records_totals(mocker, {})
+    await discard_scoreboard(valkey, MATCH_CODE, token)
+
+    assert await get_ranked_scoreboard(valkey, MATCH_CODE, top_k=3) is None
+    assert keeper.rebuilds == 2
+    assert await cached_totals(valkey) == {}
+    assert await valkey.zcard(scoreboard_keys(MATCH_CODE)[5]) == 0
+
+
+@pytest.mark.asyncio
+async def test_rebuild_that_read_totals_before_a_discard_is_refused(valkey, keeper, mocker: MockerFixture):
+    totals = [{"P01": 10}, {}]
+
+    async def get_totals(match_code, session):
+        if len(totals) == 2:
+            # The records are deleted while the first attempt reads them
+            await discard_scoreboard(valkey, MATCH_CODE)
+        return totals.pop(0)
+
+    mocker.patch("app.utils.scoreboard_cache.get_scoreboard_totals_from_db", new=get_totals)
+
+    assert await keeper.rebuild(valkey, MATCH_CODE)
+    assert keeper.rebuild_conflicts == 1
+    assert await cached_totals(valkey) == {}
@@ -23,7 +23,7 @@ async def test_post_team_success(mocker: MockerFixture):
 @pytest.mark.asyncio
 async def test_get_all_teams(mocker: MockerFixture):
     mocker.patch(
-        "app.api.team.get_all_teams_with_players_info_from_db",
+        "app.api.team.get_all_teams_with_players_info_from_cache",
         new=mocker.AsyncMock(return_value={"response": {"data": [{"team_name": "Team A", "team_code": "T01", "players": [{"player_name": "Alice", "player_code": "P01"}]}]}}),
         create=True
     )
@@ -0,0 +1,56 @@
+import json
+
+from valkey.asyncio import Valkey
+
+from app.config import settings
+
+
+
+def recent_answers_key(match_code: str) -> str:
+    """One hash per match: field "{player_code}:{question_code}" -> the latest answer as JSON."""
+    return f"answers:{match_code}"
+
+
+
+async def cache_recent_answers(cache: Valkey, answers: list[dict]):
+    """
+    Store (or replace) players' answers in their matches' hashes in one round trip; every write
+    pushes the match's TTL back. Each answer needs match_code, player_code, question_code,
+    content and timestamp.
+    """
+    async with cache.pipeline(transaction=True) as pipe:
+        for answer in answers:
+            key = recent_answers_key(answer["match_code"])
+            entry = {
+                "player_code": answer["player_code"],
+                "question_code": answer["question_code"],
+                "content": answer["content"] or "",
+                "timestamp": answer["timestamp"] if answer["timestamp"] is not None else 0.000,
+            }
+            pipe.hset(key, f"{answer['player_code']}:{answer['question_code']}", json.dumps(entry))
+            pipe.expire(key, settings.RECENT_ANSWERS_TTL_SECONDS)
+        await pipe.execute()
+
+
+
+async def cache_recent_answer(cache: Valkey, match_code: str, player_code: str, question_code: str, content: str | None, timestamp: float | None):
+    await cache_recent_answers(cache, [{
+        "match_code": match_code,
+        "player_code": player_code,
+        "question_code": question_code,
+        "content": content,
+        "timestamp": timestamp,
+    }])
+
+
+
+async def get_recent_answers(cache: Valkey, match_code: str) -> list[dict]:
+    """Every cached answer of the match (one HGETALL), oldest first; unreadable entries are skipped."""
+    answers = []
+    for raw in (await cache.hgetall(recent_answers_key(match_code))).values():
+        try:
+            answers.append(json.loads(raw))
+        except json.JSONDecodeError:
+            continue
+    answers.sort(key=lambda answer: answer.get("timestamp") or 0)
+    return answers
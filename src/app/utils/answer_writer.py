@@ -0,0 +1,239 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+from sqlalchemy.dialects.postgresql import insert
+from valkey.asyncio import Valkey
+
+from app.config import settings
+from app.dependencies.db import AsyncSessionLocal, get_script
+from app.model.player import Player
+from app.model.match import Match
+from app.model.answer import Answer
+from app.logger import global_logger
+from app.utils.helpers import _get_ids_by_codes, _get_question_id_by_code
+from app.utils.answer_cache import cache_recent_answers
+
+
+PENDING_ANSWERS_KEY = "answer_staging:pending"      # LIST of staged answers (JSON), appended by ANSWER_SCRIPT
+FLUSHING_ANSWERS_KEY = "answer_staging:flushing"    # LIST of the batch being written; replayed if a flush dies
+DEAD_ANSWERS_KEY = "answer_staging:dead"            # LIST of answers that can never be written (unknown codes)
+FLUSH_LOCK_KEY = "answer_staging:flush_lock"
+FLUSH_ERROR_BACKOFF = 1.0
+SHUTDOWN_FLUSH_ROUNDS = 20
+ANSWER_TIMESTAMP_LIMIT = 100  # answers.timestamp is Numeric(5, 3)
+
+
+# KEYS: pending, flushing / ARGV: batch size
+# Moves the next batch to the flushing list, unless a previous flush left one there: that one is
+# returned again (the insert ignores ids already written, so a replay is harmless).
+CLAIM_BATCH_SCRIPT = """
+if redis.call('LLEN', KEYS[2]) == 0 then
+    local batch = redis.call('LPOP', KEYS[1], ARGV[1])
+    if not batch then
+        return {}
+    end
+    redis.call('RPUSH', KEYS[2], unpack(batch))
+end
+return redis.call('LRANGE', KEYS[2], 0, -1)
+"""
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+
+def stage_answer_payload(match_code: str, player_code: str, question_code: str | None, content: str | None, received_ms: int) -> str:
+    """The staged form of a WS answer; ANSWER_SCRIPT fills in timestamp / is_buzzed / a missing question_code."""
+    return json.dumps({
+        "id": str(uuid.uuid4()),
+        "match_code": match_code,
+        "player_code": player_code,
+        "question_code": question_code,
+        "content": content,
+        "received_at_ms": received_ms,
+    })
+
+
+
+class AnswerWriteBehind:
+    """
+    Persists the answers staged in Valkey by the match WebSocket in batches: one multi-row
+    INSERT per flush, triggered every ANSWER_FLUSH_INTERVAL_SECONDS or as soon as
+    ANSWER_FLUSH_BATCH_SIZE answers are waiting. Every worker runs one; a Valkey lock lets a
+    single flush run at a time.
+    """
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.flushes = 0
+        self.flushed_answers = 0
+        self.dead_lettered = 0
+        self.failures = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.last_staging_delay_ms = None
+        self.max_staging_delay_ms = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def notify(self, pending: int):
+        """Called after staging an answer with the length of the pending list (the size trigger)."""
+        if pending >= settings.ANSWER_FLUSH_BATCH_SIZE:
+            self._wakeup.set()
+
+    def start(self, staging: Valkey, cache: Valkey):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(staging, cache))
+            global_logger.info("[ANSWER_WRITER] Started on worker=%s", self.worker_id)
+
+    async def stop(self, staging: Valkey, cache: Valkey):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Write what is still staged; whatever is left stays in Valkey for the next worker
+        try:
+            for _ in range(SHUTDOWN_FLUSH_ROUNDS):
+                if not await self.flush_once(staging, cache):
+                    break
+        except Exception as e:
+            global_logger.warning("[ANSWER_WRITER] Final flush failed, answers stay staged: %s", e)
+
+    async def _sleep(self, delay: float):
+        waiter = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait({waiter}, timeout=delay)
+        finally:
+            waiter.cancel()
+        self._wakeup.clear()
+
+    async def _run(self, staging: Valkey, cache: Valkey):
+        while True:
+            await self._sleep(settings.ANSWER_FLUSH_INTERVAL_SECONDS)
+            try:
+                # Keep going while full batches come out (a burst), otherwise wait for the next tick
+                while await self.flush_once(staging, cache) >= settings.ANSWER_FLUSH_BATCH_SIZE:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                global_logger.error("[ANSWER_WRITER] Flush failed, batch stays staged: %s", e)
+                await asyncio.sleep(FLUSH_ERROR_BACKOFF)
+
+    async def flush_once(self, staging: Valkey, cache: Valkey) -> int:
+        """Write one batch of staged answers. Returns how many were taken (0 if none, or another worker is flushing)."""
+        token = uuid.uuid4().hex
+        if not await staging.set(FLUSH_LOCK_KEY, token, nx=True, px=settings.ANSWER_FLUSH_LOCK_TTL_MS):
+            return 0
+        try:
+            raw_batch = await get_script(staging, CLAIM_BATCH_SCRIPT)(
+                keys=[PENDING_ANSWERS_KEY, FLUSHING_ANSWERS_KEY],
+                args=[settings.ANSWER_FLUSH_BATCH_SIZE],
+            )
+            if not raw_batch:
+                return 0
+            started = time.perf_counter()
+            answers = sorted((json.loads(raw) for raw in raw_batch), key=lambda answer: answer["received_at_ms"])
+            written, dead = await self._persist(answers)
+            async with staging.pipeline(transaction=True) as pipe:
+                if dead:
+                    pipe.rpush(DEAD_ANSWERS_KEY, *[json.dumps(answer) for answer in dead])
+                pipe.delete(FLUSHING_ANSWERS_KEY)
+                await pipe.execute()
+            self._record_flush(answers, written, dead, (time.perf_counter() - started) * 1000)
+            if written:
+                try:
+                    await cache_recent_answers(cache, written)
+                except Exception as e:
+                    global_logger.warning("[ANSWER_WRITER] Failed to cache %d recent answers: %s", len(written), e)
+            return len(raw_batch)
+        finally:
+            await get_script(staging, RELEASE_LOCK_SCRIPT)(keys=[FLUSH_LOCK_KEY], args=[token])
+
+    async def _persist(self, answers: list[dict]) -> tuple[list[dict], list[dict]]:
+        """Insert the batch in one statement; answers whose codes don't resolve are set aside."""
+        written, dead, rows = [], [], []
+        async with AsyncSessionLocal() as session:
+            for answer in answers:
+                try:
+                    player_id, match_id = await _get_ids_by_codes(session, [
+                        (Player, 'player_code', answer["player_code"], 'Player'),
+                        (Match, 'match_code', answer["match_code"], 'Match'),
+                    ])
+                    question_id = await _get_question_id_by_code(session, match_id, answer["question_code"])
+                except HTTPException as e:
+                    if e.status_code != 404:
+                        raise
+                    dead.append({**answer, "error": e.detail})
+                    continue
+                received_at = datetime.fromtimestamp(answer["received_at_ms"] / 1000, timezone.utc)
+                timestamp = answer.get("timestamp")
+                if timestamp is not None:
+                    # Rounded first: 99.9996 becomes 100.000, which overflows Numeric(5, 3) as well
+                    timestamp = round(timestamp, 3)
+                    if not 0 <= timestamp < ANSWER_TIMESTAMP_LIMIT:
+                        timestamp = None  # would fail the whole batch on every replay
+                rows.append({
+                    'id': uuid.UUID(answer["id"]),
+                    'created_at': received_at,
+                    'updated_at': received_at,
+                    'content': answer["content"],
+                    'timestamp': timestamp,
+                    'is_buzzed': bool(answer.get("is_buzzed")),
+                    'player_id': player_id,
+                    'match_id': match_id,
+                    'question_id': question_id,
+                })
+                written.append({**answer, "timestamp": rows[-1]['timestamp']})
+            if rows:
+                await session.execute(insert(Answer).values(rows).on_conflict_do_nothing(index_elements=[Answer.id]))
+                await session.commit()
+        return written, dead
+
+    def _record_flush(self, answers: list[dict], written: list[dict], dead: list[dict], flush_ms: float):
+        self.flushes += 1
+        self.flushed_answers += len(written)
+        self.dead_lettered += len(dead)
+        self.last_batch_size = len(answers)
+        self.max_batch_size = max(self.max_batch_size, len(answers))
+        self.last_flush_ms = round(flush_ms, 3)
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        self.total_flush_ms += flush_ms
+        # How long the oldest answer of the batch waited between the socket and the table
+        self.last_staging_delay_ms = int(time.time() * 1000) - answers[0]["received_at_ms"]
+        self.max_staging_delay_ms = max(self.max_staging_delay_ms, self.last_staging_delay_ms)
+        if dead:
+            global_logger.warning("[ANSWER_WRITER] %d answer(s) moved to %s: unknown player / match / question", len(dead), DEAD_ANSWERS_KEY)
+        global_logger.debug("[ANSWER_WRITER] Flushed %d answers in %.1f ms", len(written), flush_ms)
+
+    def get_stats(self) -> dict:
+        return {
+            'worker_id': self.worker_id,
+            'flushes': self.flushes,
+            'flushed_answers': self.flushed_answers,
+            'dead_lettered': self.dead_lettered,
+            'failures': self.failures,
+            'last_batch_size': self.last_batch_size,
+            'max_batch_size': self.max_batch_size,
+            'last_flush_ms': self.last_flush_ms,
+            'max_flush_ms': round(self.max_flush_ms, 3),
+            'mean_flush_ms': round(self.total_flush_ms / self.flushes, 3) if self.flushes else None,
+            'last_staging_delay_ms': self.last_staging_delay_ms,
+            'max_staging_delay_ms': self.max_staging_delay_ms,
+        }
+
+
+answer_writer = AnswerWriteBehind()
@@ -0,0 +1,183 @@
+import os
+import asyncio
+import concurrent.futures
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Sequence
+
+from openpyxl import Workbook
+from sqlalchemy.sql import Select
+
+from app.config import settings
+from app.dependencies.db import AsyncSessionLocal
+from app.logger import global_logger
+
+
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXPORT_FETCH_SIZE = 1000           # rows per server-side cursor fetch
+EXPORT_ROW_QUEUE_SIZE = 4          # fetched batches buffered between the cursor and the writer thread
+EXPORT_CHUNK_QUEUE_SIZE = 16       # zip chunks buffered between the writer thread and the client
+EXPORT_CHUNK_SIZE = 64 * 1024
+_WAIT_POLL_SECONDS = 0.5
+
+_END_OF_SHEET = object()
+_END_OF_FILE = object()
+
+# Exports get their own threads so a big one can't starve the default executor
+_export_executor = ThreadPoolExecutor(max_workers=settings.EXPORT_WORKERS, thread_name_prefix="xlsx-export")
+
+
+
+@dataclass
+class ExcelSheet:
+    """
+    One worksheet of a streamed export.
+    `batches` yields lists of source rows; `to_row` turns one source row into the cell values
+    and runs in the writer thread (it may keep state, e.g. running totals).
+    """
+    name: str
+    header: list[str]
+    batches: Callable[[], AsyncIterator[Sequence[Any]]]
+    to_row: Callable[[Any], Sequence[Any]] = field(default=tuple)
+
+
+
+class ExportAborted(Exception):
+    pass
+
+
+
+async def stream_query_batches(statement: Select) -> AsyncIterator[Sequence[Any]]:
+    """Yield the rows of `statement` in batches from a server-side cursor, on a dedicated session."""
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(statement.execution_options(yield_per=EXPORT_FETCH_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+
+
+class _ChunkWriter:
+    """Write-only file object handed to openpyxl; forwards the zip bytes in EXPORT_CHUNK_SIZE chunks."""
+    def __init__(self, emit: Callable[[bytes], None]):
+        self._emit = emit
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        if len(self._buffer) >= EXPORT_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+
+
+
+def _discard_worksheets(workbook: Workbook):
+    """Close the sheets of an unfinished write-only workbook and delete their temp files."""
+    for worksheet in workbook.worksheets:
+        try:
+            if not worksheet.closed:
+                worksheet.close()
+            if worksheet._writer is not None and os.path.exists(worksheet._writer.out):
+                worksheet._writer.cleanup()
+        except Exception:
+            pass
+
+
+
+class _XlsxStream:
+    def __init__(self, sheets: list[ExcelSheet]):
+        self.sheets = sheets
+        self.loop = asyncio.get_running_loop()
+        self.batches: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_ROW_QUEUE_SIZE)
+        self.chunks: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_CHUNK_QUEUE_SIZE)
+        self.aborted = threading.Event()
+
+    # -- writer thread side --
+
+    def _wait(self, coro):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        while True:
+            try:
+                return future.result(timeout=_WAIT_POLL_SECONDS)
+            except concurrent.futures.TimeoutError:
+                if self.aborted.is_set():
+                    future.cancel()
+                    raise ExportAborted()
+
+    def _emit(self, chunk: bytes):
+        # After an abort the half-written zip is discarded (its finalizer may still write)
+        if not self.aborted.is_set():
+            self._wait(self.chunks.put(chunk))
+
+    def _write_workbook(self):
+        # write_only keeps each sheet's rows in a temp file, so memory stays flat
+        workbook = Workbook(write_only=True)
+        try:
+            for sheet in self.sheets:
+                worksheet = workbook.create_sheet(sheet.name)
+                worksheet.append(sheet.header)
+                while (batch := self._wait(self.batches.get())) is not _END_OF_SHEET:
+                    for row in batch:
+                        worksheet.append(sheet.to_row(row))
+            writer = _ChunkWriter(self._emit)
+            workbook.save(writer)
+            writer.flush()
+        except BaseException:
+            _discard_worksheets(workbook)
+            raise
+        finally:
+            if not self.aborted.is_set():
+                self._wait(self.chunks.put(_END_OF_FILE))
+
+    # -- event loop side --
+
+    async def _feed(self):
+        for sheet in self.sheets:
+            async for batch in sheet.batches():
+                await self.batches.put(batch)
+            await self.batches.put(_END_OF_SHEET)
+
+    async def iterate(self, export_name: str) -> AsyncIterator[bytes]:
+        feeder = asyncio.create_task(self._feed())
+        writer = self.loop.run_in_executor(_export_executor, self._write_workbook)
+        try:
+            while True:
+                getter = asyncio.ensure_future(self.chunks.get())
+                watched = {getter} | {task for task in (feeder, writer) if not task.done()}
+                await asyncio.wait(watched, return_when=asyncio.FIRST_COMPLETED)
+                # The feeder or the writer failing early would otherwise leave us waiting forever
+                for task in (feeder, writer):
+                    if task.done() and not task.cancelled() and task.exception() is not None:
+                        getter.cancel()
+                        raise task.exception()
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                chunk = getter.result()
+                if chunk is _END_OF_FILE:
+                    break
+                yield chunk
+            await writer
+            global_logger.info("Streaming export %s finished.", export_name)
+        except Exception:
+            global_logger.exception("Streaming export %s failed.", export_name)
+            raise
+        finally:
+            self.aborted.set()
+            feeder.cancel()
+            await asyncio.gather(feeder, writer, return_exceptions=True)
+
+
+
+def stream_xlsx(sheets: list[ExcelSheet], export_name: str) -> AsyncIterator[bytes]:
+    """
+    Build an XLSX workbook in a worker thread and yield its bytes as they are produced.
+    Rows are pulled from the sheets' async sources with backpressure, so neither the rows
+    nor the finished file are ever held in memory at once.
+    """
+    return _XlsxStream(sheets).iterate(export_name)
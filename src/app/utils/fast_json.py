@@ -0,0 +1,37 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        # Shallow: the fields as they are; orjson walks the nested dicts / lists itself
+        return dict(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+
+def render_json(content: Any) -> bytes:
+    """
+    orjson encoding of server-built data: response models, dicts and lists of rows. datetime,
+    UUID and Decimal values are encoded directly (datetimes as ISO 8601, like isoformat()).
+    """
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+
+class FastJSONResponse(Response):
+    """
+    For the large list responses: the content is encoded as is, with no response_model
+    validation or pydantic serialization in between. Build the model with model_construct()
+    since the data comes from our own queries.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
@@ -1,3 +1,8 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import NoResultFound
@@ -6,18 +11,162 @@ from uuid import UUID
 
 from fastapi import HTTPException
 
+from app.config import settings
+from app.model.question import Question
+
+
+
+class CodeIdCache:
+    """
+    Bounded in-process LRU of code -> UUID lookups with a TTL.
+    Concurrent misses on the same key share a single DB query (single-flight).
+    """
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple, tuple[UUID, float]] = OrderedDict()
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> UUID | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: tuple, value: UUID):
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: tuple, loader: Callable[[], Awaitable[UUID]]) -> UUID:
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The request that owned the query went away; load it ourselves
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an error nobody else awaited is not reported as "never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, *key: Hashable):
+        self._entries.pop(tuple(key), None)
+
+    def invalidate_table(self, table_name: str):
+        for key in [k for k in self._entries if k[0] == table_name]:
+            del self._entries[key]
+
+    def get_stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+id_cache = CodeIdCache(settings.CODE_ID_CACHE_MAX_SIZE, settings.CODE_ID_CACHE_TTL_SECONDS)
+
 
 
 async def _get_id_by_code(session: AsyncSession, model, code_field: str, code: str, entity_name: str) -> UUID:
-    query = select(model.id).where(getattr(model, code_field) == code)
-    try:
+    async def load() -> UUID:
+        query = select(model.id).where(getattr(model, code_field) == code)
+        try:
+            execution = await session.execute(query)
+            entity_id = execution.scalar_one()
+            return entity_id
+        except NoResultFound:
+            raise HTTPException(
+                status_code=404,
+                detail=f'{entity_name} with {code_field}={code} not found!'
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database query failed for {entity_name} validation.")
+
+    return await id_cache.get_or_load((model.__tablename__, code_field, code), load)
+
+
+
+async def _get_ids_by_codes(session: AsyncSession, lookups: list[tuple[Any, str, str, str]]) -> list[UUID]:
+    """
+    Resolve several (model, code_field, code, entity_name) lookups at once.
+    Cache misses are fetched together in a single SELECT of scalar subqueries.
+    """
+    keys = [(model.__tablename__, code_field, code) for model, code_field, code, _ in lookups]
+    resolved = [id_cache.get(key) for key in keys]
+    missing = [i for i, value in enumerate(resolved) if value is None]
+    id_cache.hits += len(lookups) - len(missing)
+    if missing:
+        id_cache.misses += len(missing)
+        query = select(*[
+            select(lookups[i][0].id).where(getattr(lookups[i][0], lookups[i][1]) == lookups[i][2]).scalar_subquery()
+            for i in missing
+        ])
+        try:
+            execution = await session.execute(query)
+            row = execution.one()
+        except Exception:
+            raise HTTPException(status_code=500, detail="Database query failed for code validation.")
+        for i, entity_id in zip(missing, row):
+            _, code_field, code, entity_name = lookups[i]
+            if entity_id is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f'{entity_name} with {code_field}={code} not found!'
+                )
+            id_cache.set(keys[i], entity_id)
+            resolved[i] = entity_id
+    return resolved
+
+
+
+async def _get_question_id_by_code(session: AsyncSession, match_id: UUID, question_code: str) -> UUID:
+    """Question codes are only unique inside a match, so the lookup (and the cache key) is scoped by match_id."""
+    async def load() -> UUID:
+        query = select(Question.id).where(Question.match_id == match_id, Question.question_code == question_code)
         execution = await session.execute(query)
-        entity_id = execution.scalar_one()
-        return entity_id
-    except NoResultFound:
-        raise HTTPException(
-            status_code=404,
-            detail=f'{entity_name} with {code_field}={code} not found!'
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database query failed for {entity_name} validation.")
\ No newline at end of file
+        question_id = execution.scalars().first()
+        if question_id is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f'Question with question_code={question_code} not found!'
+            )
+        return question_id
+
+    return await id_cache.get_or_load((Question.__tablename__, match_id, question_code), load)
@@ -0,0 +1,140 @@
+import hashlib
+from collections.abc import Awaitable, Callable
+
+from fastapi import Response
+from pydantic import BaseModel
+from valkey.asyncio import Valkey
+
+from app.config import settings
+from app.dependencies.db import get_script
+from app.logger import global_logger
+from app.utils.fast_json import render_json
+
+
+# One hash per cached listing: version (bumped by every write), cached_version, etag, body.
+# KEYS: listing hash / ARGV: the ETags the client already has
+# Returns {version} on a miss, {version, etag} when the client's copy is current, else {version, etag, body}.
+READ_LISTING_SCRIPT = """
+local version = redis.call('HGET', KEYS[1], 'version') or '0'
+local cached = redis.call('HMGET', KEYS[1], 'cached_version', 'etag')
+if cached[1] ~= version then
+    return {version}
+end
+for i = 1, #ARGV do
+    if ARGV[i] == cached[2] then
+        return {version, cached[2]}
+    end
+end
+return {version, cached[2], redis.call('HGET', KEYS[1], 'body')}
+"""
+
+# KEYS: listing hash / ARGV: version the body was built at, etag, body, ttl
+# A write that bumped the version while the body was being built wins: the stale body is dropped.
+STORE_LISTING_SCRIPT = """
+if (redis.call('HGET', KEYS[1], 'version') or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'cached_version', ARGV[1], 'etag', ARGV[2], 'body', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+
+def listing_key(name: str) -> str:
+    return f"listing:{name}"
+
+
+
+def parse_if_none_match(header: str | None) -> list[str]:
+    """ETags of an If-None-Match header; W/ is dropped since If-None-Match compares weakly."""
+    if not header:
+        return []
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+
+class ListingCache:
+    """
+    Versioned read-through cache of whole JSON listings in Valkey, shared by all workers.
+    Writes bump the listing's version instead of deleting it; the next read rebuilds the body
+    once and stores it with a strong ETag, so polls cost one script call and, when the client
+    sends If-None-Match, a 304 without a body.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    async def respond(
+        self,
+        cache: Valkey,
+        name: str,
+        if_none_match: str | None,
+        loader: Callable[[], Awaitable[BaseModel | Response]]
+    ) -> Response:
+        client_etags = parse_if_none_match(if_none_match)
+        try:
+            cached = await get_script(cache, READ_LISTING_SCRIPT)(keys=[listing_key(name)], args=client_etags)
+        except Exception as e:
+            # Valkey trouble must not take the listing down; serve it from the DB uncached
+            global_logger.warning("[LISTING] Cache read failed for %s, loading from DB: %s", name, e)
+            self.bypassed += 1
+            return self._response(self._render(await loader()), None)
+
+        if len(cached) == 2 or (len(cached) == 3 and "*" in client_etags):
+            self.not_modified += 1
+            return Response(status_code=304, headers=self._headers(cached[1]))
+        if len(cached) == 3:
+            self.hits += 1
+            return self._response(cached[2], cached[1])
+
+        self.misses += 1
+        body = self._render(await loader())
+        etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+        try:
+            await get_script(cache, STORE_LISTING_SCRIPT)(
+                keys=[listing_key(name)],
+                args=[cached[0], etag, body, settings.LISTING_CACHE_TTL_SECONDS],
+            )
+        except Exception as e:
+            global_logger.warning("[LISTING] Failed to cache %s: %s", name, e)
+        if etag in client_etags:
+            return Response(status_code=304, headers=self._headers(etag))
+        return self._response(body, etag)
+
+    async def bump(self, cache: Valkey, *names: str):
+        """Invalidate listings after a write; failures only delay freshness by the TTL."""
+        try:
+            async with cache.pipeline(transaction=True) as pipe:
+                for name in names:
+                    pipe.hincrby(listing_key(name), "version", 1)
+                    pipe.expire(listing_key(name), settings.LISTING_CACHE_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            global_logger.warning("[LISTING] Failed to invalidate %s: %s", ", ".join(names), e)
+
+    def _render(self, loaded: BaseModel | Response) -> str:
+        return (loaded.body if isinstance(loaded, Response) else render_json(loaded)).decode()
+
+    def _headers(self, etag: str | None) -> dict[str, str]:
+        # no-cache: clients may keep the body but must revalidate with If-None-Match every time
+        headers = {"Cache-Control": "no-cache"}
+        if etag is not None:
+            headers["ETag"] = etag
+        return headers
+
+    def _response(self, body: str, etag: str | None) -> Response:
+        return Response(content=body, media_type="application/json", headers=self._headers(etag))
+
+    def get_stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'not_modified': self.not_modified,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+        }
+
+
+listing_cache = ListingCache()
@@ -4,6 +4,110 @@ import asyncio
 import json
 
 from app.logger import global_logger
+from app.dependencies.db import get_script
+from app.utils.match_timer import TIMER_DEADLINES_KEY, cancel_question_timer, timer_scheduler
+from app.utils.match_stream import PUBLISH_EVENT_LUA, publish_match_event, match_events_key, updates_channel
+from app.utils.match_state import update_match_state, match_state_key
+from app.utils.answer_writer import answer_writer, stage_answer_payload, PENDING_ANSWERS_KEY
+
+
+BUZZ_KEYS_TTL_SECONDS = 6 * 60 * 60
+
+# KEYS: state hash, timer hash, timer deadlines, buzz order, buzz times, events stream, updates channel
+# ARGV: encoded event, match_code, question_code, deadline_ms, then state field / value pairs
+# The state, the armed deadline and start_the_timer commit together, so a snapshot never shows the
+# question running without its timer. Buzzes are kept per question: asking it again starts from an
+# empty buzz order. A match has at most one running timer; starting a question replaces it.
+START_QUESTION_SCRIPT = PUBLISH_EVENT_LUA + """
+redis.call('DEL', KEYS[4], KEYS[5])
+redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+redis.call('HSET', KEYS[2], 'question_code', ARGV[3], 'deadline_ms', ARGV[4])
+redis.call('ZADD', KEYS[3], ARGV[4], ARGV[2])
+return publish_event(KEYS[6], KEYS[7], ARGV[1])
+"""
+
+# KEYS: state hash, timer hash, updates channel, events stream
+# ARGV: player_code, question_code ('' = the question being played), received_ms, ttl, buzz key prefix
+# The first caller to get through is position 1; Valkey runs scripts one at a time so the order is total.
+# The buzz keys are named like buzz_order_key / buzz_times_key, once the question is known.
+BUZZ_SCRIPT = PUBLISH_EVENT_LUA + """
+if redis.call('HGET', KEYS[1], 'locked') == '1' then
+    return {0, 'time_up'}
+end
+local deadline = redis.call('HGET', KEYS[2], 'deadline_ms')
+if deadline and tonumber(ARGV[3]) > tonumber(deadline) then
+    return {0, 'time_up'}
+end
+local question_code = ARGV[2]
+if question_code == '' then
+    question_code = redis.call('HGET', KEYS[1], 'current_question_code') or ''
+end
+if question_code == '' then
+    return {0, 'no_question'}
+end
+local order_key = ARGV[5] .. ':buzz_order:' .. question_code
+local times_key = ARGV[5] .. ':buzz_times:' .. question_code
+if redis.call('HSETNX', times_key, ARGV[1], ARGV[3]) == 0 then
+    return {0, 'already_buzzed'}
+end
+local position = redis.call('RPUSH', order_key, ARGV[1])
+redis.call('EXPIRE', order_key, ARGV[4])
+redis.call('EXPIRE', times_key, ARGV[4])
+publish_event(KEYS[4], KEYS[3], cjson.encode({
+    type = 'player_buzzed',
+    player_code = ARGV[1],
+    question_code = question_code,
+    position = position,
+    is_first = position == 1,
+    received_at_ms = tonumber(ARGV[3])
+}))
+return {position, 'ok'}
+"""
+
+# KEYS: state hash, timer hash, updates channel, pending answers, events stream
+# ARGV: received_ms, encoded event, staged answer, player_code, buzz key prefix
+# Accepting, publishing and staging the answer for the write-behind happen together, so an accepted
+# answer is never lost; returns the pending list length (0 = rejected). is_buzzed is looked up in the
+# buzz times of the answer's question, once a missing question_code is resolved to the current one.
+ANSWER_SCRIPT = PUBLISH_EVENT_LUA + """
+if redis.call('HGET', KEYS[1], 'locked') == '1' then
+    return 0
+end
+local deadline = redis.call('HGET', KEYS[2], 'deadline_ms')
+if deadline and tonumber(ARGV[1]) > tonumber(deadline) then
+    return 0
+end
+publish_event(KEYS[5], KEYS[3], ARGV[2])
+local staged = cjson.decode(ARGV[3])
+if staged.question_code == nil or staged.question_code == cjson.null then
+    staged.question_code = redis.call('HGET', KEYS[1], 'current_question_code') or cjson.null
+end
+local start_time = redis.call('HGET', KEYS[1], 'start_time')
+if start_time then
+    staged.timestamp = tonumber(ARGV[1]) / 1000 - tonumber(start_time)
+end
+staged.is_buzzed = false
+if staged.question_code ~= cjson.null then
+    staged.is_buzzed = redis.call('HEXISTS', ARGV[5] .. ':buzz_times:' .. staged.question_code, ARGV[4]) == 1
+end
+return redis.call('RPUSH', KEYS[4], cjson.encode(staged))
+"""
+
+
+
+def _buzz_key_prefix(match_code: str) -> str:
+    """BUZZ_SCRIPT / ANSWER_SCRIPT add ":buzz_order:<question>" / ":buzz_times:<question>" to it."""
+    return f"match:{match_code}"
+
+
+
+def buzz_order_key(match_code: str, question_code: str) -> str:
+    return f"{_buzz_key_prefix(match_code)}:buzz_order:{question_code}"
+
+
+
+def buzz_times_key(match_code: str, question_code: str) -> str:
+    return f"{_buzz_key_prefix(match_code)}:buzz_times:{question_code}"
 
 
 
@@ -11,27 +115,13 @@ async def publish_ws_event(pubsub: Valkey, match_code: str, event: dict):
     """
     Sent real-time event to WebSocket clients via Valkey PubSub.
     """
-    channel = f"match:{match_code}:updates"
+    channel = updates_channel(match_code)
     try:
-        await pubsub.publish(channel, json.dumps(event))
-        global_logger.info(f"[WS] Published event to {channel}: {event}")
+        await publish_match_event(pubsub, match_code, event)
+        global_logger.info("[WS_EVENT] Published %s to %s", event.get("type"), channel)
+        global_logger.debug("[WS_EVENT] Payload on %s: %s", channel, event)
     except Exception as e:
-        global_logger.warning(f"[WS] Failed to publish event to {channel}: {e}")
-
-
-
-async def auto_time_up(pubsub: Valkey, match_code: str, question_code: str, end_time: float):
-    """Automatically fire time_up event when time_limit ends."""
-    delay = max(0, end_time - time.time())
-    await asyncio.sleep(delay)
-    await pubsub.set(f"match:{match_code}:locked", 1)
-    event = {
-        "type": "time_up",
-        "match_code": match_code,
-        "question_code": question_code,
-    }
-    await pubsub.publish(f"match:{match_code}:updates", json.dumps(event))
-    global_logger.info(f"[TIME_UP] match={match_code} question={question_code}")
+        global_logger.warning("[WS] Failed to publish event to %s: %s", channel, e)
 
 
 
@@ -47,13 +137,9 @@ async def trigger_start_time(
     """
     start_time = time.time()
     end_time = start_time + time_limit
+    deadline_ms = int(end_time * 1000)
 
     try:
-        await pubsub.set(f"match:{match_code}:start_time", start_time)
-        await pubsub.set(f"match:{match_code}:end_time", end_time)
-        await pubsub.set(f"match:{match_code}:current_question_code", question_code)
-        await pubsub.set(f"match:{match_code}:locked", 0)
-        global_logger.info(f"[START] {match_code} {question_code} start={start_time} end={end_time}")
         event = {
             "type": "start_the_timer",
             "match_code": match_code,
@@ -61,33 +147,74 @@ async def trigger_start_time(
             "start_time": start_time,
             "time_limit": time_limit,
         }
-        await pubsub.publish(f"match:{match_code}:updates", json.dumps(event))
-        global_logger.info(f"[WS] Broadcast 'start_the_timer' event for question {question_code} in {match_code}")
-        asyncio.create_task(auto_time_up(pubsub, match_code, question_code, end_time))
+        # Deadline lives in Valkey so the time_up fires exactly once even across workers / restarts
+        await get_script(pubsub, START_QUESTION_SCRIPT)(
+            keys=[
+                match_state_key(match_code),
+                f"timers:{match_code}",
+                TIMER_DEADLINES_KEY,
+                buzz_order_key(match_code, question_code),
+                buzz_times_key(match_code, question_code),
+                match_events_key(match_code),
+                updates_channel(match_code),
+            ],
+            args=[
+                json.dumps(event), match_code, question_code, deadline_ms,
+                "start_time", start_time,
+                "end_time", end_time,
+                "current_question_code", question_code,
+                "locked", 0,
+            ],
+        )
+        timer_scheduler.wakeup()
+        global_logger.info("[START] %s %s start=%s end=%s", match_code, question_code, start_time, end_time)
+        global_logger.info("[TIMER] Armed match=%s question=%s deadline_ms=%s", match_code, question_code, deadline_ms)
+        global_logger.info("[WS] Broadcast 'start_the_timer' event for question %s in %s", question_code, match_code)
         return {
             "message": "'start_the_timer' triggered", 
             "start_time": start_time, 
             "end_time": end_time
         }
     except Exception as e:
-        global_logger.error(f"[FAILED] Event 'start_the_timer' failed for match={match_code}: {e}")
+        global_logger.error("[FAILED] Event 'start_the_timer' failed for match=%s: %s", match_code, e)
+        raise
+
+
+
+async def stop_question_timer(pubsub: Valkey, match_code: str) -> dict:
+    try:
+        cancelled = await cancel_question_timer(pubsub, match_code)
+        event = {
+            "type": "timer_cancelled",
+            "match_code": match_code,
+        }
+        if cancelled:
+            await publish_match_event(pubsub, match_code, event)
+            global_logger.info("[WS] Broadcast 'timer_cancelled' event in %s", match_code)
+        return {
+            "message": "'timer_cancelled' triggered" if cancelled else "No running timer to cancel",
+            "cancelled": cancelled
+        }
+    except Exception as e:
+        global_logger.error("[FAILED] Event 'timer_cancelled' failed for match=%s: %s", match_code, e)
         raise
 
 
 
 async def pick_question(pubsub: Valkey, match_code: str, player_code: str, question_code: str) -> dict:
     try:
-        await pubsub.set(f"match:{match_code}:picked_question_code", question_code)
-        await pubsub.set(f"match:{match_code}:picked_player_code", player_code)
-        global_logger.info(f"[PICKED] {match_code} {question_code} being picked by {player_code}")
         event = {
             "type": "pick_question",
             "match_code": match_code,
             "player_code": player_code,
             "question_code": question_code
         }
-        await pubsub.publish(f"match:{match_code}:updates", json.dumps(event))
-        global_logger.info(f"[WS] Broadcast 'pick_question' event for question {question_code}, picked by player {player_code} in {match_code}")
+        await update_match_state(pubsub, match_code, {
+            "picked_question_code": question_code,
+            "picked_player_code": player_code,
+        }, event)
+        global_logger.info("[PICKED] %s %s being picked by %s", match_code, question_code, player_code)
+        global_logger.info("[WS] Broadcast 'pick_question' event for question %s, picked by player %s in %s", question_code, player_code, match_code)
         return {
             'message': "'pick_question' triggered",
             "match_code": match_code,
@@ -95,33 +222,92 @@ async def pick_question(pubsub: Valkey, match_code: str, player_code: str, quest
             "question_code": question_code
         }
     except Exception as e:
-        global_logger.error(f"[FAILED] Event 'pick_question' failed for match={match_code}: {e}")
+        global_logger.error("[FAILED] Event 'pick_question' failed for match=%s: %s", match_code, e)
         raise
 
 
 
+async def arbitrate_buzz(
+    valkey: Valkey,
+    match_code: str,
+    player_code: str,
+    question_code: str | None,
+    received_ms: int
+) -> dict:
+    """
+    Single round trip buzz: checks lock + deadline, records the buzz order and publishes player_buzzed.
+    Without a question_code the buzz goes to the question being played (rejected if there is none).
+    Returns {'accepted': bool, 'reason'|'position': ...}.
+    """
+    result = await get_script(valkey, BUZZ_SCRIPT)(
+        keys=[
+            match_state_key(match_code),
+            f"timers:{match_code}",
+            updates_channel(match_code),
+            match_events_key(match_code),
+        ],
+        args=[player_code, question_code or "", received_ms, BUZZ_KEYS_TTL_SECONDS, _buzz_key_prefix(match_code)],
+    )
+    if int(result[0]) == 0:
+        return {"accepted": False, "reason": result[1]}
+    return {"accepted": True, "position": int(result[0])}
+
+
+
+async def submit_answer(valkey: Valkey, match_code: str, event: dict, received_ms: int) -> bool:
+    """
+    Publish player_answered only if the question is still open, checked atomically in Valkey,
+    and stage the answer for the write-behind that persists it.
+    """
+    player_code, question_code = event["player_code"], event.get("question_code")
+    pending = await get_script(valkey, ANSWER_SCRIPT)(
+        keys=[
+            match_state_key(match_code),
+            f"timers:{match_code}",
+            f"match:{match_code}:updates",
+            PENDING_ANSWERS_KEY,
+            match_events_key(match_code),
+        ],
+        args=[
+            received_ms,
+            json.dumps(event),
+            stage_answer_payload(match_code, player_code, question_code, event.get("answer"), received_ms),
+            player_code,
+            _buzz_key_prefix(match_code),
+        ],
+    )
+    if not pending:
+        return False
+    answer_writer.notify(int(pending))
+    return True
+
+
+
 async def process_client_event(
     valkey: Valkey,
     match_code: str,
-    client_msg: dict
-):
+    client_msg: dict,
+    received_ms: int | None = None
+) -> dict | None:
     """
     Process all events and publish to Valkey.
-    Assuming the locked check is already done.
+    buzz / answer are checked against the lock and the deadline atomically;
+    returns the rejection message for the client when they arrive too late.
     """
     event_type = client_msg.get("type")
     player_code = client_msg.get("player_code")
     question_code = client_msg.get("question_code")
+    received_ms = received_ms or int(time.time() * 1000)
     if not player_code:
-        global_logger.warning(f"[WS_PROCESS] Client message missing player_code: {client_msg}")
-        return
+        global_logger.warning("[WS_PROCESS] Client message missing player_code: %s", client_msg)
+        return None
     event = None
     if event_type == "buzz":
-        event = {
-            "type": "player_buzzed",
-            "player_code": player_code,
-            "question_code": question_code
-        }
+        result = await arbitrate_buzz(valkey, match_code, player_code, question_code, received_ms)
+        if not result["accepted"]:
+            return {"type": "answer_rejected", "reason": result["reason"]}
+        global_logger.debug("[WS_PUBLISH] Buzz #%s by %s in %s", result['position'], player_code, match_code)
+        return None
     elif event_type == "pick_question":
         event = {
             "type": "player_picked_question",
@@ -135,14 +321,20 @@ async def process_client_event(
             "player_code": player_code,
             "question_code": question_code,
             "answer": answer,
+            "received_at_ms": received_ms,
         }
+        if not await submit_answer(valkey, match_code, event, received_ms):
+            return {"type": "answer_rejected", "reason": "time_up"}
+        global_logger.debug("[WS_PUBLISH] Published %s for %s in %s", event_type, player_code, match_code)
+        return None
     elif event_type == "buzz_cnv":
         event = {
             "type": "player_buzzed_cnv",
             "player_code": player_code,
         }
     if event:
-        await valkey.publish(f"match:{match_code}:updates", json.dumps(event))
-        global_logger.debug(f"[WS_PUBLISH] Published {event_type} for {player_code} in {match_code}")
+        await publish_match_event(valkey, match_code, event)
+        global_logger.debug("[WS_PUBLISH] Published %s for %s in %s", event_type, player_code, match_code)
     else:
-        global_logger.debug(f"[WS_PROCESS] Unhandled event type: {event_type}")
\ No newline at end of file
+        global_logger.debug("[WS_PROCESS] Unhandled event type: %s", event_type)
+    return None
@@ -0,0 +1,88 @@
+import time
+import json
+import asyncio
+
+from valkey.asyncio import Valkey
+
+from app.config import settings
+from app.dependencies.db import get_script
+from app.logger import global_logger
+from app.utils.match_stream import PUBLISH_EVENT_LUA, match_events_key, updates_channel
+from app.utils.scoreboard_cache import get_ranked_scoreboard
+
+
+# Fields of the match:{code}:state hash
+STATE_FIELDS = ("current_question_code", "start_time", "end_time", "locked", "picked_question_code", "picked_player_code")
+
+# KEYS: state hash, events stream, updates channel
+# ARGV: encoded event, then field / value pairs
+# The state change and the event describing it land together, so a snapshot and its event_id always agree.
+UPDATE_STATE_SCRIPT = PUBLISH_EVENT_LUA + """
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+return publish_event(KEYS[2], KEYS[3], ARGV[1])
+"""
+
+
+
+def match_state_key(match_code: str) -> str:
+    return f"match:{match_code}:state"
+
+
+
+async def update_match_state(valkey: Valkey, match_code: str, fields: dict, event: dict) -> str:
+    """Write the state fields and publish the event in one atomic step; returns the event's stream ID."""
+    args = [json.dumps(event)]
+    for field, value in fields.items():
+        args += [field, value]
+    return await get_script(valkey, UPDATE_STATE_SCRIPT)(
+        keys=[match_state_key(match_code), match_events_key(match_code), updates_channel(match_code)],
+        args=args,
+    )
+
+
+
+def _decode_state(raw: dict[str, str]) -> dict:
+    state = {field: raw.get(field) for field in STATE_FIELDS}
+    for field in ("start_time", "end_time"):
+        if state[field] is not None:
+            state[field] = float(state[field])
+    state["locked"] = state["locked"] == "1"
+    return state
+
+
+
+async def read_match_snapshot(valkey: Valkey, cache: Valkey, match_code: str) -> dict:
+    """
+    Everything a client needs to render a live match: state, running timer with its remaining
+    time, and the ranked scoreboard. The match keys are read in one MULTI round trip, in parallel
+    with the scoreboard script on the cache. event_id is the last event the snapshot reflects.
+    """
+    async def read_live_keys():
+        async with valkey.pipeline(transaction=True) as pipe:
+            pipe.xrevrange(match_events_key(match_code), count=1)
+            pipe.hgetall(match_state_key(match_code))
+            pipe.hgetall(f"timers:{match_code}")
+            return await pipe.execute()
+
+    async def read_scoreboard():
+        try:
+            return await get_ranked_scoreboard(cache, match_code, settings.SCOREBOARD_TOP_K)
+        except Exception as e:
+            global_logger.warning("[STATE] Snapshot of match=%s without scoreboard: %s", match_code, e)
+            return None
+
+    (latest, state, timer), scoreboard = await asyncio.gather(read_live_keys(), read_scoreboard())
+    now_ms = int(time.time() * 1000)
+    return {
+        "type": "snapshot",
+        "event_id": latest[0][0] if latest else None,
+        "match_code": match_code,
+        **_decode_state(state),
+        "timer": {
+            "question_code": timer["question_code"],
+            "deadline_ms": int(timer["deadline_ms"]),
+            "remaining_ms": max(0, int(timer["deadline_ms"]) - now_ms),
+        } if timer else None,
+        "scoreboard": scoreboard,
+        "server_time_ms": now_ms,
+    }
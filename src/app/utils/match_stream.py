@@ -0,0 +1,96 @@
+import json
+
+from valkey.asyncio import Valkey
+
+from app.config import settings
+from app.dependencies.db import get_script
+
+
+EVENT_ID_PREFIX = '{"event_id":"'
+
+# Defines publish_event() for the scripts that publish from inside Valkey: the event is appended
+# to the match's capped stream, and the stream ID is put in front of the published JSON so
+# clients can tell where they are. Payloads must be non-empty JSON objects.
+PUBLISH_EVENT_LUA = f"""
+local function publish_event(stream, channel, payload)
+    local id = redis.call('XADD', stream, 'MAXLEN', '~', {settings.MATCH_EVENT_STREAM_MAXLEN}, '*', 'event', payload)
+    redis.call('EXPIRE', stream, {settings.MATCH_EVENT_STREAM_TTL_SECONDS})
+    redis.call('PUBLISH', channel, '{EVENT_ID_PREFIX}' .. id .. '",' .. string.sub(payload, 2))
+    return id
+end
+"""
+
+# KEYS: events stream, updates channel / ARGV: encoded event
+PUBLISH_EVENT_SCRIPT = PUBLISH_EVENT_LUA + """
+return publish_event(KEYS[1], KEYS[2], ARGV[1])
+"""
+
+
+
+def match_events_key(match_code: str) -> str:
+    return f"match:{match_code}:events"
+
+
+
+def updates_channel(match_code: str) -> str:
+    return f"match:{match_code}:updates"
+
+
+
+def with_event_id(event_id: str, payload: str) -> str:
+    """The frame clients receive: the stored event with its stream ID first (same splice as the Lua side)."""
+    return f'{EVENT_ID_PREFIX}{event_id}",{payload[1:]}'
+
+
+
+def event_id_of(message: str) -> str | None:
+    """Read the stream ID off a published frame without decoding the JSON."""
+    if not message.startswith(EVENT_ID_PREFIX):
+        return None
+    end = message.find('"', len(EVENT_ID_PREFIX))
+    return message[len(EVENT_ID_PREFIX):end] if end != -1 else None
+
+
+
+def parse_event_id(event_id: str | None) -> tuple[int, int] | None:
+    """Stream IDs are "<ms>-<seq>"; compared as integer pairs. None when malformed."""
+    try:
+        ms, seq = event_id.split("-")
+        return int(ms), int(seq)
+    except (AttributeError, ValueError):
+        return None
+
+
+
+async def publish_match_event(valkey: Valkey, match_code: str, event: dict | str) -> str:
+    """Append the event to the match's stream and publish it; returns its stream ID."""
+    payload = event if isinstance(event, str) else json.dumps(event)
+    return await get_script(valkey, PUBLISH_EVENT_SCRIPT)(
+        keys=[match_events_key(match_code), updates_channel(match_code)],
+        args=[payload],
+    )
+
+
+
+async def get_latest_event_id(valkey: Valkey, match_code: str) -> str | None:
+    latest = await valkey.xrevrange(match_events_key(match_code), count=1)
+    return latest[0][0] if latest else None
+
+
+
+async def read_events_after(valkey: Valkey, match_code: str, last_event_id: str, limit: int) -> list[tuple[str, str]] | None:
+    """
+    The (event_id, frame) pairs published after last_event_id, oldest first, or None when they
+    can't all be replayed: malformed ID, more than `limit` events, or some already trimmed away.
+    """
+    last = parse_event_id(last_event_id)
+    if last is None:
+        return None
+    key = match_events_key(match_code)
+    async with valkey.pipeline(transaction=False) as pipe:
+        pipe.xrange(key, count=1)
+        pipe.xrange(key, min=f"({last_event_id}", count=limit + 1)
+        oldest, entries = await pipe.execute()
+    if not oldest or parse_event_id(oldest[0][0]) > last or len(entries) > limit:
+        return None
+    return [(event_id, with_event_id(event_id, fields["event"])) for event_id, fields in entries]
@@ -0,0 +1,186 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+from valkey.asyncio import Valkey
+
+from app.logger import global_logger
+from app.utils.match_stream import PUBLISH_EVENT_LUA, match_events_key
+from app.utils.match_state import match_state_key
+
+
+TIMER_DEADLINES_KEY = "timers:deadlines"          # ZSET member=match_code, score=deadline (ms since epoch)
+TIMER_LEADER_KEY = "timers:leader"
+TIMER_LEADER_TTL_MS = 3000
+TIMER_POLL_INTERVAL = 0.2
+TIMER_ERROR_BACKOFF = 1.0
+
+
+# Atomically claim an expired deadline, lock the match and publish time_up.
+# Only the caller whose ZREM succeeds fires, so the event goes out exactly once across workers.
+FIRE_TIMER_SCRIPT = PUBLISH_EVENT_LUA + """
+local deadline = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not deadline or tonumber(deadline) > tonumber(ARGV[2]) then
+    return false
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+local question_code = redis.call('HGET', KEYS[2], 'question_code') or ''
+redis.call('DEL', KEYS[2])
+redis.call('HSET', KEYS[3], 'locked', 1)
+local drift_ms = tonumber(ARGV[2]) - tonumber(deadline)
+local event = cjson.encode({
+    type = 'time_up',
+    match_code = ARGV[1],
+    question_code = question_code,
+    drift_ms = drift_ms
+})
+publish_event(KEYS[5], KEYS[4], event)
+return {question_code, tostring(drift_ms)}
+"""
+
+RENEW_LEADER_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) and 1 or 0
+"""
+
+RELEASE_LEADER_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+
+def _timer_key(match_code: str) -> str:
+    return f"timers:{match_code}"
+
+
+
+async def cancel_question_timer(pubsub: Valkey, match_code: str) -> bool:
+    async with pubsub.pipeline(transaction=True) as pipe:
+        pipe.zrem(TIMER_DEADLINES_KEY, match_code)
+        pipe.delete(_timer_key(match_code))
+        removed, _ = await pipe.execute()
+    global_logger.info("[TIMER] Cancelled match=%s (had_timer=%s)", match_code, bool(removed))
+    return bool(removed)
+
+
+
+class QuestionTimerScheduler:
+    """
+    Fires time_up for deadlines stored in Valkey. Every worker runs one, but only the
+    worker holding the leader lease polls and fires; the others wait to take over.
+    """
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.fired = 0
+        self.last_drift_ms = None
+        self.max_drift_ms = 0
+        self.total_drift_ms = 0
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._lease_renewed_at = 0.0
+
+    def start(self, pubsub: Valkey):
+        if self._task is None:
+            self._fire_script = pubsub.register_script(FIRE_TIMER_SCRIPT)
+            self._renew_script = pubsub.register_script(RENEW_LEADER_SCRIPT)
+            self._release_script = pubsub.register_script(RELEASE_LEADER_SCRIPT)
+            self._task = asyncio.create_task(self._run(pubsub))
+            global_logger.info("[TIMER] Scheduler started on worker=%s", self.worker_id)
+
+    async def stop(self, pubsub: Valkey):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            try:
+                await self._release_script(keys=[TIMER_LEADER_KEY], args=[self.worker_id])
+            except Exception as e:
+                global_logger.warning("[TIMER] Failed to release leadership: %s", e)
+            self.is_leader = False
+
+    def wakeup(self):
+        self._wakeup.set()
+
+    async def _ensure_leadership(self) -> bool:
+        now = time.monotonic()
+        if self.is_leader and (now - self._lease_renewed_at) * 1000 < TIMER_LEADER_TTL_MS / 3:
+            return True
+        was_leader = self.is_leader
+        self.is_leader = bool(await self._renew_script(keys=[TIMER_LEADER_KEY], args=[self.worker_id, TIMER_LEADER_TTL_MS]))
+        if self.is_leader:
+            self._lease_renewed_at = now
+        if self.is_leader != was_leader:
+            global_logger.info("[TIMER] worker=%s leader=%s", self.worker_id, self.is_leader)
+        return self.is_leader
+
+    async def _sleep(self, delay: float):
+        # asyncio.wait (unlike wait_for on 3.11) never swallows a cancellation that races the wakeup
+        self._wakeup.clear()
+        waiter = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait({waiter}, timeout=delay)
+        finally:
+            waiter.cancel()
+
+    async def _fire(self, match_code: str):
+        result = await self._fire_script(
+            keys=[TIMER_DEADLINES_KEY, _timer_key(match_code), match_state_key(match_code), f"match:{match_code}:updates", match_events_key(match_code)],
+            args=[match_code, _now_ms()]
+        )
+        if not result:
+            return
+        question_code, drift_ms = result[0], int(result[1])
+        self.fired += 1
+        self.last_drift_ms = drift_ms
+        self.max_drift_ms = max(self.max_drift_ms, drift_ms)
+        self.total_drift_ms += drift_ms
+        global_logger.info("[TIME_UP] match=%s question=%s drift_ms=%s", match_code, question_code, drift_ms)
+
+    async def _run(self, pubsub: Valkey):
+        while True:
+            try:
+                if not await self._ensure_leadership():
+                    await asyncio.sleep(TIMER_LEADER_TTL_MS / 3000)
+                    continue
+                earliest = await pubsub.zrange(TIMER_DEADLINES_KEY, 0, 0, withscores=True)
+                if not earliest:
+                    await self._sleep(TIMER_POLL_INTERVAL)
+                    continue
+                match_code, deadline_ms = earliest[0]
+                delay = (deadline_ms - _now_ms()) / 1000
+                if delay <= 0:
+                    await self._fire(match_code)
+                else:
+                    await self._sleep(min(delay, TIMER_POLL_INTERVAL))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                global_logger.error("[TIMER] Scheduler loop failed: %s", e)
+                self.is_leader = False
+                await asyncio.sleep(TIMER_ERROR_BACKOFF)
+
+    def get_stats(self) -> dict:
+        return {
+            'worker_id': self.worker_id,
+            'is_leader': self.is_leader,
+            'fired': self.fired,
+            'last_drift_ms': self.last_drift_ms,
+            'max_drift_ms': self.max_drift_ms,
+            'mean_drift_ms': round(self.total_drift_ms / self.fired, 3) if self.fired else None,
+        }
+
+
+timer_scheduler = QuestionTimerScheduler()
@@ -0,0 +1,77 @@
+import base64
+import binascii
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.sql import ColumnElement
+
+from app.config import settings
+
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """Opaque keyset cursor pointing just after the row (created_at, id)."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+
+def clamp_page_size(limit: int | None) -> int:
+    if limit is None or limit < 1:
+        return settings.PAGE_SIZE_DEFAULT
+    return min(limit, settings.PAGE_SIZE_MAX)
+
+
+
+def parse_fields(fields: str | None, allowed: dict[str, ColumnElement], default: tuple[str, ...]) -> list[str]:
+    """The comma-separated `fields=` projection, in the endpoint's column order; 400 on unknown names."""
+    if not fields:
+        return list(default)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - allowed.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}")
+    return [name for name in allowed if name in requested]
+
+
+
+def keyset_page_query(query: Select, created_at: ColumnElement, row_id: ColumnElement, limit: int, cursor: str | None) -> Select:
+    """
+    Restrict a select to one page in (created_at, id) order: the rows after the cursor plus one
+    more, which only tells whether there is a next page. Pair with keyset_page().
+    """
+    query = query.add_columns(created_at.label("_page_created_at"), row_id.label("_page_id"))
+    query = query.order_by(created_at, row_id).limit(limit + 1)
+    if cursor is not None:
+        query = query.where(tuple_(created_at, row_id) > tuple_(*decode_cursor(cursor)))
+    return query
+
+
+
+def keyset_page(rows: list, limit: int) -> tuple[list, str | None]:
+    """The page's rows and the cursor of the next page (None on the last one)."""
+    page = rows[:limit]
+    if len(rows) <= limit:
+        return page, None
+    return page, encode_cursor(page[-1]._page_created_at, page[-1]._page_id)
+
+
+
+def project_row(row, fields: list[str]) -> dict:
+    """
+    The selected fields of a row (selected first, in `fields` order, so a zip is enough).
+    Values stay as they come from the driver; render the page with FastJSONResponse.
+    """
+    return dict(zip(fields, row))
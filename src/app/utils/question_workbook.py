@@ -0,0 +1,120 @@
+"""
+Parsing and validation of question workbooks (OGD3_Mxx.xlsx).
+
+Kept free of app imports other than the stdlib and openpyxl: it runs in a worker process,
+which has to import this module from scratch.
+"""
+import io
+from datetime import date, datetime, time
+
+from openpyxl import load_workbook
+
+
+SHEET_NAMES = ['LAM_NONG', 'VUOT_DEO', 'BUT_PHA', 'NUOC_RUT']
+QUESTION_CODE_MAX_LENGTH = 20
+REQUIRED_COLUMNS = {
+    'question_code': 'Code',
+    'content': 'Câu hỏi',
+    'correct_answers': 'Đáp án',
+}
+EXTRA_INFO_COLUMNS = {
+    'media_sources': 'Media',
+    'explaination': 'Giải thích',
+    'citation': 'Nguồn tham khảo',
+    'note': 'Ghi chú',
+}
+
+
+
+def convert_sheet_name_to_round_code(sheet_name: str) -> str:
+    parts = sheet_name.split("_")
+    return "".join([part[0] for part in parts])
+
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+
+def _cell_value(row: tuple, index: int | None) -> str:
+    if index is None or index >= len(row):
+        return ''
+    return _cell_text(row[index])
+
+
+
+def _diagnostic(severity: str, sheet: str, row: int | None, message: str, question_code: str | None = None) -> dict:
+    return {
+        'severity': severity,
+        'sheet': sheet,
+        'row': row,
+        'question_code': question_code,
+        'message': message,
+    }
+
+
+
+def parse_question_workbook(content: bytes) -> tuple[list[dict], list[dict]]:
+    """
+    Read every question sheet in a single pass over the workbook.
+    Returns (questions, diagnostics): valid rows as plain dicts ready for the upsert, and one
+    diagnostic per skipped row (with its Excel row number) or per unusable sheet (row None).
+    """
+    questions: list[dict] = []
+    diagnostics: list[dict] = []
+    seen_codes: dict[str, tuple[str, int]] = {}
+
+    workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        for sheet_name in SHEET_NAMES:
+            if sheet_name not in workbook.sheetnames:
+                diagnostics.append(_diagnostic('warning', sheet_name, None, 'Sheet is missing from the workbook.'))
+                continue
+            rows = workbook[sheet_name].iter_rows(values_only=True)
+            header = [_cell_text(cell) for cell in next(rows, ())]
+            columns = {name: index for index, name in enumerate(header) if name}
+            missing = [column for column in REQUIRED_COLUMNS.values() if column not in columns]
+            if missing:
+                diagnostics.append(_diagnostic('error', sheet_name, None, f"Missing column(s): {', '.join(missing)}."))
+                continue
+            round_code = convert_sheet_name_to_round_code(sheet_name)
+
+            for row_number, row in enumerate(rows, start=2):
+                values = {
+                    field: _cell_value(row, columns.get(column))
+                    for field, column in {**REQUIRED_COLUMNS, **EXTRA_INFO_COLUMNS}.items()
+                }
+                if not any(values.values()):
+                    continue  # blank line
+                code = values['question_code']
+                empty = [REQUIRED_COLUMNS[field] for field in REQUIRED_COLUMNS if not values[field]]
+                if empty:
+                    diagnostics.append(_diagnostic('error', sheet_name, row_number, f"Empty required cell(s): {', '.join(empty)}.", code or None))
+                    continue
+                if len(code) > QUESTION_CODE_MAX_LENGTH:
+                    diagnostics.append(_diagnostic('error', sheet_name, row_number, f'Code is longer than {QUESTION_CODE_MAX_LENGTH} characters.', code))
+                    continue
+                if not code.upper().startswith(round_code):
+                    diagnostics.append(_diagnostic('error', sheet_name, row_number, f'Code must start with {round_code} in sheet {sheet_name}.', code))
+                    continue
+                if code in seen_codes:
+                    first_sheet, first_row = seen_codes[code]
+                    diagnostics.append(_diagnostic('error', sheet_name, row_number, f'Duplicate code, first seen in {first_sheet} row {first_row}.', code))
+                    continue
+                seen_codes[code] = (sheet_name, row_number)
+                questions.append({
+                    'question_code': code,
+                    'content': values['content'],
+                    'correct_answers': values['correct_answers'],
+                    'extra_info': {key: values[key] for key in EXTRA_INFO_COLUMNS if values[key]},
+                })
+    finally:
+        workbook.close()
+    return questions, diagnostics
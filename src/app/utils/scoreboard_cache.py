@@ -0,0 +1,530 @@
+import json
+import time
+import uuid
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from valkey.asyncio import Valkey
+
+from app.config import settings
+from app.dependencies.db import AsyncSessionLocal, get_valkey_pubsub, get_script
+from app.model.player import Player
+from app.model.match import Match
+from app.model.record import Record
+from app.logger import global_logger
+from app.utils.match_stream import publish_match_event
+
+
+DRIFT_CHECK_LOCK_KEY = "scoreboard:drift_check_lock"
+REBUILD_WAIT_POLL_SECONDS = 0.05
+
+
+# Rebuilds the sorted set from the hash when their sizes differ (e.g. the sorted set alone was
+# evicted). KEYS[1] = hash, KEYS[2] = sorted set.
+_SYNC_RANKED_LUA = """
+if redis.call('ZCARD', KEYS[2]) ~= redis.call('HLEN', KEYS[1]) then
+    redis.call('DEL', KEYS[2])
+    local flat = redis.call('HGETALL', KEYS[1])
+    for i = 1, #flat, 2 do
+        redis.call('ZADD', KEYS[2], flat[i + 1], flat[i])
+    end
+end
+"""
+
+# KEYS: scoreboard hash, ranked sorted set, rank change hash, version, ready marker, pending changes
+# ARGV: player_code, delta, d_score_earned, match_code, top_k, change token ('' = none)
+# The hash stays the source of truth; the sorted set mirrors it so a rank is one ZCOUNT
+# (competition ranking: 1 + players with a strictly higher total, ties share a rank).
+# rank_change is each player's last move: the updated player's, and a one-rank move the other way
+# for everyone whose total lies between its old and new ones (a ZRANGEBYSCORE over that range).
+# Update, ranking and top-K happen in one atomic round trip; the event it returns is published by the
+# caller on the pub/sub client (a second round trip, see apply_score_delta).
+# Every call bumps the version so a concurrent rebuild knows its totals may be stale, and settles
+# the change announced by begin_score_change; without the ready marker (flushed / never built)
+# nothing is written and nil tells the caller to rebuild.
+APPLY_SCORE_SCRIPT = """
+redis.call('INCR', KEYS[4])
+if ARGV[6] ~= '' then
+    redis.call('ZREM', KEYS[6], ARGV[6])
+end
+if redis.call('EXISTS', KEYS[5]) == 0 then
+    return false
+end
+""" + _SYNC_RANKED_LUA + """
+local function rank_of(score)
+    return redis.call('ZCOUNT', KEYS[2], '(' .. score, '+inf') + 1
+end
+
+local old_total = redis.call('HGET', KEYS[1], ARGV[1])
+local previous_rank = cjson.null
+if old_total then
+    previous_rank = rank_of(old_total)
+end
+local total = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], total, ARGV[1])
+local rank = rank_of(total)
+local rank_change = 0
+if previous_rank ~= cjson.null then
+    rank_change = previous_rank - rank
+end
+redis.call('HSET', KEYS[3], ARGV[1], rank_change)
+
+-- Passed players (old <= total < new) drop a rank; those passed back (new <= total < old) gain one.
+-- A newcomer is passed by everyone below its total.
+local low, high, moved
+if not old_total then
+    low, high, moved = '-inf', '(' .. total, -1
+elseif total > tonumber(old_total) then
+    low, high, moved = old_total, '(' .. total, -1
+elseif total < tonumber(old_total) then
+    low, high, moved = total, '(' .. old_total, 1
+end
+if low then
+    for _, member in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], low, high)) do
+        if member ~= ARGV[1] then
+            redis.call('HSET', KEYS[3], member, moved)
+        end
+    end
+end
+
+-- Top K, extended to everyone tied with the K-th player
+local top = {}
+local head = redis.call('ZREVRANGE', KEYS[2], 0, tonumber(ARGV[5]) - 1, 'WITHSCORES')
+if #head > 0 then
+    local cutoff = head[#head]
+    local members = redis.call('ZRANGEBYSCORE', KEYS[2], cutoff, '+inf', 'WITHSCORES')
+    for i = 1, #members, 2 do
+        table.insert(top, {player_code = members[i], total_d_score = tonumber(members[i + 1])})
+    end
+    table.sort(top, function(a, b)
+        if a.total_d_score ~= b.total_d_score then
+            return a.total_d_score > b.total_d_score
+        end
+        return a.player_code < b.player_code
+    end)
+    for i, entry in ipairs(top) do
+        if i > 1 and entry.total_d_score == top[i - 1].total_d_score then
+            entry.rank = top[i - 1].rank
+        else
+            entry.rank = i
+        end
+    end
+end
+
+local event = cjson.encode({
+    type = 'player_score_updated',
+    match_code = ARGV[4],
+    player_code = ARGV[1],
+    d_score_earned = tonumber(ARGV[3]),
+    new_total_score = total,
+    rank = rank,
+    previous_rank = previous_rank,
+    rank_change = rank_change,
+    top = top
+})
+return event
+"""
+
+# KEYS: scoreboard hash, ranked sorted set, rank change hash, version, ready marker
+READ_RANKED_SCRIPT = """
+if redis.call('EXISTS', KEYS[5]) == 0 then
+    return false
+end
+""" + _SYNC_RANKED_LUA + """
+return {
+    redis.call('ZREVRANGE', KEYS[2], 0, -1, 'WITHSCORES'),
+    redis.call('HGETALL', KEYS[3])
+}
+"""
+
+# KEYS: scoreboard hash, ranked sorted set, rank change hash, version, ready marker, pending changes
+# ARGV: version read before the totals were computed, pending changes older than this (ms) are
+# dropped, then player_code / total pairs
+# Refuses (returns 0) when a score update landed in between, since the totals may miss it, or when
+# a record change committed without its delta applied yet, since the totals may already count it.
+REPLACE_SCOREBOARD_SCRIPT = """
+if (redis.call('GET', KEYS[4]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[6], '-inf', ARGV[2])
+if redis.call('ZCARD', KEYS[6]) > 0 then
+    return 0
+end
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    redis.call('ZADD', KEYS[2], ARGV[i + 1], ARGV[i])
+end
+redis.call('SET', KEYS[5], 1)
+return 1
+"""
+
+# KEYS: scoreboard hash, ranked sorted set, rank change hash, version, ready marker, pending changes
+# ARGV: change token ('' = none)
+# For record changes that aren't one player's delta (bulk deletes): the scoreboard goes offline, so the
+# next read or update rebuilds it from the records, and the version bump refuses any rebuild whose
+# totals were read before the change.
+DISCARD_SCOREBOARD_SCRIPT = """
+redis.call('INCR', KEYS[4])
+if ARGV[1] ~= '' then
+    redis.call('ZREM', KEYS[6], ARGV[1])
+end
+return redis.call('DEL', KEYS[5])
+"""
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+
+def scoreboard_key(match_code: str) -> str:
+    return f"scoreboard:{match_code}"
+
+
+
+def ranked_scoreboard_key(match_code: str) -> str:
+    return f"scoreboard:{match_code}:ranked"
+
+
+
+def rank_change_key(match_code: str) -> str:
+    return f"scoreboard:{match_code}:rank_change"
+
+
+
+def scoreboard_keys(match_code: str) -> list[str]:
+    """Every key that makes up the cached scoreboard of a match, in the order the scripts expect."""
+    return [
+        scoreboard_key(match_code),
+        ranked_scoreboard_key(match_code),
+        rank_change_key(match_code),
+        f"scoreboard:{match_code}:version",
+        f"scoreboard:{match_code}:ready",
+        f"scoreboard:{match_code}:pending",
+    ]
+
+
+
+async def begin_score_change(cache: Valkey, match_code: str) -> str | None:
+    """
+    Announce a record change before its commit; pass the token to apply_score_delta (or
+    cancel_score_change if the commit fails). Until the delta lands, rebuilds keep off the
+    scoreboard: their totals could already count the change and the delta would add it twice.
+    None when Valkey is unreachable (the record is written anyway).
+    """
+    token = uuid.uuid4().hex
+    try:
+        await cache.zadd(scoreboard_keys(match_code)[5], {token: int(time.time() * 1000)})
+        return token
+    except Exception as e:
+        global_logger.warning("[SCOREBOARD] Could not announce a score change for match=%s: %s", match_code, e)
+        return None
+
+
+
+async def cancel_score_change(cache: Valkey, match_code: str, token: str | None):
+    if token is None:
+        return
+    try:
+        await cache.zrem(scoreboard_keys(match_code)[5], token)
+    except Exception as e:
+        global_logger.warning("[SCOREBOARD] Could not cancel a score change for match=%s: %s", match_code, e)
+
+
+
+async def discard_scoreboard(cache: Valkey, match_code: str, change_token: str | None = None):
+    """
+    Take the scoreboard offline after a committed change the deltas can't express (e.g. every
+    record of the match deleted), settling the change begin_score_change announced.
+    """
+    try:
+        await get_script(cache, DISCARD_SCOREBOARD_SCRIPT)(keys=scoreboard_keys(match_code), args=[change_token or ''])
+    except Exception as e:
+        global_logger.warning("[SCOREBOARD] Could not discard the scoreboard of match=%s: %s", match_code, e)
+
+
+
+async def apply_score_delta(
+    cache: Valkey,
+    match_code: str,
+    player_code: str,
+    delta: int,
+    d_score_earned: int,
+    change_token: str | None = None
+) -> dict:
+    """
+    Add delta to the player's cached total, publish player_score_updated and return that event:
+    new total, rank, previous rank, rank change (positive = moved up) and the top-K standings.
+    change_token is the one begin_score_change returned before the record was committed.
+
+    Two round trips: the apply on the cache, then the publish on the pub/sub client. The event
+    has to go into the match's stream, which lives next to its channel in the pub/sub database
+    (replays read it there), and VALKEY_CACHE_URL / VALKEY_PUBSUB_URL may name different
+    databases or servers, so one script can't do both. The metrics time each of them.
+    """
+    started = time.perf_counter()
+    script = get_script(cache, APPLY_SCORE_SCRIPT)
+    keys = scoreboard_keys(match_code)
+    event = await script(keys=keys, args=[player_code, delta, d_score_earned, match_code, settings.SCOREBOARD_TOP_K, change_token or ''])
+    if event is None:
+        # No live scoreboard: rebuild it from the records, which already include this change
+        # (the record is committed before the cache is touched), then publish with a zero delta.
+        await scoreboard_keeper.rebuild(cache, match_code)
+        event = await script(keys=keys, args=[player_code, 0, d_score_earned, match_code, settings.SCOREBOARD_TOP_K, ''])
+        if event is None:
+            raise RuntimeError(f"Scoreboard cache for match={match_code} could not be rebuilt")
+    applied = time.perf_counter()
+    await publish_match_event(await get_valkey_pubsub(), match_code, event)
+    scoreboard_keeper.record_score_update((applied - started) * 1000, (time.perf_counter() - applied) * 1000)
+    return json.loads(event)
+
+
+
+def rank_standings(entries: list[tuple[str, int]], rank_changes: dict[str, int], top_k: int) -> dict:
+    """
+    Turn (player_code, total) pairs into ready-to-render standings.
+    Ties share a rank (1, 2, 2, 4) and are listed by player_code; `top` holds the first top_k
+    players plus anyone tied with the last of them; `ties` groups the players sharing a total.
+    """
+    standings, groups = [], {}
+    for position, (player_code, total) in enumerate(sorted(entries, key=lambda entry: (-entry[1], entry[0])), start=1):
+        group = groups.setdefault(total, {'total_d_score': total, 'rank': position, 'player_codes': []})
+        group['player_codes'].append(player_code)
+        standings.append({
+            'player_code': player_code,
+            'total_d_score': total,
+            'rank': group['rank'],
+            'rank_change': rank_changes.get(player_code, 0),
+        })
+    for entry in standings:
+        entry['tied'] = len(groups[entry['total_d_score']]['player_codes']) > 1
+
+    top = standings[:top_k]
+    if top:
+        top += [entry for entry in standings[top_k:] if entry['rank'] == top[-1]['rank']]
+    return {
+        'scoreboard': standings,
+        'top': top,
+        'ties': [group for group in groups.values() if len(group['player_codes']) > 1],
+    }
+
+
+
+async def get_ranked_scoreboard(cache: Valkey, match_code: str, top_k: int) -> dict | None:
+    """
+    Read the ranked scoreboard in one round trip, rebuilding it from the records first when it
+    is missing. None when the match has no scores.
+    """
+    script = get_script(cache, READ_RANKED_SCRIPT)
+    result = await script(keys=scoreboard_keys(match_code))
+    if result is None and await scoreboard_keeper.rebuild(cache, match_code):
+        result = await script(keys=scoreboard_keys(match_code))
+    if not result or not result[0]:
+        return None
+    members, flat_changes = result
+    entries = [(members[i], int(float(members[i + 1]))) for i in range(0, len(members), 2)]
+    rank_changes = {flat_changes[i]: int(flat_changes[i + 1]) for i in range(0, len(flat_changes), 2)}
+    return rank_standings(entries, rank_changes, top_k)
+
+
+
+def diff_scoreboards(cached: dict[str, int], expected: dict[str, int]) -> list[dict]:
+    """Players whose cached total differs from the total computed from the records table."""
+    return [
+        {
+            'player_code': player_code,
+            'cached_total': cached.get(player_code),
+            'db_total': expected.get(player_code),
+        }
+        for player_code in sorted(set(cached) | set(expected))
+        if cached.get(player_code, 0) != expected.get(player_code, 0)
+    ]
+
+
+
+async def get_scoreboard_totals_from_db(match_code: str, session: AsyncSession) -> dict[str, int]:
+    totals_query = (
+        select(Player.player_code, func.coalesce(func.sum(Record.d_score_earned), 0))
+        .join(Player, Player.id == Record.player_id)
+        .join(Match, Match.id == Record.match_id)
+        .where(Match.match_code == match_code, Record.is_deleted.is_(False))
+        .group_by(Player.player_code)
+    )
+    execution = await session.execute(totals_query)
+    return {player_code: int(total) for player_code, total in execution.all()}
+
+
+
+async def _match_exists(match_code: str, session: AsyncSession) -> bool:
+    execution = await session.execute(select(Match.id).where(Match.match_code == match_code, Match.is_deleted.is_(False)))
+    return execution.scalar_one_or_none() is not None
+
+
+
+async def get_active_match_codes_from_db(session: AsyncSession) -> list[str]:
+    """Matches that received a record within the last SCOREBOARD_ACTIVE_MATCH_HOURS."""
+    since = datetime.now(timezone.utc) - timedelta(hours=settings.SCOREBOARD_ACTIVE_MATCH_HOURS)
+    active_query = (
+        select(Match.match_code)
+        .join(Record, Record.match_id == Match.id)
+        .where(Record.created_at >= since, Match.is_deleted.is_(False))
+        .distinct()
+    )
+    execution = await session.execute(active_query)
+    return list(execution.scalars().all())
+
+
+
+class ScoreboardCacheKeeper:
+    """
+    Rebuilds lost scoreboards from the records table and keeps them honest.
+    - rebuild(): one aggregate query, at most once at a time per match (single-flight within
+      the worker, a Valkey lock across workers); refuses to overwrite score updates that raced it
+      and to go live while a committed record change still has its delta to apply.
+    - warm_up(): rebuilds the missing scoreboards of the active matches at startup.
+    - the drift check compares the active scoreboards with the records on a schedule (one worker
+      per interval) and rebuilds the ones that drifted.
+    """
+    def __init__(self):
+        self.rebuilds = 0
+        self.rebuild_conflicts = 0
+        self.rebuild_failures = 0
+        self.drift_checks = 0
+        self.drifted = 0
+        self.last_drift_check_at = None
+        self.score_updates = 0
+        self.total_apply_ms = 0.0
+        self.total_publish_ms = 0.0
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._task: asyncio.Task | None = None
+
+    async def rebuild(self, cache: Valkey, match_code: str) -> bool:
+        """Recompute the match's scoreboard from the records. Returns whether a live scoreboard exists afterwards."""
+        flight = self._in_flight.get(match_code)
+        if flight is None:
+            flight = asyncio.ensure_future(self._rebuild(cache, match_code))
+            self._in_flight[match_code] = flight
+            flight.add_done_callback(lambda _: self._in_flight.pop(match_code, None))
+        # shield: a cancelled caller must not cancel the rebuild the others are waiting on
+        return await asyncio.shield(flight)
+
+    async def _rebuild(self, cache: Valkey, match_code: str) -> bool:
+        keys = scoreboard_keys(match_code)
+        lock_key, token = f"scoreboard:{match_code}:rebuild_lock", uuid.uuid4().hex
+        lock_ttl_ms = settings.SCOREBOARD_REBUILD_LOCK_TTL_MS
+        if not await cache.set(lock_key, token, nx=True, px=lock_ttl_ms):
+            # Another worker is rebuilding it: wait for that one instead of querying again
+            deadline = time.monotonic() + lock_ttl_ms / 1000
+            while time.monotonic() < deadline and await cache.exists(lock_key):
+                await asyncio.sleep(REBUILD_WAIT_POLL_SECONDS)
+            return bool(await cache.exists(keys[4]))
+        try:
+            replace = get_script(cache, REPLACE_SCOREBOARD_SCRIPT)
+            async with AsyncSessionLocal() as session:
+                for attempt in range(1, settings.SCOREBOARD_REBUILD_ATTEMPTS + 1):
+                    version = await cache.get(keys[3]) or '0'
+                    totals = await get_scoreboard_totals_from_db(match_code, session)
+                    if not totals and not await _match_exists(match_code, session):
+                        return False  # don't create scoreboards for unknown match codes
+                    await session.rollback()  # next attempt reads a fresh snapshot
+                    pairs = [value for player_code, total in totals.items() for value in (player_code, total)]
+                    stale_before_ms = int(time.time() * 1000) - settings.SCOREBOARD_PENDING_CHANGE_TTL_MS
+                    if await replace(keys=keys, args=[version, stale_before_ms, *pairs]):
+                        self.rebuilds += 1
+                        global_logger.info("[SCOREBOARD] Rebuilt match=%s from records (%d players, attempt %d)", match_code, len(totals), attempt)
+                        return True
+                    self.rebuild_conflicts += 1
+                    # Give the changes in flight a moment to land before reading the records again
+                    await asyncio.sleep(REBUILD_WAIT_POLL_SECONDS)
+            self.rebuild_failures += 1
+            global_logger.warning("[SCOREBOARD] Gave up rebuilding match=%s: scores kept changing during the rebuild", match_code)
+            return False
+        finally:
+            await get_script(cache, RELEASE_LOCK_SCRIPT)(keys=[lock_key], args=[token])
+
+    async def warm_up(self, cache: Valkey):
+        """Rebuild the scoreboards of the active matches that are missing from the cache."""
+        try:
+            async with AsyncSessionLocal() as session:
+                match_codes = await get_active_match_codes_from_db(session)
+            warmed = 0
+            for match_code in match_codes:
+                if not await cache.exists(scoreboard_keys(match_code)[4]):
+                    warmed += await self.rebuild(cache, match_code)
+            global_logger.info("[SCOREBOARD] Warm-up done: %d active match(es), %d rebuilt", len(match_codes), warmed)
+        except Exception:
+            global_logger.exception("[SCOREBOARD] Warm-up failed; scoreboards will be rebuilt on first use")
+
+    async def check_drift(self, cache: Valkey, match_code: str, session: AsyncSession) -> list[dict] | None:
+        """
+        Compare the cached totals with the records; rebuild when they differ.
+        Returns the mismatches, or None when scores changed during the check (inconclusive).
+        """
+        keys = scoreboard_keys(match_code)
+        version = await cache.get(keys[3])
+        cached = {player_code: int(total) for player_code, total in (await cache.hgetall(keys[0])).items()}
+        db_totals = await get_scoreboard_totals_from_db(match_code, session)
+        if await cache.get(keys[3]) != version:
+            return None
+        self.drift_checks += 1
+        mismatches = diff_scoreboards(cached, db_totals)
+        if mismatches:
+            self.drifted += 1
+            global_logger.warning("[SCOREBOARD] Drift for match=%s: %d player(s) differ, rebuilding", match_code, len(mismatches))
+            await self.rebuild(cache, match_code)
+        return mismatches
+
+    def start(self, cache: Valkey):
+        if self._task is None and settings.SCOREBOARD_DRIFT_CHECK_INTERVAL > 0:
+            self._task = asyncio.create_task(self._run(cache))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, cache: Valkey):
+        interval = settings.SCOREBOARD_DRIFT_CHECK_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Only one worker checks per interval; the lock simply expires
+                if not await cache.set(DRIFT_CHECK_LOCK_KEY, 1, nx=True, px=int(interval * 1000)):
+                    continue
+                async with AsyncSessionLocal() as session:
+                    for match_code in await get_active_match_codes_from_db(session):
+                        await self.check_drift(cache, match_code, session)
+                        await session.rollback()
+                self.last_drift_check_at = datetime.now(timezone.utc).isoformat()
+            except Exception as e:
+                global_logger.error("[SCOREBOARD] Drift check failed: %s", e)
+
+    def record_score_update(self, apply_ms: float, publish_ms: float):
+        self.score_updates += 1
+        self.total_apply_ms += apply_ms
+        self.total_publish_ms += publish_ms
+
+    def get_stats(self) -> dict:
+        return {
+            'score_updates': self.score_updates,
+            # Apply on the cache and publish on the pub/sub client are two round trips (see apply_score_delta)
+            'mean_score_apply_ms': round(self.total_apply_ms / self.score_updates, 3) if self.score_updates else None,
+            'mean_score_publish_ms': round(self.total_publish_ms / self.score_updates, 3) if self.score_updates else None,
+            'rebuilds': self.rebuilds,
+            'rebuild_conflicts': self.rebuild_conflicts,
+            'rebuild_failures': self.rebuild_failures,
+            'rebuilds_in_flight': len(self._in_flight),
+            'drift_checks': self.drift_checks,
+            'drifted': self.drifted,
+            'last_drift_check_at': self.last_drift_check_at,
+        }
+
+
+scoreboard_keeper = ScoreboardCacheKeeper()
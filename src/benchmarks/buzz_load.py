@@ -0,0 +1,123 @@
+"""
+Load test for the atomic buzz arbitration script.
+
+Fires N buzzes for the same question at once (one per simulated player), then checks:
+  - exactly one winner and a gap-free ordering 1..N,
+  - one player_buzzed event published per accepted buzz,
+  - fairness: how often the arbitration order disagrees with the server receive timestamps,
+and reports p50 / p99 round-trip latency of the buzz call.
+
+Usage (from src/, with a reachable Valkey):
+    python -m benchmarks.buzz_load --url valkey://localhost:6379/1 --players 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from valkey.asyncio import Valkey, BlockingConnectionPool
+
+from app.utils.match_event import arbitrate_buzz, buzz_order_key, buzz_times_key
+from app.utils.match_state import match_state_key
+
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+
+async def _buzz(valkey: Valkey, match_code: str, question_code: str, player_code: str, start: asyncio.Event) -> dict:
+    await start.wait()
+    received_ms = int(time.time() * 1000)
+    started = time.perf_counter()
+    result = await arbitrate_buzz(valkey, match_code, player_code, question_code, received_ms)
+    return {
+        "player_code": player_code,
+        "received_ms": received_ms,
+        "latency_ms": (time.perf_counter() - started) * 1000,
+        **result,
+    }
+
+
+
+async def _collect_events(valkey: Valkey, channel: str, expected: int, timeout: float) -> list[dict]:
+    subscriber = valkey.pubsub()
+    await subscriber.subscribe(channel)
+    events, deadline = [], time.monotonic() + timeout
+    try:
+        while len(events) < expected and time.monotonic() < deadline:
+            message = await subscriber.get_message(ignore_subscribe_messages=True, timeout=0.5)
+            if message:
+                events.append(json.loads(message["data"]))
+    finally:
+        await subscriber.aclose()
+    return events
+
+
+
+async def run(url: str, players: int, connections: int, match_code: str, question_code: str) -> dict:
+    # Same kind of bounded pool as the app: buzzes queue for a connection instead of failing
+    valkey = Valkey.from_pool(BlockingConnectionPool.from_url(url, decode_responses=True, max_connections=connections + 2, timeout=None))
+    await valkey.delete(
+        match_state_key(match_code),
+        f"timers:{match_code}",
+        buzz_order_key(match_code, question_code),
+        buzz_times_key(match_code, question_code),
+    )
+    collector = asyncio.create_task(_collect_events(valkey, f"match:{match_code}:updates", players, timeout=30))
+    await asyncio.sleep(0.2)
+
+    start = asyncio.Event()
+    tasks = [
+        asyncio.create_task(_buzz(valkey, match_code, question_code, f"PLOAD{i:05d}", start))
+        for i in range(players)
+    ]
+    await asyncio.sleep(0)
+    wall_start = time.perf_counter()
+    start.set()
+    results = await asyncio.gather(*tasks)
+    wall = time.perf_counter() - wall_start
+    events = await collector
+    await valkey.aclose()
+
+    accepted = sorted((r for r in results if r["accepted"]), key=lambda r: r["position"])
+    positions = [r["position"] for r in accepted]
+    winners = [r for r in accepted if r["position"] == 1]
+    # Pairs of consecutive positions whose receive timestamps go backwards
+    inversions = sum(1 for a, b in zip(accepted, accepted[1:]) if a["received_ms"] > b["received_ms"])
+    latencies = [r["latency_ms"] for r in results]
+    return {
+        "players": players,
+        "accepted": len(accepted),
+        "single_winner": len(winners) == 1,
+        "ordering_gap_free": positions == list(range(1, len(accepted) + 1)),
+        "events_published": len([e for e in events if e.get("type") == "player_buzzed"]),
+        "order_inversions_vs_receive_time": inversions,
+        "throughput_buzz_per_s": round(players / wall, 1),
+        "latency_p50_ms": round(percentile(latencies, 50), 3),
+        "latency_p99_ms": round(percentile(latencies, 99), 3),
+        "latency_max_ms": round(max(latencies), 3),
+    }
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="valkey://localhost:6379/1")
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--match-code", default="MLOAD")
+    parser.add_argument("--question-code", default="LNLOAD")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.url, args.players, args.connections, args.match_code, args.question_code))
+    print(json.dumps(result))
+    if not (result["single_winner"] and result["ordering_gap_free"]):
+        raise SystemExit(1)
+
+
+
+if __name__ == "__main__":
+    main()
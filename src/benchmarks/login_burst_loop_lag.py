@@ -0,0 +1,82 @@
+"""
+Event loop lag during a login burst.
+
+Runs N concurrent password verifications (everyone logging in before a match) while a
+ticker task measures how late the loop wakes it up. Compares the legacy inline bcrypt call
+with verify_password, which runs in the bounded hashing pool.
+
+Usage (from src/):
+    python -m benchmarks.login_burst_loop_lag --logins 40
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.core.security import pwd_context, verify_password
+
+
+TICK_INTERVAL = 0.005
+
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+
+async def _measure_lag(stop: asyncio.Event, lags: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append((time.perf_counter() - started - TICK_INTERVAL) * 1000)
+
+
+
+async def _legacy_verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+
+
+async def _burst(verify, logins: int, password: str, hashed: str) -> dict:
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(_measure_lag(stop, lags))
+    await asyncio.sleep(TICK_INTERVAL * 2)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify(password, hashed) for _ in range(logins)))
+    duration = time.perf_counter() - started
+    stop.set()
+    await ticker
+    return {
+        "verified": sum(results),
+        "burst_s": round(duration, 3),
+        "loop_lag_p50_ms": round(percentile(lags, 50), 2),
+        "loop_lag_p99_ms": round(percentile(lags, 99), 2),
+        "loop_lag_max_ms": round(max(lags), 2),
+    }
+
+
+
+async def run(logins: int) -> dict:
+    password = "olympia-benchmark"
+    hashed = pwd_context.hash(password)
+    return {
+        "logins": logins,
+        "legacy_inline": await _burst(_legacy_verify, logins, password, hashed),
+        "hash_executor": await _burst(verify_password, logins, password, hashed),
+    }
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.logins)), indent=2))
+
+
+
+if __name__ == "__main__":
+    main()
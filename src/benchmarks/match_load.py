@@ -0,0 +1,412 @@
+"""
+End-to-end load test: a full match played against the whole app.
+
+Boots the app in process (uvicorn on a local port, lifespan and background workers included)
+against the Postgres and Valkey of the environment, seeds a team per player, the players, a
+match and its question workbook through the API, then plays a scripted match:
+
+  - V viewer websockets and one websocket per player connect to the match (connect storm),
+  - per question: the controller picks and starts it, every player buzzes at the same moment,
+    then answers, one record per player is posted at the same moment, and the timer is cancelled.
+
+It reports, per broadcast kind, how long after the action every connected socket received it
+(buzz -> player_buzzed, answer -> player_answered, record POST -> player_score_updated,
+start_timer POST -> start_the_timer) with p50 / p99, plus HTTP latencies, throughput, event
+loop lag, CPU time and memory of the process, and the app's own /metrics at the end.
+
+Clients and server share one process and one event loop: the numbers are for comparing runs on
+the same machine, not an absolute capacity. Each run is saved as
+benchmarks/results/match_load/<UTC timestamp>.json and compared with the previous one.
+
+Postgres is required (the app's upserts use the PostgreSQL dialect, SQLite can't stand in); a
+local Valkey is enough, e.g. `docker compose --profile developer up -d postgresql valkey`.
+Seeded codes carry a run id, so the same (throwaway) database can be reused.
+
+Usage (from src/, with DATABASE_URL / VALKEY_CACHE_URL / VALKEY_PUBSUB_URL / SECRET_KEY ... set as for the app):
+    python -m benchmarks.match_load --viewers 300 --players 4 --questions 10
+"""
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import orjson
+import uvicorn
+import websockets
+
+from app.main import app
+from app.core.security import create_access_token
+from benchmarks.question_import import build_workbook
+
+
+RESULTS_DIR = Path(__file__).parent / "results" / "match_load"
+TICK_INTERVAL = 0.005
+POLL_INTERVAL = 0.01
+# Broadcasts timed from the action that triggers them
+MEASURED_EVENTS = ("start_the_timer", "player_buzzed", "player_answered", "player_score_updated")
+# Metrics put side by side with the previous run
+COMPARED_METRICS = (
+    "broadcast.player_buzzed.p50_ms",
+    "broadcast.player_buzzed.p99_ms",
+    "broadcast.player_score_updated.p99_ms",
+    "broadcast.start_the_timer.p99_ms",
+    "http.post_record.p99_ms",
+    "connect.p99_ms",
+    "throughput.frames_per_s",
+    "throughput.requests_per_s",
+    "loop_lag.p99_ms",
+    "cpu.percent",
+    "memory.peak_rss_mb",
+)
+
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+
+def summarize(values: list[float]) -> dict:
+    if not values:
+        return {"samples": 0}
+    return {
+        "samples": len(values),
+        "p50_ms": round(percentile(values, 50), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(max(values), 3),
+    }
+
+
+
+def current_rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as statm:
+            return round(int(statm.read().split()[1]) * resource.getpagesize() / 2**20, 1)
+    except OSError:
+        return None
+
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+
+class Broadcasts:
+    """Receive times of the measured broadcasts on every socket, keyed by (type, question_code, player_code)."""
+    def __init__(self):
+        self.arrivals: dict[tuple, list[float]] = defaultdict(list)
+        self.sent: dict[tuple, float] = {}
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.missing: dict[str, int] = defaultdict(int)
+        self.frames = 0
+        # player_score_updated carries no question_code: it belongs to the question being played
+        self.question_code = None
+
+    def received(self, raw: str | bytes):
+        received = time.perf_counter()
+        self.frames += 1
+        frame = orjson.loads(raw)
+        event_type = frame.get("type")
+        if event_type in MEASURED_EVENTS:
+            key = (event_type, frame.get("question_code") or self.question_code, frame.get("player_code"))
+            self.arrivals[key].append(received)
+
+    async def settle(self, keys: list[tuple], sockets: int, timeout: float):
+        """Wait until every socket got each key (or the timeout), then turn the arrivals into latencies."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and any(len(self.arrivals[key]) < sockets for key in keys):
+            await asyncio.sleep(POLL_INTERVAL)
+        for key in keys:
+            arrivals = self.arrivals.pop(key, [])
+            self.latencies[key[0]] += [(received - self.sent[key]) * 1000 for received in arrivals]
+            self.missing[key[0]] += max(0, sockets - len(arrivals))
+
+
+
+async def _measure_lag(stop: asyncio.Event, lags: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append((time.perf_counter() - started - TICK_INTERVAL) * 1000)
+
+
+
+async def _start_server(port: int) -> tuple[uvicorn.Server, asyncio.Task, int]:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+            raise RuntimeError("The app did not start (see the log above)")
+        await asyncio.sleep(0.05)
+    return server, task, server.servers[0].sockets[0].getsockname()[1]
+
+
+
+async def _request(client: httpx.AsyncClient, timings: dict, name: str, method: str, url: str, **kwargs) -> dict:
+    started = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    timings[name].append((time.perf_counter() - started) * 1000)
+    if response.is_error:
+        raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.text[:500]}")
+    return response.json()
+
+
+
+async def seed(client: httpx.AsyncClient, timings: dict, run_id: str, players: int, questions: int) -> dict:
+    match_code = f"ML{run_id}"
+    player_codes = [f"P{run_id}{i:03d}" for i in range(players)]
+    started = time.perf_counter()
+    for i, player_code in enumerate(player_codes):
+        team_code = f"TL{run_id}{i:03d}"
+        await _request(client, timings, "post_team", "POST", "/teams/", json={"team_code": team_code, "team_name": f"Load {run_id} {i}"})
+        await _request(client, timings, "post_player", "POST", "/players/", json={"team_code": team_code, "player_code": player_code, "player_name": f"Load {i}"})
+    await _request(client, timings, "post_match", "POST", "/matches/", json={"match_code": match_code, "match_name": f"Load test {run_id}"})
+    workbook = build_workbook(questions)
+    await _request(
+        client, timings, "upload_questions", "POST", "/questions/upload",
+        files={"file": (f"OGD3_{match_code}.xlsx", workbook, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+    )
+    return {
+        "match_code": match_code,
+        "player_codes": player_codes,
+        # The first round's sheet: build_workbook codes its questions LN00000, LN00001, ...
+        "question_codes": [f"LN{i:05d}" for i in range(questions)],
+        "seed_s": round(time.perf_counter() - started, 3),
+        "workbook_bytes": len(workbook),
+    }
+
+
+
+async def _connect(url: str, connect_ms: list[float]):
+    started = time.perf_counter()
+    socket = await websockets.connect(url, open_timeout=60)
+    await socket.recv()  # snapshot
+    connect_ms.append((time.perf_counter() - started) * 1000)
+    return socket
+
+
+
+async def _listen(socket, broadcasts: Broadcasts):
+    try:
+        async for raw in socket:
+            broadcasts.received(raw)
+    except websockets.ConnectionClosed:
+        pass
+
+
+
+async def play_round(
+    client: httpx.AsyncClient,
+    timings: dict,
+    broadcasts: Broadcasts,
+    player_sockets: dict,
+    sockets: int,
+    match_code: str,
+    question_code: str,
+    time_limit: int,
+    timeout: float,
+):
+    player_codes = list(player_sockets)
+    broadcasts.question_code = question_code
+    await _request(client, timings, "pick_question", "POST", "/controller/pick_question",
+                   json={"match_code": match_code, "player_code": player_codes[0], "question_code": question_code})
+
+    key = ("start_the_timer", question_code, None)
+    broadcasts.sent[key] = time.perf_counter()
+    await _request(client, timings, "start_timer", "POST", "/controller/start_timer",
+                   json={"match_code": match_code, "question_code": question_code, "time_limit": time_limit})
+    await broadcasts.settle([key], sockets, timeout)
+
+    # Everyone buzzes at once, then answers at once
+    for event_type, client_msg in (
+        ("player_buzzed", {"type": "buzz"}),
+        ("player_answered", {"type": "answer", "answer": f"Đáp án {question_code}"}),
+    ):
+        keys = [(event_type, question_code, player_code) for player_code in player_codes]
+
+        async def send(player_code: str):
+            message = json.dumps({**client_msg, "player_code": player_code, "question_code": question_code})
+            broadcasts.sent[(event_type, question_code, player_code)] = time.perf_counter()
+            await player_sockets[player_code].send(message)
+
+        await asyncio.gather(*(send(player_code) for player_code in player_codes))
+        await broadcasts.settle(keys, sockets, timeout)
+
+    async def post_record(index: int, player_code: str):
+        broadcasts.sent[("player_score_updated", question_code, player_code)] = time.perf_counter()
+        await _request(client, timings, "post_record", "POST", "/records/", json={
+            "match_code": match_code,
+            "player_code": player_code,
+            "question_code": question_code,
+            "d_score_earned": 10 if index == 0 else 0,
+        })
+
+    await asyncio.gather(*(post_record(i, player_code) for i, player_code in enumerate(player_codes)))
+    await broadcasts.settle([("player_score_updated", question_code, player_code) for player_code in player_codes], sockets, timeout)
+    await _request(client, timings, "cancel_timer", "POST", "/controller/cancel_timer", json={"match_code": match_code})
+
+
+
+async def run(viewers: int, players: int, questions: int, time_limit: int, timeout: float, port: int) -> dict:
+    run_id = uuid.uuid4().hex[:6].upper()
+    server, server_task, port = await _start_server(port)
+    token = create_access_token({"sub": f"match-load-{run_id}", "role": "admin"})
+    timings: dict[str, list[float]] = defaultdict(list)
+    broadcasts = Broadcasts()
+    sockets, listeners = [], []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", headers={"Authorization": f"Bearer {token}"}, timeout=60) as client:
+            seeded = await seed(client, timings, run_id, players, questions)
+            match_code = seeded["match_code"]
+            ws_url = f"ws://127.0.0.1:{port}/controller/ws/match/{match_code}"
+
+            connect_ms: list[float] = []
+            started = time.perf_counter()
+            sockets = await asyncio.gather(*(_connect(ws_url, connect_ms) for _ in range(viewers + players)))
+            connect_s = time.perf_counter() - started
+            listeners = [asyncio.create_task(_listen(socket, broadcasts)) for socket in sockets]
+            player_sockets = dict(zip(seeded["player_codes"], sockets[viewers:]))
+
+            stop, lags = asyncio.Event(), []
+            lag_task = asyncio.create_task(_measure_lag(stop, lags))
+            seed_requests = sum(len(values) for values in timings.values())
+            rss_before, cpu_before, frames_before = current_rss_mb(), cpu_seconds(), broadcasts.frames
+            started = time.perf_counter()
+            for question_code in seeded["question_codes"]:
+                await play_round(client, timings, broadcasts, player_sockets, len(sockets), match_code, question_code, time_limit, timeout)
+            wall = time.perf_counter() - started
+            cpu = cpu_seconds() - cpu_before
+            frames = broadcasts.frames - frames_before
+            stop.set()
+            await lag_task
+
+            app_metrics = (await client.get("/metrics/")).json().get("response", {}).get("data")
+    finally:
+        await asyncio.gather(*(socket.close() for socket in sockets), return_exceptions=True)
+        await asyncio.gather(*listeners, return_exceptions=True)
+        server.should_exit = True
+        await server_task
+
+    requests = sum(len(values) for values in timings.values()) - seed_requests
+    return {
+        "run_id": run_id,
+        "seed": {key: seeded[key] for key in ("match_code", "seed_s", "workbook_bytes")},
+        "connect": {"sockets": len(sockets), "total_s": round(connect_s, 3), **summarize(connect_ms)},
+        "broadcast": {
+            event_type: {**summarize(broadcasts.latencies[event_type]), "missing": broadcasts.missing[event_type]}
+            for event_type in MEASURED_EVENTS
+        },
+        "http": {name: summarize(values) for name, values in timings.items()},
+        "throughput": {
+            "match_s": round(wall, 3),
+            "frames_received": frames,
+            "frames_per_s": round(frames / wall, 1),
+            "requests": requests,
+            "requests_per_s": round(requests / wall, 1),
+            "ws_messages_sent": 2 * players * questions,
+        },
+        "loop_lag": summarize(lags),
+        "cpu": {"seconds": round(cpu, 3), "percent": round(cpu / wall * 100, 1)},
+        "memory": {"rss_before_match_mb": rss_before, "rss_after_match_mb": current_rss_mb(), "peak_rss_mb": peak_rss_mb()},
+        "app_metrics": app_metrics,
+    }
+
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+
+def _metric(result: dict, path: str):
+    for part in path.split("."):
+        result = result.get(part) if isinstance(result, dict) else None
+    return result
+
+
+
+def compare(previous: dict, current: dict) -> dict:
+    """COMPARED_METRICS of the previous run next to this one's."""
+    return {
+        "previous_run": previous["started_at"],
+        "previous_git_revision": previous.get("git_revision"),
+        "same_params": previous.get("params") == current["params"],
+        "metrics": {
+            path: {"previous": _metric(previous, path), "current": _metric(current, path)}
+            for path in COMPARED_METRICS
+        },
+    }
+
+
+
+def save(result: dict, results_dir: Path) -> tuple[Path, dict | None]:
+    """
+    Write the run next to the earlier ones; returns its path and the run to compare it with:
+    the latest one with the same params, else the latest one, else None.
+    """
+    results_dir.mkdir(parents=True, exist_ok=True)
+    earlier = [json.loads(path.read_text()) for path in sorted(results_dir.glob("*.json"))]
+    same_params = [run for run in earlier if run.get("params") == result["params"]]
+    previous = (same_params or earlier or [None])[-1]
+    path = results_dir / f"{result['started_at'].replace(':', '')}.json"
+    path.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    return path, previous
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--viewers", type=int, default=300)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--time-limit", type=int, default=30, help="seconds on the clock per question (cancelled at the end of the round)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for a broadcast to reach every socket")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    params = {key: getattr(args, key) for key in ("viewers", "players", "questions", "time_limit")}
+    started_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    measured = asyncio.run(run(args.viewers, args.players, args.questions, args.time_limit, args.timeout, args.port))
+    result = {
+        "started_at": started_at,
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        **measured,
+    }
+    path, previous = save(result, args.results_dir)
+    summary = {key: result[key] for key in ("connect", "broadcast", "throughput", "loop_lag", "cpu", "memory")}
+    print(json.dumps({"saved_to": str(path), **summary, "compared_to_previous": compare(previous, result) if previous else None}, indent=2))
+    if any(result["broadcast"][event_type]["missing"] for event_type in MEASURED_EVENTS):
+        raise SystemExit(1)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Idle CPU of the match websocket pub/sub listeners.
+
+Connects N fake websockets spread over M matches, lets them sit idle and measures the
+process CPU time spent by the Valkey listeners. Compares the legacy layout (one
+subscription per socket, busy-polling get_message) with the current shared listener.
+
+Usage (from src/, with a reachable Valkey):
+    python -m benchmarks.pubsub_idle_cpu --url valkey://localhost:6379/1 --sockets 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from valkey.asyncio import Valkey
+
+from app.core.controller import listen_to_valkey_pubsub
+from app.dependencies.ws import ConnectionManager
+
+
+
+class IdleWebSocket:
+    class _State:
+        value = 1
+
+    application_state = _State()
+
+    async def send_json(self, message):
+        pass
+
+    async def send_text(self, message):
+        pass
+
+
+
+async def _legacy_listener(valkey: Valkey, match_code: str):
+    # Reproduces the former per-socket listener: its own subscription and a non-blocking poll loop
+    subscriber = valkey.pubsub()
+    await subscriber.subscribe(f"match:{match_code}:updates")
+    try:
+        while True:
+            message = await subscriber.get_message(ignore_subscribe_messages=True)
+            if message and message.get("type") == "message":
+                json.loads(message["data"])
+    finally:
+        await subscriber.aclose()
+
+
+
+async def run_legacy(valkey: Valkey, sockets: int, matches: int) -> list[asyncio.Task]:
+    return [
+        asyncio.create_task(_legacy_listener(valkey, f"MBENCH{i % matches}"))
+        for i in range(sockets)
+    ]
+
+
+
+async def run_current(valkey: Valkey, sockets: int, matches: int) -> list[asyncio.Task]:
+    manager = ConnectionManager()
+    for i in range(sockets):
+        match_code = f"MBENCH{i % matches}"
+        await manager.connect(
+            match_code,
+            IdleWebSocket(),
+            subscriber_factory=lambda match_code=match_code: listen_to_valkey_pubsub(manager, match_code, valkey)
+        )
+    return list(manager.subscriber_tasks.values())
+
+
+
+async def measure(mode: str, url: str, sockets: int, matches: int, duration: float, warmup: float) -> dict:
+    valkey = Valkey.from_url(url, decode_responses=True, max_connections=sockets + 8)
+    runner = run_legacy if mode == "legacy" else run_current
+    tasks = await runner(valkey, sockets, matches)
+    await asyncio.sleep(warmup)
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    await asyncio.sleep(duration)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await valkey.aclose()
+
+    cpu_percent = 100 * cpu / wall
+    return {
+        "mode": mode,
+        "sockets": sockets,
+        "matches": matches,
+        "subscriptions": len(tasks),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent": round(cpu_percent, 2),
+        "cpu_percent_per_1000_sockets": round(cpu_percent * 1000 / sockets, 2),
+    }
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="valkey://localhost:6379/1")
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--matches", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--mode", choices=["legacy", "current", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["legacy", "current"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        result = asyncio.run(measure(mode, args.url, args.sockets, args.matches, args.duration, args.warmup))
+        print(json.dumps(result))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Parse time and event loop lag of a question workbook upload.
+
+Generates a workbook with N questions per round sheet, then parses it twice: the legacy
+way (pd.read_excel once per sheet + to_dict('records'), on the event loop) and through
+parse_question_workbook in the import process pool. Reports how long each parse takes and
+how late a 5 ms ticker on the loop fires meanwhile. The database upsert is not included.
+
+Usage (from src/):
+    python -m benchmarks.question_import --questions 500 5000
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+
+import pandas as pd
+from openpyxl import Workbook
+
+from app.core.question import _parse_question_workbook_off_loop, shutdown_import_pool
+from app.utils.question_workbook import SHEET_NAMES, REQUIRED_COLUMNS, EXTRA_INFO_COLUMNS, convert_sheet_name_to_round_code
+
+
+TICK_INTERVAL = 0.005
+
+
+
+def build_workbook(questions_per_sheet: int) -> bytes:
+    workbook = Workbook(write_only=True)
+    for sheet_name in SHEET_NAMES:
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.append([*REQUIRED_COLUMNS.values(), *EXTRA_INFO_COLUMNS.values()])
+        round_code = convert_sheet_name_to_round_code(sheet_name)
+        for i in range(questions_per_sheet):
+            worksheet.append([
+                f"{round_code}{i:05d}",
+                f"Câu hỏi số {i} của vòng {sheet_name}, đủ dài để giống một câu hỏi thật?",
+                f"Đáp án {i}",
+                f"https://media.example/{round_code}/{i}.png" if i % 3 == 0 else None,
+                "Giải thích ngắn" if i % 2 == 0 else None,
+                None,
+                None,
+            ])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+
+async def _legacy_parse(content: bytes) -> int:
+    io_buf = io.BytesIO(content)
+    rows = 0
+    for sheet in SHEET_NAMES:
+        io_buf.seek(0)
+        rows += len(pd.read_excel(io_buf, sheet).to_dict('records'))
+    return rows
+
+
+
+async def _pooled_parse(content: bytes) -> int:
+    questions, _ = await _parse_question_workbook_off_loop(content)
+    return len(questions)
+
+
+
+async def _measure_lag(stop: asyncio.Event, lags: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append((time.perf_counter() - started - TICK_INTERVAL) * 1000)
+
+
+
+async def _run_one(parse, content: bytes) -> dict:
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(_measure_lag(stop, lags))
+    await asyncio.sleep(TICK_INTERVAL * 2)
+    started = time.perf_counter()
+    rows = await parse(content)
+    duration = time.perf_counter() - started
+    stop.set()
+    await ticker
+    return {
+        "rows": rows,
+        "duration_s": round(duration, 2),
+        "loop_lag_max_ms": round(max(lags), 1),
+    }
+
+
+
+async def run(question_counts: list[int]) -> list[dict]:
+    # Spawning the worker costs ~1 s once per process; keep it out of the measurements
+    await _pooled_parse(build_workbook(1))
+    results = []
+    for questions in question_counts:
+        content = build_workbook(questions)
+        results.append({
+            "questions_per_sheet": questions,
+            "file_bytes": len(content),
+            "legacy_read_excel_per_sheet": await _run_one(_legacy_parse, content),
+            "single_pass_process_pool": await _run_one(_pooled_parse, content),
+        })
+    shutdown_import_pool()
+    return results
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, nargs="+", default=[500, 5000])
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.questions)), indent=2))
+
+
+
+if __name__ == "__main__":
+    main()
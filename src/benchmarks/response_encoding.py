@@ -0,0 +1,159 @@
+"""
+Response building + encoding cost of the records and answers listings at N rows.
+
+Serves the same N rows through two FastAPI routes per listing and times full requests over
+ASGI (routing, response building, serialization; no network, no database):
+
+- legacy: the previous handlers' shape, i.e. per-row dicts built from ORM-like objects (with
+  isoformat() per timestamp; answers with the list put twice in the response) returned as a
+  validated BaseResponse through response_model;
+- fast: rows projected with project_row / zip into a model_construct()-ed response rendered
+  by FastJSONResponse (orjson).
+
+Usage (from src/):
+    python -m benchmarks.response_encoding --rows 10000 --requests 30
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.answer import ANSWER_FIELDS
+from app.core.record import MATCH_RECORD_DEFAULT_FIELDS
+from app.schema.answer import GetAnswerResponse
+from app.schema.record import GetRecordsResponse
+from app.utils.fast_json import FastJSONResponse
+from app.utils.pagination import project_row
+
+
+
+def build_rows(n: int) -> tuple[list, list, list, list]:
+    """(record objects, record rows, answer objects, answer rows) describing the same data."""
+    started = datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc)
+    record_objects, record_rows, answer_objects, answer_rows = [], [], [], []
+    for i in range(n):
+        player_code, question_code = f"P{i % 40:03d}", f"KD{i:05d}"
+        updated_at = started + timedelta(seconds=i, microseconds=i * 7)
+        d_score = 5 * (i % 4)
+        record_objects.append(SimpleNamespace(
+            player=SimpleNamespace(player_code=player_code),
+            question=SimpleNamespace(question_code=question_code),
+            d_score_earned=d_score,
+            updated_at=updated_at,
+        ))
+        record_rows.append((player_code, question_code, d_score, updated_at))
+        content, timestamp = f"Câu trả lời số {i}", Decimal(f"{i % 30}.{i % 1000:03d}")
+        answer_objects.append(SimpleNamespace(
+            player=SimpleNamespace(player_code=player_code),
+            question=SimpleNamespace(question_code=question_code),
+            content=content,
+            timestamp=timestamp,
+        ))
+        answer_rows.append((player_code, question_code, content, timestamp))
+    return record_objects, record_rows, answer_objects, answer_rows
+
+
+
+def build_app(n: int) -> FastAPI:
+    record_objects, record_rows, answer_objects, answer_rows = build_rows(n)
+    app = FastAPI()
+
+    @app.get("/legacy/records", response_model=GetRecordsResponse)
+    async def legacy_records():
+        return GetRecordsResponse(response={'data': {
+            'match_code': 'M001',
+            'match_name': 'Benchmark',
+            'records': [
+                {
+                    'player_code': record.player.player_code if record.player else 'N/A',
+                    'question_code': record.question.question_code if record.question else 'N/A',
+                    'd_score_earned': record.d_score_earned,
+                    'updated_at': record.updated_at.isoformat()
+                }
+                for record in record_objects
+            ]
+        }})
+
+    @app.get("/fast/records", response_model=GetRecordsResponse)
+    async def fast_records():
+        return FastJSONResponse(GetRecordsResponse.model_construct(response={'data': {
+            'match_code': 'M001',
+            'match_name': 'Benchmark',
+            'records': [project_row(row, MATCH_RECORD_DEFAULT_FIELDS) for row in record_rows],
+            'next_cursor': None,
+        }}))
+
+    @app.get("/legacy/answers", response_model=GetAnswerResponse)
+    async def legacy_answers():
+        answers = [
+            {
+                'player_code': res.player.player_code if res.player else None,
+                'question_code': res.question.question_code if res.question else None,
+                'content': res.content,
+                'timestamp': float(res.timestamp) if res.timestamp is not None else None,
+            }
+            for res in answer_objects
+        ]
+        return GetAnswerResponse(response={
+            'data': {'match_code': 'M001', 'answers': answers},
+            'match_code': 'M001',
+            'answers': answers,
+        })
+
+    @app.get("/fast/answers", response_model=GetAnswerResponse)
+    async def fast_answers():
+        return FastJSONResponse(GetAnswerResponse.model_construct(response={
+            'data': {'match_code': 'M001', 'answers': [dict(zip(ANSWER_FIELDS, row)) for row in answer_rows]},
+        }))
+
+    return app
+
+
+
+async def _time_requests(client: httpx.AsyncClient, path: str, requests: int) -> dict:
+    await client.get(path)  # warm-up
+    durations = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get(path)
+        durations.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return {
+        "median_ms": round(statistics.median(durations), 2),
+        "p95_ms": round(sorted(durations)[int(len(durations) * 0.95) - 1], 2),
+        "response_bytes": len(response.content),
+    }
+
+
+
+async def run(rows: int, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=build_app(rows))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {"rows": rows, "requests": requests}
+        for listing in ("records", "answers"):
+            results[listing] = {
+                "legacy_validated_response_model": await _time_requests(client, f"/legacy/{listing}", requests),
+                "fast_json_response": await _time_requests(client, f"/fast/{listing}", requests),
+            }
+    return results
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=30)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.rows, args.requests)), indent=2))
+
+
+
+if __name__ == "__main__":
+    main()
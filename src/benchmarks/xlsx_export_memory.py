@@ -0,0 +1,113 @@
+"""
+Peak memory and event loop lag of the XLSX exports.
+
+Exports N synthetic record rows twice: the legacy way (pandas DataFrame + openpyxl into a
+BytesIO, on the event loop) and through stream_xlsx (server-side-cursor style batches into a
+write-only workbook in a worker thread, bytes streamed out). Reports the peak traced Python
+memory and how late a 5 ms ticker on the loop fires while each export runs. Memory is
+measured in a separate pass, since tracemalloc slows everything down and would skew the lag.
+
+Usage (from src/):
+    python -m benchmarks.xlsx_export_memory --rows 10000 50000
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from app.utils.excel_export import ExcelSheet, stream_xlsx, EXPORT_FETCH_SIZE
+
+
+TICK_INTERVAL = 0.005
+HEADER = ['Mốc thời gian cập nhật', 'Mã câu hỏi', 'Mã thí sinh', 'Điểm D nhận được']
+
+
+
+def _row(i: int) -> tuple:
+    return (datetime.now(timezone.utc).isoformat(), f"LN{i % 90}", f"P{i % 40:03d}", 5 * (i % 4))
+
+
+
+async def _batches(rows: int):
+    for start in range(0, rows, EXPORT_FETCH_SIZE):
+        await asyncio.sleep(0)
+        yield [_row(i) for i in range(start, min(rows, start + EXPORT_FETCH_SIZE))]
+
+
+
+async def _legacy_export(rows: int) -> int:
+    buffer = io.BytesIO()
+    data = [dict(zip(HEADER, _row(i))) for i in range(rows)]
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        pd.DataFrame(data).to_excel(writer, index=False, sheet_name='EXPORT')
+    return len(buffer.getvalue())
+
+
+
+async def _streamed_export(rows: int) -> int:
+    sheet = ExcelSheet(name='EXPORT', header=HEADER, batches=lambda: _batches(rows))
+    size = 0
+    async for chunk in stream_xlsx([sheet], 'benchmark'):
+        size += len(chunk)
+    return size
+
+
+
+async def _measure_lag(stop: asyncio.Event, lags: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append((time.perf_counter() - started - TICK_INTERVAL) * 1000)
+
+
+
+async def _run_one(export, rows: int) -> dict:
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(_measure_lag(stop, lags))
+    await asyncio.sleep(TICK_INTERVAL * 2)
+    started = time.perf_counter()
+    size = await export(rows)
+    duration = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    tracemalloc.start()
+    await export(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "file_bytes": size,
+        "duration_s": round(duration, 2),
+        "peak_memory_mb": round(peak / 1e6, 2),
+        "loop_lag_max_ms": round(max(lags), 1),
+    }
+
+
+
+async def run(row_counts: list[int]) -> list[dict]:
+    results = []
+    for rows in row_counts:
+        results.append({
+            "rows": rows,
+            "legacy_in_memory": await _run_one(_legacy_export, rows),
+            "streamed": await _run_one(_streamed_export, rows),
+        })
+    return results
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000])
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.rows)), indent=2))
+
+
+
+if __name__ == "__main__":
+    main()